@@ -8,28 +8,41 @@ import json
 import logging
 import nest_asyncio
 import os
+import re
 import signal
 import ssl
 import threading
+import time
 import uvicorn
+from uvicorn.supervisors import Multiprocess
 from dotmap import DotMap
-from fastapi import FastAPI, WebSocket, HTTPException, Response
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Response
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
-from passlib.context import CryptContext
 from pathlib import Path
 from pydantic import BaseModel
 from starlette.requests import Request
-from starlette.status import HTTP_401_UNAUTHORIZED
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, HTTP_429_TOO_MANY_REQUESTS
 from typing import Any, Dict
 
+from core.authentication import TooManyAttemptsException, credentials_verifier, verified_tokens
 from core.constants import constants
+from core.gateway_connections import gateway_connections
+from core.metrics import metrics
+from core.profiler import ProfilerException
 from core.properties import properties
+from core.responses import conditional_response
+from core import runtime
 from core.router.hummingbot_client import hummingbot_client_router
 from core.router.hummingbot_gateway import hummingbot_gateway_router
-from core.system import execute
+from core.state_store import state_store
+from core.status import status_publisher
+from core.system import executor
+from core.tick_history import tick_history
+from core.time_series import time_series
 from core.types import HttpMethod
+from core.watchdog import loop_watchdog
 
 nest_asyncio.apply()
 root_path = Path(os.path.dirname(__file__)).absolute().as_posix()
@@ -48,7 +61,8 @@ tasks: DotMap[str, asyncio.Task] = DotMap({
 processes: DotMap[str, StrategyBase] = DotMap({
 })
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+certificates: DotMap[str, Any] | None = None
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 unauthorized_exception = HTTPException(
@@ -63,28 +77,20 @@ class Credentials(BaseModel):
 	password: str
 
 
-async def authenticate(username: str, password: str):
+async def authenticate(username: str, password: str, address: str):
 	try:
 		if properties.get_or_default("server.authentication.enforce", True):
-			result = DotMap(
-				json.loads(
-					str(
-						await execute(
-							str(properties.get("system.commands.authenticate")).format(
-								username=username, password=password
-							)
-
-						)
-					)
-				),
-				_dynamic=False
-			)
+			result = await credentials_verifier.verify(username, password, address)
+			if not result:
+				return False
 
 			properties.set("admin.username", result.username)
 
 			return result
 		else:
 			return DotMap({"username": username, "password": password}, _dynamic=False)
+	except TooManyAttemptsException:
+		raise
 	except Exception as exception:
 		return False
 
@@ -98,22 +104,31 @@ def create_jwt_token(data: dict, expires_delta: datetime.timedelta):
 	return encoded_jwt
 
 
-async def validate_token(request: Request | WebSocket) -> bool:
-	try:
-		token = request.cookies.get("access_token")
+def get_token(request: Request | WebSocket) -> str | None:
+	token = request.cookies.get("access_token")
 
-		if token:
-			token = token.removeprefix("Bearer ")
-		else:
-			authorization = request.headers.get("Authorization")
-			if not authorization:
-				return False
+	if token:
+		token = token.removeprefix("Bearer ")
+	else:
+		authorization = request.headers.get("Authorization")
+		if not authorization:
+			return None
+
+		token = str(authorization).strip().removeprefix("Bearer ")
 
-			token = str(authorization).strip().removeprefix("Bearer ")
+	return token or None
+
+
+async def validate_token(request: Request | WebSocket) -> bool:
+	try:
+		token = get_token(request)
 
 		if not token:
 			return False
 
+		if verified_tokens.is_verified(token):
+			return True
+
 		payload = jwt.decode(token, properties.get("admin.password"), algorithms=[constants.authentication.jwt.algorithm])
 		if not payload:
 			return False
@@ -126,6 +141,8 @@ async def validate_token(request: Request | WebSocket) -> bool:
 		if datetime.datetime.now(datetime.UTC) > token_expiration_datetime:
 			return False
 
+		verified_tokens.add(token, token_expiration_timestamp)
+
 		return True
 	except Exception as exception:
 		logger.log(logging.DEBUG, traceback.format_exc())
@@ -203,14 +220,40 @@ async def validate(target: Request | WebSocket) -> Request:
 		raise unauthorized_exception
 
 
+request_duration = metrics.histogram("api_request_duration_seconds", "Duration of the HTTP requests to the API.")
+requests_count = metrics.counter("api_requests_total", "HTTP requests to the API by response status.")
+
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+	start = time.perf_counter()
+	status = "error"
+
+	try:
+		response = await call_next(request)
+		status = response.status_code
+
+		return response
+	finally:
+		# The route template keeps the label cardinality bounded, unmatched paths are grouped together.
+		route = request.scope.get("route")
+		labels = {"method": request.method, "route": route.path if route else "unmatched"}
+
+		request_duration.observe(time.perf_counter() - start, **labels)
+		requests_count.inc(status=status, **labels)
+
+
 @app.post("/auth/signUp")
 async def auth_sign_up(_request: Request, response: Response):
 	raise NotImplemented
 
 
 @app.post("/auth/signIn")
-async def auth_sign_in(request: Credentials, response: Response):
-	credentials = await authenticate(request.username, request.password)
+async def auth_sign_in(request: Credentials, http_request: Request, response: Response):
+	try:
+		credentials = await authenticate(request.username, request.password, http_request.client.host if http_request.client else "")
+	except TooManyAttemptsException as exception:
+		raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS, detail=str(exception))
 
 	if not credentials:
 		raise unauthorized_exception
@@ -226,7 +269,11 @@ async def auth_sign_in(request: Credentials, response: Response):
 
 
 @app.post("/auth/signOut")
-async def auth_sign_out(_request: Request, response: Response):
+async def auth_sign_out(request: Request, response: Response):
+	token = get_token(request)
+	if token:
+		verified_tokens.remove(token)
+
 	response.delete_cookie(key="access_token")
 
 	return {"message": "Cookie successfully deleted."}
@@ -247,7 +294,7 @@ async def auth_refresh(request: Request, response: Response):
 
 
 @app.get("/service/status")
-async def service_status(request: Request) -> Dict[str, Any]:
+async def service_status(request: Request) -> Response:
 	await validate(request)
 
 	try:
@@ -255,7 +302,7 @@ async def service_status(request: Request) -> Dict[str, Any]:
 	except JSONDecodeError:
 		body = {}
 
-	return DotMap(await controller.service_status(body)).toDict()
+	return conditional_response(request, DotMap(await controller.service_status(body)).toDict())
 
 
 @app.post("/service/start")
@@ -287,7 +334,7 @@ async def service_stop(request: Request) -> Dict[str, Any]:
 
 
 @app.get("/strategy/status")
-async def strategy_status(request: Request) -> Dict[str, Any]:
+async def strategy_status(request: Request) -> Response:
 	await validate(request)
 
 	try:
@@ -295,7 +342,7 @@ async def strategy_status(request: Request) -> Dict[str, Any]:
 	except JSONDecodeError:
 		body = {}
 
-	return await controller.strategy_status(body)
+	return conditional_response(request, await controller.strategy_status(body))
 
 
 @app.post("/strategy/start")
@@ -323,7 +370,7 @@ async def strategy_stop(request: Request) -> Dict[str, Any]:
 
 
 @app.get("/strategy/worker/status")
-async def strategy_worker_status(request: Request) -> Dict[str, Any]:
+async def strategy_worker_status(request: Request) -> Response:
 	await validate(request)
 
 	try:
@@ -331,7 +378,7 @@ async def strategy_worker_status(request: Request) -> Dict[str, Any]:
 	except JSONDecodeError:
 		body = {}
 
-	return await controller.strategy_worker_status(body)
+	return conditional_response(request, await controller.strategy_worker_status(body))
 
 
 @app.post("/strategy/worker/start")
@@ -357,6 +404,113 @@ async def strategy_worker_stop(request: Request) -> Dict[str, Any]:
 
 	return await controller.strategy_worker_stop(body)
 
+
+@app.get("/strategy/workers/status")
+async def strategy_workers_status(request: Request) -> Response:
+	await validate(request)
+
+	try:
+		body = await request.json()
+	except JSONDecodeError:
+		body = {}
+
+	return conditional_response(request, await controller.strategy_workers_status(body))
+
+
+@app.post("/strategy/workers/start")
+async def strategy_workers_start(request: Request) -> Dict[str, Any]:
+	await validate(request)
+
+	try:
+		body = await request.json()
+	except JSONDecodeError:
+		body = {}
+
+	return await controller.strategy_workers_start(body)
+
+
+@app.post("/strategy/workers/stop")
+async def strategy_workers_stop(request: Request) -> Dict[str, Any]:
+	await validate(request)
+
+	try:
+		body = await request.json()
+	except JSONDecodeError:
+		body = {}
+
+	return await controller.strategy_workers_stop(body)
+
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request) -> Response:
+	await validate(request)
+
+	return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/history/{table}")
+async def history(request: Request, table: str) -> Response:
+	await validate(request)
+
+	try:
+		result = await controller.history(DotMap({**request.query_params, "table": table}))
+	except (runtime.RuntimeException, ValueError) as exception:
+		raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(exception))
+
+	return conditional_response(request, result)
+
+
+@app.get("/series/{worker}/{metric}")
+async def series(request: Request, worker: str, metric: str) -> Response:
+	await validate(request)
+
+	try:
+		result = await controller.series(DotMap({**request.query_params, "worker": worker, "metric": metric}))
+	except (runtime.RuntimeException, ValueError) as exception:
+		raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(exception))
+
+	return conditional_response(request, result)
+
+
+@app.get("/watchdog")
+async def watchdog(request: Request) -> Dict[str, Any]:
+	await validate(request)
+
+	output = {
+		"api": {"stacks": loop_watchdog.get_report()}
+	}
+
+	if runtime.is_remote():
+		output["runtime"] = await controller.watchdog_status(DotMap(dict(request.query_params)))
+	elif request.query_params.get("clear"):
+		loop_watchdog.clear()
+
+	return output
+
+
+@app.post("/profile")
+async def profile(request: Request) -> Response:
+	await validate(request)
+
+	try:
+		body = await request.json()
+	except JSONDecodeError:
+		body = {}
+
+	body = DotMap({**request.query_params, **body}, _dynamic=False)
+
+	try:
+		result = await controller.profile(body)
+	except (ProfilerException, runtime.RuntimeException, ValueError) as exception:
+		raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(exception))
+
+	return Response(
+		content=result["output"],
+		media_type="text/plain",
+		headers={"X-Profile-Format": result["format"], "X-Profile-Samples": str(result["samples"])}
+	)
+
+
 @app.get("/hummingbot/gateway/")
 @app.post("/hummingbot/gateway/")
 @app.put("/hummingbot/gateway/")
@@ -381,7 +535,11 @@ async def hummingbot_gateway(request: Request, subpath=''):
 		body = DotMap(await request.json(), _dynamic=False)
 	except:
 		body = DotMap({}, _dynamic=False)
-	headers = DotMap(dict(request.headers), _dynamic=False)
+	# Conditional requests are answered here, the Gateway must always return the content.
+	headers = DotMap({
+		key: value for (key, value) in request.headers.items()
+		if key.lower() not in ("if-none-match", "if-modified-since")
+	}, _dynamic=False)
 
 	method = HttpMethod[request.method.upper()]
 
@@ -413,6 +571,9 @@ async def hummingbot_gateway(request: Request, subpath=''):
 			if not response:
 				response = DotMap({}, _dynamic=False)
 
+			if method == HttpMethod.GET:
+				return conditional_response(request, response.toDict())
+
 			return JSONResponse(response.toDict())
 		else:
 			return {}
@@ -467,27 +628,103 @@ async def websocket_log(websocket: WebSocket):
 
 	await validate(websocket)
 
+	async def stream(options: DotMap):
+		try:
+			async for message in controller.websocket_log(options):
+				if isinstance(message, bytes):
+					await websocket.send_bytes(message)
+				else:
+					await websocket.send_text(message)
+		except (ValueError, re.error) as exception:
+			await websocket.send_text(f"[Invalid subscription: {exception}]")
+
+	task: asyncio.Task | None = None
+
 	try:
 		while True:
-			id = await websocket.receive_text()
+			message = await websocket.receive_text()
 
-			async for message in controller.websocket_log(DotMap({"id": id})):
-				await websocket.send_text(message)
+			# Either the id of the log source or a JSON object with the id and the subscription parameters.
+			try:
+				options = DotMap(json.loads(message), _dynamic=False) if message.lstrip().startswith("{") else DotMap({"id": message}, _dynamic=False)
+			except JSONDecodeError as exception:
+				await websocket.send_text(f"[Invalid subscription: {exception}]")
+
+				continue
+
+			# A new message replaces the current subscription.
+			if task:
+				task.cancel()
+
+			task = asyncio.create_task(stream(options))
+	except WebSocketDisconnect:
+		pass
 	except Exception as exception:
 		raise exception
+	finally:
+		if task:
+			task.cancel()
 
 
-async def start_api():
-	signal.signal(signal.SIGTERM, shutdown)
-	signal.signal(signal.SIGINT, shutdown)
+@app.websocket("/ws/status")
+async def websocket_status(websocket: WebSocket):
+	await websocket.accept()
 
-	logger.log(logging.INFO, f'Environment: {properties.get("environment")}')
+	await validate(websocket)
 
-	host = os.environ.get("HOST", properties.get('server.host'))
-	port = int(os.environ.get("PORT", properties.get('server.port')))
-	environment = properties.get_or_default('server.environment', constants.environments.production)
+	queue = status_publisher.subscribe()
+	version = -1
 
-	os.environ['ENV'] = environment
+	async def send_snapshot():
+		nonlocal version
+
+		await status_publisher.update()
+		snapshot = status_publisher.get_snapshot()
+		version = snapshot["version"]
+
+		await websocket.send_json(snapshot)
+
+	async def receive():
+		# Any message from the client requests a new snapshot, for example after it detected a gap in the versions.
+		while True:
+			await websocket.receive_text()
+			await send_snapshot()
+
+	receiver = asyncio.create_task(receive())
+
+	try:
+		await send_snapshot()
+
+		while True:
+			getter = asyncio.create_task(queue.get())
+			(done, _) = await asyncio.wait([getter, receiver], return_when=asyncio.FIRST_COMPLETED)
+
+			if receiver in done:
+				getter.cancel()
+				receiver.result()
+
+			message = getter.result()
+
+			# Deltas that are already part of the last snapshot sent are skipped.
+			if message["version"] > version or message["type"] == "snapshot":
+				version = message["version"]
+
+				await websocket.send_json(message)
+	except WebSocketDisconnect:
+		pass
+	finally:
+		receiver.cancel()
+		status_publisher.unsubscribe(queue)
+
+
+def configure_properties() -> DotMap[str, Any]:
+	"""
+	Resolves the certificates and the admin password, once per process (the API workers run it on startup).
+	"""
+	global certificates
+
+	if certificates is not None:
+		return certificates
 
 	path_prefix = properties.get_or_default(
 		"hummingbot.gateway.certificates.path.base.absolute",
@@ -522,13 +759,36 @@ async def start_api():
 		content = file.read()
 		properties.set(key, content)
 
+	return certificates
+
+
+async def start_api():
+	signal.signal(signal.SIGTERM, shutdown)
+	signal.signal(signal.SIGINT, shutdown)
+
+	logger.log(logging.INFO, f'Environment: {properties.get("environment")}')
+
+	host = os.environ.get("HOST", properties.get('server.host'))
+	port = int(os.environ.get("PORT", properties.get('server.port')))
+	environment = properties.get_or_default('server.environment', constants.environments.production)
+
+	os.environ['ENV'] = environment
+
+	certificates = configure_properties()
+
 	if properties.get_or_default("server.authentication.require.certificate", True):
 		certificate_requirement = ssl.CERT_REQUIRED
 	else:
 		certificate_requirement = ssl.CERT_OPTIONAL
 
+	workers = int(properties.get_or_default("server.workers", 1))
+	if workers > 1 and not runtime.is_remote():
+		logger.log(logging.WARNING, "Several API workers require the remote strategy runtime (system.runtime.remote), starting a single one.")
+		workers = 1
+
 	config = uvicorn.Config(
 		"app:app",
+		workers=workers,
 		host=host,
 		port=port,
 		log_level=properties.get_or_default("logging.level", logging.DEBUG),
@@ -546,7 +806,16 @@ async def start_api():
 	# 	import pydevd_pycharm
 	# 	pydevd_pycharm.settrace('localhost', port=30001, stdoutToServer=True, stderrToServer=True)
 
-	await server.serve()
+	if workers > 1:
+		# The supervisor only spawns the workers here, waiting for its exit signal must not block the event loop.
+		supervisor = Multiprocess(config, target=server.run, sockets=[config.bind_socket()])
+		supervisor.startup()
+		await asyncio.get_running_loop().run_in_executor(None, supervisor.should_exit.wait)
+		supervisor.shutdown()
+
+		shutdown()
+	else:
+		await server.serve()
 
 
 @app.get("/development/test")
@@ -572,6 +841,8 @@ async def development_test(request: Request) -> Dict[str, Any]:
 async def main():
 	loop = asyncio.get_event_loop()
 
+	loop_watchdog.start()
+
 	tasks.telegram = loop.create_task(telegram.start_command_listener())
 	tasks.api = loop.create_task(start_api())
 
@@ -591,6 +862,8 @@ def after_startup():
 
 
 async def startup():
+	configure_properties()
+
 	threading.Timer(1, after_startup).start()
 
 
@@ -603,6 +876,12 @@ def shutdown(*args):
 			except Exception as exception:
 				pass
 
+	executor.close()
+	gateway_connections.flush()
+	state_store.flush()
+	tick_history.flush()
+	time_series.flush(close=True)
+
 
 @atexit.register
 def shutdown_helper():
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from dotmap import DotMap
+from passlib.context import CryptContext
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class TooManyAttemptsException(Exception):
+	pass
+
+
+def _escape_double_quoted(value: str) -> str:
+	"""
+	Escapes a value that is interpolated between double quotes in a shell command.
+	"""
+	for character in ("\\", "\"", "$", "`"):
+		value = value.replace(character, f"\\{character}")
+
+	return value
+
+
+@ThreadSafeSingleton
+class VerifiedTokens(object):
+	"""
+	Bounded LRU of JWTs that already passed the signature verification, with their expiration timestamps.
+
+	Tokens are kept by their digest only. The whole cache is discarded when the signing key (admin.password)
+	changes, so a token signed with a previous key is verified again, and fails, after a rotation.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._tokens: OrderedDict[bytes, float] = OrderedDict()
+		self._signing_key: Optional[str] = None
+
+	@staticmethod
+	def _get_digest(token: str) -> bytes:
+		return hashlib.blake2b(token.encode(), digest_size=32).digest()
+
+	def _check_signing_key(self):
+		signing_key = properties.get("admin.password")
+
+		if signing_key != self._signing_key:
+			self._tokens.clear()
+			self._signing_key = signing_key
+
+	def is_verified(self, token: str) -> bool:
+		digest = self._get_digest(token)
+
+		with self._lock:
+			self._check_signing_key()
+
+			expiration = self._tokens.get(digest)
+			if expiration is None:
+				return False
+
+			if time.time() >= expiration:
+				del self._tokens[digest]
+
+				return False
+
+			self._tokens.move_to_end(digest)
+
+			return True
+
+	def add(self, token: str, expiration: float):
+		digest = self._get_digest(token)
+
+		with self._lock:
+			self._check_signing_key()
+
+			self._tokens[digest] = expiration
+			self._tokens.move_to_end(digest)
+
+			maximum_size = int(properties.get_or_default("server.authentication.token_cache.size", 1024))
+			while len(self._tokens) > maximum_size:
+				self._tokens.popitem(last=False)
+
+	def remove(self, token: str):
+		with self._lock:
+			self._tokens.pop(self._get_digest(token), None)
+
+	def clear(self):
+		with self._lock:
+			self._tokens.clear()
+
+
+verified_tokens = VerifiedTokens.instance()
+
+
+@ThreadSafeSingleton
+class CredentialsVerifier(object):
+	"""
+	Verifies the credentials in process against a bcrypt hash kept in memory.
+
+	The "authenticate" system command is only run the first time a user signs in, to provision the hash, and again
+	after the admin password changed. Failed attempts are limited per user and per client address within a sliding
+	window.
+	"""
+
+	def __init__(self):
+		# Lock and number of sign-ins using it, per user.
+		self._locks: Dict[str, List[Any]] = {}
+		self._hashes: Dict[str, str] = {}
+		self._usernames: Dict[str, str] = {}
+		self._failures: Dict[str, Deque[float]] = {}
+		self._password: Optional[str] = None
+
+	def _check_password(self):
+		password = properties.get_or_default("admin.password", None)
+
+		if password != self._password:
+			self.clear()
+			self._password = password
+
+	def _get_failures(self, key: str) -> Deque[float]:
+		window = properties.get_or_default("server.authentication.rate_limit.window", 60000) / 1000.0
+
+		failures = self._failures.get(key)
+		if failures is None:
+			failures = self._failures[key] = deque()
+
+		now = time.monotonic()
+		while failures and failures[0] <= now - window:
+			failures.popleft()
+
+		return failures
+
+	def _check_rate_limit(self, *keys: str):
+		maximum_attempts = int(properties.get_or_default("server.authentication.rate_limit.attempts", 5))
+
+		for key in keys:
+			failures = self._get_failures(key)
+
+			if not failures:
+				self._failures.pop(key, None)
+			elif len(failures) >= maximum_attempts:
+				raise TooManyAttemptsException("Too many failed attempts, try again later.")
+
+	def _register_failure(self, *keys: str):
+		now = time.monotonic()
+
+		for key in keys:
+			self._get_failures(key).append(now)
+
+		self._prune_failures()
+
+	def _prune_failures(self):
+		"""
+		Bounds the failures kept, the keys come from the clients: the ones without recent failures are removed, then
+		the oldest ones.
+		"""
+		maximum_keys = int(properties.get_or_default("server.authentication.rate_limit.maximum_keys", 10000))
+		if len(self._failures) <= maximum_keys:
+			return
+
+		for key in list(self._failures.keys()):
+			if not self._get_failures(key):
+				del self._failures[key]
+
+		for key in list(self._failures.keys())[:max(len(self._failures) - maximum_keys, 0)]:
+			del self._failures[key]
+
+	def _clear_failures(self, *keys: str):
+		for key in keys:
+			self._failures.pop(key, None)
+
+	async def _provision(self, username: str, password: str) -> Optional[DotMap]:
+		from core.system import execute
+
+		try:
+			result = DotMap(
+				json.loads(
+					str(
+						await execute(
+							str(properties.get("system.commands.authenticate")).format(
+								username=_escape_double_quoted(username), password=_escape_double_quoted(password)
+							)
+						)
+					)
+				),
+				_dynamic=False
+			)
+		except Exception:
+			return None
+
+		self._hashes[username] = await asyncio.get_running_loop().run_in_executor(None, pwd_context.hash, password)
+		self._usernames[username] = result.username
+
+		return result
+
+	async def verify(self, username: str, password: str, address: str) -> Optional[DotMap]:
+		"""
+		Returns the authenticated user or None, raises TooManyAttemptsException when the attempts are exhausted.
+		"""
+		keys = (f"user:{username}", f"address:{address}")
+
+		self._check_rate_limit(*keys)
+		self._check_password()
+
+		password_hash = self._hashes.get(username)
+
+		if password_hash is None:
+			# Concurrent first sign-ins of the same user provision the hash only once, other users are not blocked.
+			entry = self._locks.get(username)
+			if entry is None:
+				entry = self._locks[username] = [asyncio.Lock(), 0]
+			entry[1] += 1
+
+			try:
+				async with entry[0]:
+					password_hash = self._hashes.get(username)
+
+					if password_hash is None:
+						result = await self._provision(username, password)
+
+						if result is None:
+							self._register_failure(*keys)
+
+						return result
+			finally:
+				entry[1] -= 1
+				if not entry[1]:
+					del self._locks[username]
+
+		if not await asyncio.get_running_loop().run_in_executor(None, pwd_context.verify, password, password_hash):
+			self._register_failure(*keys)
+
+			return None
+
+		self._clear_failures(*keys)
+
+		return DotMap({"username": self._usernames[username]}, _dynamic=False)
+
+	def clear(self):
+		"""
+		Forgets the cached hashes, done when the admin password changes.
+		"""
+		self._hashes.clear()
+		self._usernames.clear()
+
+
+credentials_verifier = CredentialsVerifier.instance()
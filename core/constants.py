@@ -32,7 +32,7 @@ constants = DotMap({
 	"services": {
 		"status": {
 			"task": "services.status",
-			"delay": 500,  # in ms
+			"rescan_interval": 5000,  # in ms
 			"current": None,
 			"default": {
 				"fun-frontend": SystemStatus.UNKNOWN,
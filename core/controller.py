@@ -1,15 +1,24 @@
 import asyncio
-import json
+import gzip
 import os
+import zlib
 from dotmap import DotMap
 from typing import Dict, AsyncGenerator, Any, List
 
 from core.constants import constants, chains_connector_specification
+from core.gateway_connections import gateway_connections
+from core.log_broadcaster import LogFilter, log_broadcaster
 from core.logger import logger
+from core.profiler import profiler
 from core.properties import properties
-from core.system import execute, execute_continuously
+from core.runtime import runtime_rpc
+from core.services import services_monitor
+from core.status import status_publisher
+from core.system import execute
+from core.tick_history import tick_history
+from core.time_series import time_series
 from core.types import SystemStatus
-from core.utils import deep_merge
+from core.watchdog import loop_watchdog
 
 from hummingbot.strategies.strategy_base import StrategyBase
 from hummingbot.strategies.types import Strategy
@@ -22,6 +31,11 @@ processes: DotMap[str, StrategyBase] = DotMap({
 })
 processes._dynamic=True
 
+LOG_COMPRESSIONS = {
+	"deflate": zlib.compress,
+	"gzip": gzip.compress,
+}
+
 
 def sanitize_options(options: DotMap[str, Any]) -> DotMap[str, Any]:
 	default_strategy = Strategy.get_default()
@@ -34,49 +48,61 @@ def sanitize_options(options: DotMap[str, Any]) -> DotMap[str, Any]:
 	})
 
 	output.full_id = f"""{output.strategy}:{output.version}:{output.id}"""
-	output.class_reference = Strategy.from_id_and_version(output.strategy, output.version).value
+	strategy = Strategy.from_id_and_version(output.strategy, output.version)
+	if strategy is None:
+		raise ValueError(f"""Strategy "{output.strategy}" with version "{output.version}" not found.""")
+
+	output.class_reference = strategy.value
 
 	output._dynamic = False
 
 	return output
 
 
-async def continuously_solve_services_status():
-	while True:
-		try:
-			system = DotMap(json.loads(await execute(properties.get("system.commands.status"))), _dynamic=False)
-			for (key, value) in system.items():
-				if key == constants.id:
-					try:
-						status = DotMap(await strategy_status(DotMap({})), _dynamic=False)
-
-						if status.get("message") == "Process not running":
-							system[key] = SystemStatus.STOPPED
-						else:
-							system[key] = DotMap(status, _dynamic=False).status
-					except Exception as exception:
-						system[key] = SystemStatus.UNKNOWN
-				else:
-					system[key] = SystemStatus.get_by_id(value)
+async def solve_fun_client_status(strategies: Dict[str, Any] = None) -> SystemStatus:
+	options = sanitize_options(DotMap({}))
 
-			current = properties.get_or_default("services.status.current", constants.services.status.default)
-			final = deep_merge(current, system)
+	try:
+		if strategies is None:
+			strategies = await strategies_status(DotMap({}))
 
-			properties.set("services.status.current", final)
+		status = strategies.get(options.full_id)
+
+		if status:
+			# Statuses coming from a remote runtime are already serialized.
+			return SystemStatus.get_by_id(status["status"]) if isinstance(status["status"], str) else status["status"]
+
+		return SystemStatus.STOPPED
+	except Exception as exception:
+		logger.ignore_exception(exception)
+
+		return SystemStatus.UNKNOWN
 
-			await asyncio.sleep(constants.services.status.delay / 1000.0)
-		except Exception as exception:
-			logger.ignore_exception(exception)
 
-			pass
+@runtime_rpc
+async def strategies_status(_options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Returns the status of every running supervisor, with its workers and tasks.
+	"""
+	output = {}
+
+	for (full_id, process) in list(processes.items()):
+		if process:
+			try:
+				output[full_id] = process.get_status().toDict()
+			except Exception as exception:
+				# A supervisor that is still creating its workers can not report them yet.
+				logger.ignore_exception(exception)
+
+	return output
 
 
 async def service_status(_options: DotMap[str, Any]) -> Dict[str, Any]:
 	try:
-		if not tasks[constants.services.status.task]:
-			tasks[constants.services.status.task].start = asyncio.create_task(continuously_solve_services_status())
+		services_monitor.start()
+		services_monitor.update(constants.id, await solve_fun_client_status())
 
-		return properties.get_or_default("services.status.current", constants.services.status.default)
+		return services_monitor.get()
 	except Exception as exception:
 		raise exception
 
@@ -84,16 +110,21 @@ async def service_status(_options: DotMap[str, Any]) -> Dict[str, Any]:
 async def service_start(options: DotMap[str, Any]):
 	try:
 		if properties.get_or_default(f"services.status.current.{options.id}", SystemStatus.UNKNOWN) in [SystemStatus.STOPPED, SystemStatus.UNKNOWN]:
-			properties.set(f"services.status.current.{options.id}", SystemStatus.STARTING)
-
 			if options.id == constants.id:
+				services_monitor.update(options.id, SystemStatus.STARTING)
+
 				await strategy_start(DotMap({}))
+
+				services_monitor.update(options.id, SystemStatus.RUNNING)
 			else:
+				services_monitor.start_service(options.id)
+
 				await execute(str(properties.get(f"system.commands.start.{options.id}")).format(
 					username=properties.get("admin.username"), password=properties.get("admin.password")
-				))
+				), detached=True)
 
-			properties.set(f"services.status.current.{options.id}", SystemStatus.RUNNING)
+				# Running only once the rescan finds its process.
+				services_monitor.refresh()
 
 			return {
 				"message": f"""Service "{options.id}" has started."""
@@ -109,14 +140,15 @@ async def service_start(options: DotMap[str, Any]):
 async def service_stop(options: DotMap[str, Any]):
 	try:
 		if properties.get_or_default(f"services.status.current.{options.id}", SystemStatus.UNKNOWN) in [SystemStatus.STARTING, SystemStatus.IDLE, SystemStatus.RUNNING]:
-			properties.set(f"services.status.current.{options.id}", SystemStatus.STOPPING)
+			services_monitor.update(options.id, SystemStatus.STOPPING)
 
 			if options.id == constants.id:
 				await strategy_stop(DotMap({}))
 			else:
 				await execute(properties.get(f"system.commands.stop.{options.id}"))
 
-			properties.set(f"services.status.current.{options.id}", SystemStatus.STOPPED)
+			services_monitor.update(options.id, SystemStatus.STOPPED)
+			services_monitor.refresh()
 
 			return {
 				"message": f"""Service "{options.id}" has stopped."""
@@ -129,6 +161,7 @@ async def service_stop(options: DotMap[str, Any]):
 		raise exception
 
 
+@runtime_rpc
 async def strategy_status(options: DotMap[str, Any]) -> Dict[str, Any]:
 	options = sanitize_options(options)
 
@@ -149,6 +182,7 @@ async def strategy_status(options: DotMap[str, Any]) -> Dict[str, Any]:
 		raise exception
 
 
+@runtime_rpc
 async def strategy_start(options: DotMap[str, Any]) -> Dict[str, Any]:
 	options = sanitize_options(options)
 
@@ -157,6 +191,9 @@ async def strategy_start(options: DotMap[str, Any]) -> Dict[str, Any]:
 			processes[options.full_id] = options.class_reference(options.id)
 			tasks[options.full_id].start = asyncio.create_task(processes[options.full_id].start())
 
+			services_monitor.update(constants.id, SystemStatus.STARTING)
+			status_publisher.refresh()
+
 			return {
 				"message": "Starting..."
 			}
@@ -174,6 +211,7 @@ async def strategy_start(options: DotMap[str, Any]) -> Dict[str, Any]:
 		raise exception
 
 
+@runtime_rpc
 async def strategy_stop(options: DotMap[str, Any]):
 	options = sanitize_options(options)
 
@@ -182,6 +220,9 @@ async def strategy_stop(options: DotMap[str, Any]):
 			tasks[options.full_id].start.cancel()
 			tasks[options.full_id].stop = asyncio.create_task(processes[options.full_id].stop())
 
+			services_monitor.update(constants.id, SystemStatus.STOPPING)
+			status_publisher.refresh()
+
 			return {
 				"message": "Stopping..."
 			}
@@ -200,12 +241,14 @@ async def strategy_stop(options: DotMap[str, Any]):
 		tasks[options.full_id].start = None
 
 
+@runtime_rpc
 async def strategy_worker_start(options: DotMap[str, Any]) -> Dict[str, Any]:
 	options = sanitize_options(options)
 
 	try:
 		if processes.get(options.full_id):
 			asyncio.create_task(processes[options.full_id].start_worker(options.worker_id))
+			status_publisher.refresh()
 
 			return {
 				"message": f"Starting worker {options.worker_id} ..."
@@ -218,12 +261,14 @@ async def strategy_worker_start(options: DotMap[str, Any]) -> Dict[str, Any]:
 		raise exception
 
 
+@runtime_rpc
 async def strategy_worker_stop(options: DotMap[str, Any]) -> Dict[str, Any]:
 	options = sanitize_options(options)
 
 	try:
 		if processes.get(options.full_id):
 			asyncio.create_task(processes[options.full_id].stop_worker(options.worker_id))
+			status_publisher.refresh()
 
 			return {
 				"message": f"Stopping worker {options.worker_id} ..."
@@ -236,6 +281,7 @@ async def strategy_worker_stop(options: DotMap[str, Any]) -> Dict[str, Any]:
 		raise exception
 
 
+@runtime_rpc
 async def strategy_worker_status(options: DotMap[str, Any]) -> Dict[str, Any]:
 	options = sanitize_options(options)
 
@@ -256,129 +302,270 @@ async def strategy_worker_status(options: DotMap[str, Any]) -> Dict[str, Any]:
 		raise exception
 
 
-async def websocket_log(options: Any) -> AsyncGenerator[str, None]:
-	command = str(properties.get(f"system.commands.log.{options.id}"))
+def _get_workers_options(options: DotMap[str, Any]) -> List[DotMap[str, Any]]:
+	"""
+	Expands a bulk request into the options of each worker.
 
-	async for line in execute_continuously(command):
-		yield line
-		await asyncio.sleep(0.1)
+	Workers are listed as {"workers": [{"id": "01", "worker_id": "01"}, ...]}, every item accepting the same
+	fields as the single worker endpoints. The items are sanitized one by one with _sanitize_worker_options, so an
+	invalid item fails alone.
+	"""
+	return [DotMap(item) for item in options.get("workers", [])]
 
 
-def update_gateway_connections(params: Any):
-	absolute_configuration_path = os.path.expanduser(str(properties.get("hummingbot.client.configuration_path")))
-
-	def load(path) -> List[Dict[str, str]]:
-		if os.path.exists(path):
-			with open(path) as target_file:
-				try:
-					file_content: List[Dict[str, str]] = json.load(target_file)
-
-					return file_content
-				except json.JSONDecodeError:
-					return []
-		return []
-
-	def save(path, settings: List[Dict[str, str]]):
-		with open(path, "w") as target_file:
-			json.dump(settings, target_file)
-
-	gateway_connections_absolute_file_path = (
-		absolute_configuration_path + "gateway_connections.json"
-		if absolute_configuration_path[-1] == "/"
-		else absolute_configuration_path + "/gateway_connections.json"
+def _sanitize_worker_options(item: DotMap[str, Any], result: Dict[str, Any]) -> DotMap[str, Any]:
+	"""
+	Sanitizes an item of a bulk request and identifies its result, which already names the worker if it fails.
+	"""
+	result["supervisor_id"] = None
+	result["worker_id"] = item.get("worker_id", item.get("workerId", None))
+
+	worker_options = sanitize_options(item)
+
+	result["supervisor_id"] = worker_options.full_id
+	result["worker_id"] = worker_options.worker_id
+
+	return worker_options
+
+
+async def _run_for_workers(options: DotMap[str, Any], action) -> Dict[str, Any]:
+	semaphore = asyncio.Semaphore(int(properties.get_or_default("system.strategies.concurrency", 5)))
+
+	async def run(item: DotMap[str, Any]) -> Dict[str, Any]:
+		result = {}
+
+		async with semaphore:
+			try:
+				worker_options = _sanitize_worker_options(item, result)
+
+				if not processes.get(worker_options.full_id):
+					result["success"] = False
+					result["message"] = f"Supervisor {worker_options.full_id} is not running"
+				else:
+					await action(processes[worker_options.full_id], worker_options.worker_id)
+
+					result["success"] = True
+			except Exception as exception:
+				logger.ignore_exception(exception)
+
+				result["success"] = False
+				result["message"] = str(exception)
+
+		return result
+
+	results = await asyncio.gather(*[run(item) for item in _get_workers_options(options)])
+
+	status_publisher.refresh()
+
+	return {
+		"results": results
+	}
+
+
+@runtime_rpc
+async def strategy_workers_start(options: DotMap[str, Any]) -> Dict[str, Any]:
+	return await _run_for_workers(
+		DotMap(options),
+		lambda supervisor, worker_id: supervisor.start_worker(worker_id)
 	)
-	gateway_connections_content = load(gateway_connections_absolute_file_path)
 
-	gateway_networks_absolute_file_path = (
-		absolute_configuration_path + "gateway_network.json"
-		if absolute_configuration_path[-1] == "/"
-		else absolute_configuration_path + "/gateway_network.json"
+
+@runtime_rpc
+async def strategy_workers_stop(options: DotMap[str, Any]) -> Dict[str, Any]:
+	return await _run_for_workers(
+		DotMap(options),
+		lambda supervisor, worker_id: supervisor.stop_worker(worker_id)
 	)
-	gateway_network_content = load(gateway_networks_absolute_file_path)
 
-	connector_name = chains_connector_specification[params["chain"].upper()]["CONNECTOR"].value
-	chain = params["chain"]
 
-	if params["subpath"] == "wallet/add":
-		# Updating gateway_connections.json
-		new_connector_specification: List[Dict[str, str]] = []
-
-		for network in chains_connector_specification[params["chain"].upper()]["NETWORK"].value:
-			new_connector_specification.append({
-				"connector": connector_name,
-				"chain": chain,
-				"network": network,
-				"trading_type": chains_connector_specification[params["chain"].upper()]["TRADING_TYPE"].value,
-				"chain_type": chains_connector_specification[params["chain"].upper()]["CHAIN_TYPE"].value,
-				"wallet_address": params["publickey"],
-				"additional_spenders": chains_connector_specification[params["chain"].upper()]["ADDITIONAL_SPENDERS"].value,
-				"additional_prompt_values": chains_connector_specification[params["chain"].upper()]["ADDITIONAL_PROMPT_VALUES"].value
-			})
-
-		for spec in new_connector_specification:
-			updated: bool = False
-			network = spec["network"]
-
-			for i, c in enumerate(gateway_connections_content):
-				if c["connector"] == connector_name and c["chain"] == chain and c["network"] == network:
-					gateway_connections_content[i] = spec
-					updated = True
-					break
-
-			if updated is False:
-				gateway_connections_content.append(spec)
-
-		# Updating gateway_networks.json
-		for chain_network in chains_connector_specification[params["chain"].upper()]["CHAIN_NETWORKS"].value:
-			new_network_specification: Dict[str, str] = {
-				"chain_network": chain_network,
-			}
+@runtime_rpc
+async def strategy_workers_status(options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Returns the status of the listed workers or, without a list, of every worker of every running supervisor.
+	"""
+	options = DotMap(options)
+
+	if options.get("workers"):
+		items = _get_workers_options(options)
+	else:
+		items = []
+		for (full_id, supervisor) in list(processes.items()):
+			if supervisor:
+				for worker_id in supervisor.get_workers_ids():
+					(strategy, version, id) = full_id.split(":", 2)
+					items.append(DotMap({
+						"strategy": strategy,
+						"version": version,
+						"id": id,
+						"worker_id": worker_id,
+					}))
+
+	results = []
+	for item in items:
+		result = {}
 
-			updated: bool = False
+		try:
+			worker_options = _sanitize_worker_options(item, result)
+
+			if processes.get(worker_options.full_id):
+				result.update(processes[worker_options.full_id].worker_status(worker_options.worker_id).toDict())
+			else:
+				result["message"] = f"Supervisor {worker_options.full_id} is not running"
+		except Exception as exception:
+			logger.ignore_exception(exception)
 
-			for i, c in enumerate(gateway_network_content):
-				if c["chain_network"] == chain_network:
-					gateway_network_content[i] = new_network_specification
-					updated = True
-					break
+			result["message"] = str(exception)
 
-			if updated is False:
-				gateway_network_content.append(new_network_specification)
+		results.append(result)
 
-		# Updating gateway_networks.json - Adding tokens to watch
-		tokens = chains_connector_specification[params["chain"].upper()]["TOKENS"].value
+	return {
+		"results": results
+	}
 
-		network_found = False
 
-		for chain_network in chains_connector_specification[params["chain"].upper()]["CHAIN_NETWORKS"].value:
-			for network in gateway_network_content:
-				if network.get("chain_network") == chain_network:
-					network['tokens'] = tokens
-					network_found = True
-					break
-			if not network_found:
-				new_network = {
-					"chain_network": chain_network,
-					"tokens": tokens
-				}
-				gateway_network_content.append(new_network)
+@runtime_rpc
+async def profile(options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Profiles the process running the strategies for the given duration, see core.profiler.
+	"""
+	options = DotMap(options)
+
+	return await profiler.profile(
+		duration=float(options.get("duration", properties.get_or_default("system.profiler.duration", 10))),
+		format=options.get("format", "collapsed"),
+		interval=float(options.interval) if options.get("interval") else None,
+		limit=int(options.limit) if options.get("limit") else None,
+	)
+
+
+@runtime_rpc
+async def history(options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Returns the recorded ticks, orders, fills or balances of a worker or a market within a time range.
+	"""
+	options = DotMap(options)
+
+	rows = await asyncio.get_running_loop().run_in_executor(
+		None,
+		lambda: tick_history.query(
+			options.get("table", "ticks"),
+			worker=options.get("worker"),
+			market=options.get("market"),
+			start=float(options.start) if options.get("start") is not None else None,
+			end=float(options.end) if options.get("end") is not None else None,
+			limit=int(options.limit) if options.get("limit") else None,
+		)
+	)
+
+	return {
+		"rows": rows
+	}
+
+
+@runtime_rpc
+async def series(options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Returns a time series of a worker (wallet_value, token_price, pnl, pnl_in_usd or gas_in_usd) within a time range.
+	"""
+	options = DotMap(options)
+
+	result = await asyncio.get_running_loop().run_in_executor(
+		None,
+		lambda: time_series.query(
+			options.worker,
+			options.metric,
+			start=float(options.start) if options.get("start") is not None else None,
+			end=float(options.end) if options.get("end") is not None else None,
+			resolution=float(options.resolution) if options.get("resolution") is not None else None,
+		)
+	)
+
+	return time_series.to_json(result)
+
+
+@runtime_rpc
+async def watchdog_status(options: DotMap[str, Any]) -> Dict[str, Any]:
+	"""
+	Returns the calls that blocked the event loop of the process running the strategies, optionally clearing them.
+	"""
+	report = loop_watchdog.get_report()
+
+	if DotMap(options).get("clear"):
+		loop_watchdog.clear()
+
+	return {
+		"stacks": report
+	}
+
+
+async def websocket_log(options: Any) -> AsyncGenerator[str | bytes, None]:
+	"""
+	Streams the lines of a log source in batches.
+
+	Batches are plain text, unless a compression was requested and the batch is large enough, in which case
+	they are compressed bytes.
+	"""
+	batch_size = int(properties.get_or_default("system.logs.batch.size", 200))
+	batch_delay = properties.get_or_default("system.logs.batch.delay", 100)
+	if options.get("batch"):
+		if options.batch.get("size") is not None:
+			if int(options.batch.size) <= 0:
+				raise ValueError(f"""Invalid batch size {options.batch.size}, it must be greater than 0.""")
 
+			batch_size = min(int(options.batch.size), batch_size)
+
+		if options.batch.get("delay") is not None:
+			if int(options.batch.delay) < 0:
+				raise ValueError(f"""Invalid batch delay {options.batch.delay}, it can not be negative.""")
+
+			batch_delay = int(options.batch.delay)
+	batch_delay = batch_delay / 1000.0
+
+	compression = options.get("compression")
+	if compression and compression not in LOG_COMPRESSIONS:
+		raise ValueError(f"""Unknown compression "{compression}".""")
+	compression_minimum_size = int(properties.get_or_default("system.logs.compression.minimum_size", 1024))
+
+	subscription = log_broadcaster.subscribe(options.id, LogFilter.from_options(options))
+
+	try:
+		while True:
+			lines = await subscription.get_batch(batch_size, batch_delay)
+
+			# An empty batch means the source was closed and everything pending was already sent.
+			if not lines:
+				break
+
+			if subscription.filter and subscription.filter.skipped:
+				lines.insert(0, f"[{subscription.filter.skipped} lines skipped by the rate limit]")
+				subscription.filter.skipped = 0
+
+			if subscription.dropped:
+				lines.insert(0, f"[{subscription.dropped} lines dropped]")
+				subscription.dropped = 0
+
+			message = "\n".join(lines)
+
+			if compression:
+				encoded = message.encode()
+
+				if len(encoded) >= compression_minimum_size:
+					yield LOG_COMPRESSIONS[compression](encoded)
+
+					continue
+
+			yield message
+	finally:
+		log_broadcaster.unsubscribe(subscription)
+
+
+def update_gateway_connections(params: Any):
+	specification = chains_connector_specification[params["chain"].upper()]
+
+	if params["subpath"] == "wallet/add":
+		gateway_connections.add_wallet(specification, params["chain"], params["publickey"])
 	elif params["subpath"] == "wallet/remove":
-		# Updating gateway_connections.json
-		gateway_connections_content = [
-			c for c in gateway_connections_content if not (
-				c["chain"] == chain and c["wallet_address"] == params["address"]
-			)
-		]
-
-		# Updating gateway_networks.json
-		for chain_network in chains_connector_specification[params["chain"].upper()]["CHAIN_NETWORKS"].value:
-			for i, c in enumerate(gateway_network_content):
-				if c["chain_network"] == chain_network:
-					gateway_network_content.remove(c)
-
-	save(gateway_connections_absolute_file_path, gateway_connections_content)
-	save(gateway_networks_absolute_file_path, gateway_network_content)
+		gateway_connections.remove_wallet(specification, params["chain"], params["address"])
 
 
 async def test(options: DotMap[str, Any]) -> DotMap[str, Any]:
@@ -5,7 +5,8 @@ from core.properties import properties
 
 
 class Database(object):
-	def __init__(self):
+	def __init__(self, path: str = None):
+		self.path = path
 		self.connection = None
 		self.connect()
 
@@ -16,7 +17,7 @@ class Database(object):
 
 	def connect(self):
 		if self.connection is None:
-			database_path = os.path.join(properties.get('app_root_path'), properties.get('database.relative_path'))
+			database_path = self.path or os.path.join(properties.get('app_root_path'), properties.get('database.relative_path'))
 
 			self.connection = sqlite3.connect(database_path)
 
@@ -26,8 +27,14 @@ class Database(object):
 	def normal_row_factory(self):
 		self.connection.row_factory = None
 
-	def execute(self, query):
-		return self.connection.cursor().execute(query)
+	def execute(self, query, parameters=()):
+		return self.connection.cursor().execute(query, parameters)
+
+	def execute_many(self, query, rows):
+		return self.connection.cursor().executemany(query, rows)
+
+	def execute_script(self, script):
+		return self.connection.executescript(script)
 
 	def commit(self):
 		self.connection.commit()
@@ -7,9 +7,15 @@ import traceback
 from functools import wraps
 from typing import Any
 
+from core.metrics import metrics
+
+retry_failures = metrics.counter("retry_failures_total", "Failed attempts of the functions with automatic retries.")
+retry_exhaustions = metrics.counter("retry_exhausted_total", "Calls that failed after all their automatic retries.")
+
 
 def automatic_retry_with_timeout(retries=1, delay=0, timeout=None):
 	def decorator(func):
+		@wraps(func)
 		async def wrapper(*args, **kwargs):
 			errors = []
 			number_of_retries = range(retries)
@@ -18,6 +24,8 @@ def automatic_retry_with_timeout(retries=1, delay=0, timeout=None):
 					result = await asyncio.wait_for(func(*args, **kwargs), timeout=timeout)
 					return result
 				except Exception as exception:
+					retry_failures.inc(function=func.__qualname__)
+
 					if i == number_of_retries:
 						error = traceback.format_exception(exception)
 					else:
@@ -27,6 +35,8 @@ def automatic_retry_with_timeout(retries=1, delay=0, timeout=None):
 
 					await asyncio.sleep(delay)
 
+			retry_exhaustions.inc(function=func.__qualname__)
+
 			error_message = f"Function failed after {retries} attempts. Here are the errors:\n" + "\n".join(errors)
 
 			raise Exception(error_message)
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+ConnectionKey = Tuple[str, str, str]
+
+CONNECTIONS_FILE_NAME = "gateway_connections.json"
+NETWORKS_FILE_NAME = "gateway_network.json"
+
+
+class _JsonListFile(object):
+	"""
+	A JSON list file that is only read again when somebody else changed it and is replaced atomically on save.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self._signature: Optional[Tuple[int, int]] = None
+
+	def _get_signature(self) -> Optional[Tuple[int, int]]:
+		try:
+			stat = os.stat(self.path)
+
+			return stat.st_mtime_ns, stat.st_size
+		except FileNotFoundError:
+			return None
+
+	def is_stale(self) -> bool:
+		return self._get_signature() != self._signature
+
+	def load(self) -> List[Dict[str, Any]]:
+		self._signature = self._get_signature()
+
+		if self._signature is None:
+			return []
+
+		with open(self.path) as file:
+			try:
+				content = json.load(file)
+			except json.JSONDecodeError:
+				return []
+
+		return content if isinstance(content, list) else []
+
+	def save(self, content: List[Dict[str, Any]]):
+		directory = os.path.dirname(self.path)
+		os.makedirs(directory, exist_ok=True)
+
+		(descriptor, temporary_path) = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+		try:
+			with os.fdopen(descriptor, "w") as file:
+				json.dump(content, file)
+				file.flush()
+				os.fsync(file.fileno())
+
+			if os.path.exists(self.path):
+				os.chmod(temporary_path, os.stat(self.path).st_mode & 0o777)
+
+			os.replace(temporary_path, self.path)
+		except BaseException:
+			try:
+				os.remove(temporary_path)
+			except FileNotFoundError:
+				pass
+
+			raise
+
+		self._signature = self._get_signature()
+
+
+@ThreadSafeSingleton
+class GatewayConnections(object):
+	"""
+	In-memory model of the Hummingbot client gateway_connections.json and gateway_network.json files.
+
+	Connections are indexed by (connector, chain, network) and by (chain, wallet address), networks by their
+	chain_network, so adding or removing a wallet does not depend on the size of the files. Changes are written
+	to disk after a short debounce, outside of the event loop, so a burst of wallet updates results in a single
+	write per file.
+	"""
+
+	def __init__(self):
+		self._lock = threading.RLock()
+		self._write_lock = threading.Lock()
+		self._connections_file: Optional[_JsonListFile] = None
+		self._networks_file: Optional[_JsonListFile] = None
+		self._connections: Dict[ConnectionKey, Dict[str, Any]] = {}
+		self._connections_by_wallet: Dict[Tuple[str, str], Set[ConnectionKey]] = {}
+		self._networks: Dict[str, Dict[str, Any]] = {}
+		# Entries without the indexed fields are kept as they are.
+		self._unindexed_connections: List[Dict[str, Any]] = []
+		self._unindexed_networks: List[Dict[str, Any]] = []
+		self._dirty = False
+		self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+	def _get_path(self, file_name: str) -> str:
+		return os.path.join(os.path.expanduser(str(properties.get("hummingbot.client.configuration_path"))), file_name)
+
+	def _ensure_loaded(self):
+		connections_path = self._get_path(CONNECTIONS_FILE_NAME)
+		networks_path = self._get_path(NETWORKS_FILE_NAME)
+
+		if not self._connections_file or self._connections_file.path != connections_path:
+			self._connections_file = _JsonListFile(connections_path)
+			self._networks_file = _JsonListFile(networks_path)
+			self._dirty = False
+
+		# Pending changes win over a file that was modified meanwhile, as it happened before.
+		if self._dirty:
+			return
+
+		if self._connections_file.is_stale():
+			self._index_connections(self._connections_file.load())
+
+		if self._networks_file.is_stale():
+			self._index_networks(self._networks_file.load())
+
+	def _index_connections(self, content: List[Dict[str, Any]]):
+		self._connections = {}
+		self._connections_by_wallet = {}
+		self._unindexed_connections = []
+
+		for connection in content:
+			if not isinstance(connection, dict) or not all(key in connection for key in ("connector", "chain", "network")):
+				self._unindexed_connections.append(connection)
+			else:
+				self._put_connection(connection)
+
+	def _index_networks(self, content: List[Dict[str, Any]]):
+		self._networks = {}
+		self._unindexed_networks = []
+
+		for network in content:
+			if not isinstance(network, dict) or "chain_network" not in network:
+				self._unindexed_networks.append(network)
+			else:
+				self._networks[network["chain_network"]] = network
+
+	def _put_connection(self, connection: Dict[str, Any]):
+		key = (connection["connector"], connection["chain"], connection["network"])
+
+		previous = self._connections.get(key)
+		if previous:
+			self._connections_by_wallet.get((previous["chain"], previous.get("wallet_address")), set()).discard(key)
+
+		self._connections[key] = connection
+		self._connections_by_wallet.setdefault((connection["chain"], connection.get("wallet_address")), set()).add(key)
+
+	def get_connection(self, connector: str, chain: str, network: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			self._ensure_loaded()
+
+			return self._connections.get((connector, chain, network))
+
+	def get_network(self, chain_network: str) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			self._ensure_loaded()
+
+			return self._networks.get(chain_network)
+
+	def add_wallet(self, specification: Any, chain: str, address: str):
+		with self._lock:
+			self._ensure_loaded()
+
+			connector = specification["CONNECTOR"].value
+
+			for network in specification["NETWORK"].value:
+				self._put_connection({
+					"connector": connector,
+					"chain": chain,
+					"network": network,
+					"trading_type": specification["TRADING_TYPE"].value,
+					"chain_type": specification["CHAIN_TYPE"].value,
+					"wallet_address": address,
+					"additional_spenders": specification["ADDITIONAL_SPENDERS"].value,
+					"additional_prompt_values": specification["ADDITIONAL_PROMPT_VALUES"].value
+				})
+
+			for chain_network in specification["CHAIN_NETWORKS"].value:
+				self._networks[chain_network] = {
+					"chain_network": chain_network,
+					"tokens": specification["TOKENS"].value,
+				}
+
+			self._dirty = True
+
+		self._schedule_flush()
+
+	def remove_wallet(self, specification: Any, chain: str, address: str):
+		with self._lock:
+			self._ensure_loaded()
+
+			for key in self._connections_by_wallet.pop((chain, address), set()):
+				self._connections.pop(key, None)
+
+			for chain_network in specification["CHAIN_NETWORKS"].value:
+				self._networks.pop(chain_network, None)
+
+			self._dirty = True
+
+		self._schedule_flush()
+
+	def _schedule_flush(self, delay: float = None):
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			self.flush()
+
+			return
+
+		if delay is None:
+			delay = properties.get_or_default("hummingbot.client.gateway_connections.delay", 500)
+
+		with self._lock:
+			if self._flush_handle is None:
+				self._flush_handle = loop.call_later(
+					delay / 1000.0,
+					lambda: loop.run_in_executor(None, self.flush).add_done_callback(self._on_flushed)
+				)
+
+	def _on_flushed(self, future: asyncio.Future):
+		# A failed write is retried later, instead of waiting for the next change or the shutdown.
+		if not future.cancelled() and future.exception() is None and not future.result():
+			self._schedule_flush(properties.get_or_default("hummingbot.client.gateway_connections.retry_delay", 5000))
+
+	def flush(self) -> bool:
+		"""
+		Writes the pending changes, if any, to both files, and returns False when they could not be written.
+		"""
+		with self._write_lock:
+			with self._lock:
+				self._flush_handle = None
+
+				if not self._dirty:
+					return True
+
+				connections = self._unindexed_connections + list(self._connections.values())
+				networks = self._unindexed_networks + list(self._networks.values())
+				(connections_file, networks_file) = (self._connections_file, self._networks_file)
+
+				self._dirty = False
+
+			try:
+				connections_file.save(connections)
+				networks_file.save(networks)
+			except Exception as exception:
+				with self._lock:
+					self._dirty = True
+
+				# noinspection PyUnresolvedReferences
+				from core.logger import logger
+				logger.ignore_exception(exception)
+
+				return False
+
+			return True
+
+
+gateway_connections = GatewayConnections.instance()
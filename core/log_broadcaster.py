@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+
+LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b")
+LEVEL_SEARCH_LENGTH = 64
+
+
+class LogFilter(object):
+	"""
+	Server-side selection of the lines a client is interested in.
+
+	Lines without a level of their own (tracebacks, dumped objects) follow the decision taken for the last
+	line that had one. The rate cap is a token bucket in lines per second, holding at least one line so rates below
+	one line per second still let lines through, lines above it are counted as skipped.
+	"""
+
+	def __init__(
+		self,
+		level: Optional[int] = None,
+		worker: Optional[str] = None,
+		pattern: Optional[str] = None,
+		contains: Optional[str] = None,
+		rate: Optional[float] = None,
+	):
+		self.level = level
+		self.worker = re.compile(rf"(?<!\S){re.escape(worker)}(?!\S)") if worker else None
+		self.pattern = re.compile(pattern) if pattern else None
+		self.contains = contains
+		self.rate = rate
+		self.skipped = 0
+
+		self._accepting = True
+		self._tokens = max(rate, 1.0) if rate else 0.0
+		self._last_refill = time.monotonic()
+
+	@staticmethod
+	def from_options(options: Any) -> Optional["LogFilter"]:
+		level = options.get("level")
+		if isinstance(level, str):
+			level = logging.getLevelName(level.upper())
+			if not isinstance(level, int):
+				raise ValueError(f"""Unknown log level "{options.level}".""")
+
+		output = LogFilter(
+			level=level,
+			worker=options.get("worker"),
+			pattern=options.get("pattern"),
+			contains=options.get("contains"),
+			rate=float(options.rate) if options.get("rate") else None,
+		)
+
+		if output.is_empty():
+			return None
+
+		return output
+
+	def is_empty(self) -> bool:
+		return not (self.level or self.worker or self.pattern or self.contains or self.rate)
+
+	def accept(self, line: str) -> bool:
+		match = LEVEL_PATTERN.search(line, 0, LEVEL_SEARCH_LENGTH)
+		if match:
+			self._accepting = self._matches(line, match.group(1))
+
+		if not self._accepting:
+			return False
+
+		if self.rate and not self._take_token():
+			self.skipped += 1
+
+			return False
+
+		return True
+
+	def _matches(self, line: str, level: str) -> bool:
+		if self.level and logging.getLevelName(level if level != "FATAL" else "CRITICAL") < self.level:
+			return False
+
+		if self.worker and not self.worker.search(line):
+			return False
+
+		if self.contains and self.contains not in line:
+			return False
+
+		if self.pattern and not self.pattern.search(line):
+			return False
+
+		return True
+
+	def _take_token(self) -> bool:
+		now = time.monotonic()
+		self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._last_refill) * self.rate)
+		self._last_refill = now
+
+		if self._tokens < 1:
+			return False
+
+		self._tokens -= 1
+
+		return True
+
+
+class LogSubscription(object):
+	"""
+	A bounded per-client queue of lines.
+
+	When the client can not keep up, the oldest pending lines are dropped and counted instead of blocking
+	the source or growing without limit.
+	"""
+
+	def __init__(self, source: "LogSource", maximum_size: int, filter: Optional[LogFilter] = None):
+		self.source = source
+		self.filter = filter
+		self._lines: Deque[str] = deque()
+		self._maximum_size = maximum_size
+		self._event = asyncio.Event()
+		self.dropped = 0
+		self.closed = False
+
+	def put(self, line: str):
+		if self.filter and not self.filter.accept(line):
+			return
+
+		if len(self._lines) >= self._maximum_size:
+			self._lines.popleft()
+			self.dropped += 1
+
+		self._lines.append(line)
+		self._event.set()
+
+	def close(self):
+		self.closed = True
+		self._event.set()
+
+	async def get_batch(self, maximum_size: int, maximum_delay: float) -> List[str]:
+		"""
+		Waits for at least one line and then keeps collecting until the batch is full or the delay expires.
+		"""
+		while not self._lines and not self.closed:
+			self._event.clear()
+			await self._event.wait()
+
+		deadline = time.monotonic() + maximum_delay
+		while len(self._lines) < maximum_size and not self.closed:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				break
+
+			self._event.clear()
+			try:
+				await asyncio.wait_for(self._event.wait(), timeout=remaining)
+			except asyncio.TimeoutError:
+				break
+
+		batch = []
+		while self._lines and len(batch) < maximum_size:
+			batch.append(self._lines.popleft())
+
+		return batch
+
+
+class LogSource(object):
+	"""
+	Runs a single tail command for a log source and fans its lines out to every subscription.
+
+	The most recent lines are kept in a ring buffer, so clients that join late receive them first.
+	"""
+
+	def __init__(self, id: str, command: str, history_size: int, idle_timeout: float):
+		self.id = id
+		self._command = command
+		self._history: Deque[str] = deque(maxlen=history_size)
+		self._idle_timeout = idle_timeout
+		self._subscriptions: Set[LogSubscription] = set()
+		self._process: Optional[asyncio.subprocess.Process] = None
+		self._task: Optional[asyncio.Task] = None
+		self._idle_task: Optional[asyncio.Task] = None
+
+	def subscribe(self, queue_size: int, filter: Optional[LogFilter] = None) -> LogSubscription:
+		if self._idle_task:
+			self._idle_task.cancel()
+			self._idle_task = None
+
+		subscription = LogSubscription(self, queue_size, filter)
+		for line in self._history:
+			subscription.put(line)
+
+		self._subscriptions.add(subscription)
+
+		if not self._task or self._task.done():
+			self._task = asyncio.create_task(self._tail())
+
+		return subscription
+
+	def unsubscribe(self, subscription: LogSubscription):
+		subscription.close()
+		self._subscriptions.discard(subscription)
+
+		if not self._subscriptions and not self._idle_task:
+			self._idle_task = asyncio.create_task(self._stop_when_idle())
+
+	async def _tail(self):
+		try:
+			self._process = await asyncio.create_subprocess_shell(
+				self._command,
+				stdout=asyncio.subprocess.PIPE,
+				stderr=asyncio.subprocess.DEVNULL,
+			)
+
+			while True:
+				line = await self._process.stdout.readline()
+				if not line:
+					break
+
+				line = line.decode(errors="replace").strip()
+
+				self._history.append(line)
+				for subscription in self._subscriptions:
+					subscription.put(line)
+		except asyncio.CancelledError:
+			self._kill()
+
+			raise
+		except Exception as exception:
+			# noinspection PyUnresolvedReferences
+			from core.logger import logger
+			logger.ignore_exception(exception)
+
+		self._kill()
+
+		# The command finished by itself, so the current clients are done with this source.
+		self._close()
+
+	async def _stop_when_idle(self):
+		try:
+			await asyncio.sleep(self._idle_timeout)
+		except asyncio.CancelledError:
+			return
+
+		self._idle_task = None
+
+		if not self._subscriptions:
+			await self.stop()
+
+	async def stop(self):
+		if self._task:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+
+		self._close()
+
+	def _close(self):
+		for subscription in self._subscriptions:
+			subscription.close()
+		self._subscriptions.clear()
+
+		# A restarted tail replays its own backlog, so the history is rebuilt from it.
+		self._history.clear()
+
+	def _kill(self):
+		if self._process and self._process.returncode is None:
+			try:
+				self._process.kill()
+			except ProcessLookupError:
+				pass
+
+		self._process = None
+
+
+@ThreadSafeSingleton
+class LogBroadcaster(object):
+
+	def __init__(self):
+		self._sources: Dict[str, LogSource] = {}
+
+	def subscribe(self, id: str, filter: Optional[LogFilter] = None) -> LogSubscription:
+		source = self._sources.get(id)
+
+		if not source:
+			source = LogSource(
+				id,
+				str(properties.get(f"system.commands.log.{id}")),
+				int(properties.get_or_default("system.logs.history_size", 1000)),
+				properties.get_or_default("system.logs.idle_timeout", 60000) / 1000.0,
+			)
+
+			self._sources[id] = source
+
+		return source.subscribe(int(properties.get_or_default("system.logs.queue_size", 10000)), filter)
+
+	def unsubscribe(self, subscription: LogSubscription):
+		subscription.source.unsubscribe(subscription)
+
+	async def stop(self):
+		for source in self._sources.values():
+			await source.stop()
+
+		self._sources.clear()
+
+
+log_broadcaster = LogBroadcaster.instance()
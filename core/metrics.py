@@ -0,0 +1,230 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from singleton.singleton import ThreadSafeSingleton
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _get_labels(labels: Dict[str, object]) -> Labels:
+	return tuple(sorted((key, str(value)) for (key, value) in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+	items = list(labels) + ([extra] if extra else [])
+	if not items:
+		return ""
+
+	escaped = (
+		f'''{key}="{value.replace(chr(92), chr(92) * 2).replace('"', chr(92) + '"').replace(chr(10), chr(92) + "n")}"'''
+		for (key, value) in items
+	)
+
+	return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(object):
+	TYPE = ""
+
+	def __init__(self, name: str, help: str):
+		self.name = name
+		self.help = help
+
+	def render(self) -> List[str]:
+		raise NotImplementedError
+
+
+class Counter(Metric):
+	TYPE = "counter"
+
+	def __init__(self, name: str, help: str):
+		super().__init__(name, help)
+		self._values: Dict[Labels, float] = {}
+		self._lock = threading.Lock()
+
+	def inc(self, amount: float = 1, **labels):
+		key = _get_labels(labels)
+
+		with self._lock:
+			self._values[key] = self._values.get(key, 0) + amount
+
+	def get(self, **labels) -> float:
+		return self._values.get(_get_labels(labels), 0)
+
+	def render(self) -> List[str]:
+		with self._lock:
+			return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for (labels, value) in self._values.items()]
+
+
+class Gauge(Counter):
+	TYPE = "gauge"
+
+	def set(self, value: float, **labels):
+		key = _get_labels(labels)
+
+		with self._lock:
+			self._values[key] = value
+
+	def dec(self, amount: float = 1, **labels):
+		self.inc(-amount, **labels)
+
+
+class _HistogramValues(object):
+	"""
+	Log-linear buckets in the spirit of HDR histograms: every power of two is split into a fixed number of linear
+	sub-buckets, so the relative error is bounded and the memory does not depend on the number of samples.
+	"""
+
+	def __init__(self, sub_buckets: int):
+		self.sub_buckets = sub_buckets
+		self.buckets: Dict[int, int] = {}
+		self.count = 0
+		self.sum = 0.0
+		self.minimum = math.inf
+		self.maximum = -math.inf
+
+	def _get_index(self, value: float) -> int:
+		if value <= 0:
+			return -(2 ** 31)
+
+		(mantissa, exponent) = math.frexp(value)
+
+		return exponent * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets)
+
+	def _get_upper_bound(self, index: int) -> float:
+		if index == -(2 ** 31):
+			return 0.0
+
+		(exponent, sub_bucket) = divmod(index, self.sub_buckets)
+
+		return math.ldexp(1 + (sub_bucket + 1) / self.sub_buckets, exponent - 1)
+
+	def observe(self, value: float):
+		index = self._get_index(value)
+		self.buckets[index] = self.buckets.get(index, 0) + 1
+		self.count += 1
+		self.sum += value
+		self.minimum = min(self.minimum, value)
+		self.maximum = max(self.maximum, value)
+
+	def get_quantile(self, quantile: float) -> float:
+		if not self.count:
+			return math.nan
+
+		rank = quantile * self.count
+		seen = 0
+		for index in sorted(self.buckets.keys()):
+			seen += self.buckets[index]
+			if seen >= rank:
+				return min(self._get_upper_bound(index), self.maximum)
+
+		return self.maximum
+
+
+class Histogram(Metric):
+	"""
+	Exposed as a Prometheus summary with precomputed quantiles, plus the sum and the count of the samples.
+	"""
+
+	TYPE = "summary"
+	QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+	def __init__(self, name: str, help: str, sub_buckets: int = 16):
+		super().__init__(name, help)
+		self._sub_buckets = sub_buckets
+		self._values: Dict[Labels, _HistogramValues] = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value: float, **labels):
+		key = _get_labels(labels)
+
+		with self._lock:
+			values = self._values.get(key)
+			if values is None:
+				values = self._values[key] = _HistogramValues(self._sub_buckets)
+
+			values.observe(value)
+
+	def get_quantile(self, quantile: float, **labels) -> float:
+		values = self._values.get(_get_labels(labels))
+
+		return values.get_quantile(quantile) if values else math.nan
+
+	@contextmanager
+	def time(self, **labels) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start, **labels)
+
+	def render(self) -> List[str]:
+		output = []
+
+		with self._lock:
+			for (labels, values) in self._values.items():
+				for quantile in self.QUANTILES:
+					output.append(f"{self.name}{_format_labels(labels, ('quantile', str(quantile)))} {_format_value(values.get_quantile(quantile))}")
+
+				output.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values.sum)}")
+				output.append(f"{self.name}_count{_format_labels(labels)} {values.count}")
+
+		return output
+
+
+@ThreadSafeSingleton
+class Metrics(object):
+	"""
+	In-process registry of counters, gauges and histograms, rendered in the Prometheus text format.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._metrics: Dict[str, Metric] = {}
+
+	def _get_or_create(self, kind: type, name: str, help: str) -> Metric:
+		metric = self._metrics.get(name)
+
+		if metric is None:
+			with self._lock:
+				metric = self._metrics.get(name)
+				if metric is None:
+					metric = self._metrics[name] = kind(name, help)
+
+		if not isinstance(metric, kind):
+			raise ValueError(f"""Metric "{name}" is already registered as a {metric.TYPE}.""")
+
+		return metric
+
+	def counter(self, name: str, help: str = "") -> Counter:
+		return self._get_or_create(Counter, name, help)
+
+	def gauge(self, name: str, help: str = "") -> Gauge:
+		return self._get_or_create(Gauge, name, help)
+
+	def histogram(self, name: str, help: str = "") -> Histogram:
+		return self._get_or_create(Histogram, name, help)
+
+	def render(self) -> str:
+		lines = []
+
+		for metric in list(self._metrics.values()):
+			if metric.help:
+				lines.append(f"# HELP {metric.name} {metric.help}")
+			lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+			lines.extend(metric.render())
+
+		return "\n".join(lines) + "\n"
+
+
+metrics = Metrics.instance()
@@ -0,0 +1,155 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+FORMATS = ("collapsed", "pstats")
+
+# Frames of the event loop machinery, shown as "[idle]" when nothing else runs on the loop.
+IDLE_FUNCTIONS = {"select", "poll", "_run_once"}
+
+
+def _format_frame(frame: FrameType) -> str:
+	code = frame.f_code
+
+	return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def get_stack(frame: Optional[FrameType], root: Optional[FrameType] = None) -> List[str]:
+	"""
+	Returns the stack from its root to the given frame, starting at the root frame when it is part of the stack.
+	"""
+	stack = []
+
+	while frame is not None:
+		stack.append(_format_frame(frame))
+
+		if frame is root:
+			break
+
+		frame = frame.f_back
+
+	stack.reverse()
+
+	return stack
+
+
+class ProfilerException(Exception):
+	pass
+
+
+@ThreadSafeSingleton
+class Profiler(object):
+	"""
+	On-demand profiler of the event loop of this process, nothing is installed while no session is running.
+
+	The "collapsed" format samples the stack of the loop thread from a separate thread and attributes each sample to
+	the running task, as "[task <name>]" followed by the frames of its coroutine, for example Worker.on_tick.
+	The output is one "frame;frame;... count" line per stack, ready for flame graph tools.
+	The "pstats" format runs cProfile on the loop thread for the duration of the session and returns its report.
+	"""
+
+	def __init__(self):
+		self._running = False
+
+	async def profile(self, duration: float, format: str = "collapsed", interval: float = None, limit: int = None) -> Dict[str, Any]:
+		if format not in FORMATS:
+			raise ProfilerException(f"""Unknown format "{format}", the supported ones are: {", ".join(FORMATS)}.""")
+
+		maximum_duration = properties.get_or_default("system.profiler.maximum_duration", 120)
+		if not 0 < duration <= maximum_duration:
+			raise ProfilerException(f"The duration must be greater than 0 and up to {maximum_duration} seconds.")
+
+		if self._running:
+			raise ProfilerException("A profiling session is already running.")
+
+		self._running = True
+		try:
+			if format == "pstats":
+				(output, samples) = await self._run_deterministic(duration, limit)
+			else:
+				(output, samples) = await self._run_sampling(duration, interval, limit)
+		finally:
+			self._running = False
+
+		return {
+			"format": format,
+			"duration": duration,
+			"samples": samples,
+			"output": output,
+		}
+
+	async def _run_sampling(self, duration: float, interval: Optional[float], limit: Optional[int]) -> Tuple[str, int]:
+		if interval is None:
+			interval = properties.get_or_default("system.profiler.interval", 10)
+		interval = max(float(interval), 1) / 1000.0
+
+		loop = asyncio.get_running_loop()
+		thread_id = threading.get_ident()
+		stacks: Counter[str] = Counter()
+		stop = threading.Event()
+
+		def sample():
+			deadline = time.monotonic() + duration
+
+			while not stop.is_set() and time.monotonic() < deadline:
+				frame = sys._current_frames().get(thread_id)
+				task = asyncio.current_task(loop)
+
+				if task is not None:
+					coroutine = task.get_coro()
+					stack = [f"[task {task.get_name()}]"] + get_stack(frame, getattr(coroutine, "cr_frame", None))
+				elif frame is not None and frame.f_code.co_name in IDLE_FUNCTIONS:
+					stack = ["[idle]"]
+				else:
+					stack = get_stack(frame)
+
+				stacks[";".join(stack)] += 1
+
+				stop.wait(interval)
+
+		sampler = threading.Thread(target=sample, name="profiler", daemon=True)
+		sampler.start()
+
+		try:
+			await asyncio.sleep(duration)
+		finally:
+			stop.set()
+			await loop.run_in_executor(None, sampler.join)
+
+		lines = [f"{stack} {count}" for (stack, count) in stacks.most_common(limit)]
+
+		return "\n".join(lines) + "\n", sum(stacks.values())
+
+	@staticmethod
+	async def _run_deterministic(duration: float, limit: Optional[int]) -> Tuple[str, int]:
+		if limit is None:
+			limit = properties.get_or_default("system.profiler.limit", 50)
+
+		# Enabled from a coroutine, so it profiles the thread of the event loop.
+		profile = cProfile.Profile()
+		profile.enable()
+		try:
+			await asyncio.sleep(duration)
+		finally:
+			profile.disable()
+
+		stream = io.StringIO()
+		statistics = pstats.Stats(profile, stream=stream)
+		statistics.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+
+		return stream.getvalue(), statistics.total_calls
+
+
+profiler = Profiler.instance()
@@ -1,4 +1,8 @@
 import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Tuple
 
 import yaml
 from singleton.singleton import ThreadSafeSingleton
@@ -7,10 +11,83 @@ from core.constants import constants
 from core.utils import deep_merge
 from core.extensions import DotMap
 
+_MISSING = object()
+_UNCACHED = object()
+
+
+@lru_cache(maxsize=4096)
+def _compile_key(key: str) -> Tuple[Tuple[str, ...], str, str]:
+	"""
+	Splits a dotted key once and precomputes the environment variable names used as fallback.
+	"""
+	environment_key = key.replace('.', '_')
+
+	return tuple(key.split('.')), environment_key, environment_key.upper()
+
+
+def _shallow_copy(node: Any) -> Any:
+	if isinstance(node, DotMap):
+		output = DotMap({}, _dynamic=node._dynamic)
+		output._map = OrderedDict(node._map)
+
+		return output
+
+	return dict(node)
+
+
+def _copy_on_write_set(node: Any, path: Tuple[str, ...], value: Any) -> Any:
+	"""
+	Returns a copy of the node with the value set at the path, copying only the nodes along the path.
+
+	The original node is never mutated, so readers holding a reference to it keep seeing a consistent snapshot.
+	"""
+	output = _shallow_copy(node)
+	key = path[0]
+
+	if len(path) == 1:
+		output[key] = value
+	else:
+		child = node.get(key, None) if isinstance(node, dict) else None
+		if not isinstance(child, dict):
+			child = DotMap({}, _dynamic=False) if isinstance(node, DotMap) else {}
+
+		output[key] = _copy_on_write_set(child, path[1:], value)
+
+	return output
+
+
+def _copy_on_write_merge(node: Any, other: Any) -> Any:
+	"""
+	Returns a copy of the node with the other merged into it, like deep_merge, copying only the nodes it changes.
+
+	Neither the node nor the other is mutated, so a reload never exposes a half merged snapshot to the readers.
+	"""
+	output = _shallow_copy(node) if isinstance(node, dict) else {}
+
+	for (key, value) in other.items():
+		current = output.get(key, None)
+
+		if isinstance(current, dict) and isinstance(value, dict):
+			output[key] = _copy_on_write_merge(current, value)
+		elif isinstance(current, list) and isinstance(value, list):
+			output[key] = current + value
+		elif isinstance(current, set) and isinstance(value, set):
+			output[key] = current | value
+		else:
+			output[key] = value
+
+	return output
+
+
+def _are_related(first: str, second: str) -> bool:
+	return first == second or first.startswith(f"{second}.") or second.startswith(f"{first}.")
+
 
 @ThreadSafeSingleton
 class Properties(object):
 	def __init__(self):
+		self._lock = threading.RLock()
+		self._cache: Dict[str, Any] = {}
 		self.properties = DotMap({}, _dynamic=False)
 
 	def load(self, app):
@@ -22,13 +99,14 @@ class Properties(object):
 		self.define_extra_properties()
 
 	def load_from_app(self, app):
-		self.properties['app'] = app
-		self.properties['root_path'] = app.root_path
-		self.properties['app_root_path'] = app.root_path
-		self.properties['app_instance_path'] = app.root_path
+		self.set('app', app)
+		self.set('root_path', app.root_path)
+		self.set('app_root_path', app.root_path)
+		self.set('app_instance_path', app.root_path)
 
 	def load_from_constants(self):
-		self.properties = deep_merge(self.properties, constants)
+		with self._lock:
+			self._replace(_copy_on_write_merge(self.properties, constants))
 
 	def load_from_configuration_files(self):
 		root_path = self.properties['app_root_path']
@@ -50,7 +128,8 @@ class Properties(object):
 			target = yaml.safe_load(stream) or {}
 			configuration = deep_merge(configuration, target)
 
-		self.properties = DotMap(deep_merge(self.properties, configuration), _dynamic=False)
+		with self._lock:
+			self._replace(DotMap(_copy_on_write_merge(self.properties, configuration), _dynamic=False))
 
 	def load_from_database(self):
 		pass
@@ -80,27 +159,37 @@ class Properties(object):
 		# 	output = request_parameters.safe_deep_get(key)
 		# 	if output is not None: return output
 
-		output = self.properties.safe_deep_get(key)
-		if output is not None: return output
+		# Writers swap in a new cache instead of clearing it, so a local reference always belongs to one snapshot.
+		cache = self._cache
+		output = cache.get(key, _UNCACHED)
 
-		modified_key = key.replace('.', '_')
-		output = os.environ.get(modified_key, None)
-		if output is not None: return output
+		if output is _UNCACHED:
+			properties = self.properties
+			output = self._resolve(properties, key)
 
-		modified_key = modified_key.upper()
-		output = os.environ.get(modified_key, None)
-		if output is not None: return output
+			if output is _MISSING:
+				output = self._resolve_from_environment(key)
 
-		if isinstance(output, DotMap): return default
+			with self._lock:
+				# Only memoize if no writer replaced the snapshot while it was being resolved. Misses are memoized too,
+				# until the next set or load, so the environment is not read on every lookup.
+				if self.properties is properties and self._cache is cache:
+					cache[key] = output
 
-		return default
+		if output is _MISSING:
+			return default
+
+		return output
 
 	def set(self, key, value):
-		try:
-			self.properties._dynamic = True
-			self.properties.safe_deep_set(key, value)
-		finally:
-			self.properties._dynamic = False
+		with self._lock:
+			path, _, _ = _compile_key(key)
+
+			self.properties = _copy_on_write_set(self.properties, path, value)
+			self._cache = {
+				cached_key: cached_value for (cached_key, cached_value) in self._cache.items()
+				if not _are_related(cached_key, key)
+			}
 
 	def define_extra_properties(self):
 		self.set("resources_path", os.path.join(self.get("root_path"), "resources"))
@@ -109,5 +198,38 @@ class Properties(object):
 		self.set("resources_logs_path", os.path.join(self.get("resources_path"), "logs"))
 		self.set("resources_studies_path", os.path.join(self.get("resources_path"), "studies"))
 
+	def _replace(self, properties: DotMap):
+		with self._lock:
+			self.properties = properties
+			self._cache = {}
+
+	@staticmethod
+	def _resolve(properties: DotMap, key: str) -> Any:
+		path, _, _ = _compile_key(key)
+
+		output = properties
+		for item in path:
+			if not isinstance(output, dict):
+				output = None
+				break
+
+			output = output.get(item, None)
+
+		if output is not None: return output
+
+		return _MISSING
+
+	@staticmethod
+	def _resolve_from_environment(key: str) -> Any:
+		_, environment_key, upper_environment_key = _compile_key(key)
+
+		output = os.environ.get(environment_key, None)
+		if output is not None: return output
+
+		output = os.environ.get(upper_environment_key, None)
+		if output is not None: return output
+
+		return _MISSING
+
 
 properties = Properties.instance()
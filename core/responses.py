@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+from core.properties import properties
+
+ENCODINGS = {
+	"gzip": gzip.compress,
+	"deflate": zlib.compress,
+}
+
+
+def _get_etag(body: bytes) -> str:
+	# Weak, because the same content may be sent with different encodings.
+	return f'''W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'''
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+	if not if_none_match:
+		return False
+
+	if if_none_match.strip() == "*":
+		return True
+
+	opaque_tag = etag.removeprefix("W/")
+
+	return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+
+def _get_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+	if not accept_encoding:
+		return None
+
+	accepted = {}
+	for item in accept_encoding.split(","):
+		(name, _, parameters) = item.strip().partition(";")
+		quality = 1.0
+		if parameters.strip().startswith("q="):
+			try:
+				quality = float(parameters.strip()[2:])
+			except ValueError:
+				quality = 0.0
+
+		accepted[name.strip().lower()] = quality
+
+	for encoding in ENCODINGS.keys():
+		if accepted.get(encoding, 0) > 0:
+			return encoding
+
+	return None
+
+
+def conditional_response(request: Request, content: Any, status_code: int = HTTP_200_OK) -> Response:
+	"""
+	Serializes the content as JSON with a content-hash ETag.
+
+	Answers 304 without a body when the client already has this version (If-None-Match) and compresses large
+	bodies with gzip or deflate when the client accepts them.
+	"""
+	body = json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+	etag = _get_etag(body)
+
+	headers: Dict[str, str] = {
+		"ETag": etag,
+		"Vary": "Accept-Encoding",
+		"Cache-Control": "no-cache",
+	}
+
+	if status_code == HTTP_200_OK and _matches(request.headers.get("If-None-Match"), etag):
+		return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+
+	if len(body) >= int(properties.get_or_default("server.compression.minimum_size", 1024)):
+		encoding = _get_encoding(request.headers.get("Accept-Encoding"))
+
+		if encoding:
+			body = ENCODINGS[encoding](body)
+			headers["Content-Encoding"] = encoding
+
+	return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
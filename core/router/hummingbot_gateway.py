@@ -5,9 +5,33 @@ from typing import Any
 import requests
 from dotmap import DotMap
 
+from core.metrics import metrics
 from core.properties import properties
 from core.types import HttpMethod
 
+request_duration = metrics.histogram("gateway_request_duration_seconds", "Duration of the requests to the Hummingbot Gateway.")
+requests_count = metrics.counter("gateway_requests_total", "Requests to the Hummingbot Gateway by response status.")
+
+# Routes of the Gateway labeled by name, the proxied paths come from the clients, so any other one is labeled "other".
+ENDPOINTS = frozenset({
+	"/",
+	"/network/status", "/network/config", "/network/balances", "/network/tokens",
+	"/wallet", "/wallet/add", "/wallet/remove", "/connectors",
+	"/clob/batchOrders", "/clob/estimateGas", "/clob/markets", "/clob/orderbook", "/clob/orders", "/clob/ticker",
+	"/kujira", "/kujira/balance", "/kujira/balances", "/kujira/balances/all", "/kujira/block/current",
+	"/kujira/fees/estimated", "/kujira/market", "/kujira/market/withdraw", "/kujira/market/withdraws",
+	"/kujira/market/withdraws/all", "/kujira/markets", "/kujira/markets/all", "/kujira/order", "/kujira/orderBook",
+	"/kujira/orderBooks", "/kujira/orderBooks/all", "/kujira/orders", "/kujira/orders/all", "/kujira/ticker",
+	"/kujira/tickers", "/kujira/tickers/all", "/kujira/token", "/kujira/tokens", "/kujira/tokens/all",
+	"/kujira/transaction", "/kujira/transactions", "/kujira/wallet/publicKey", "/kujira/wallet/publicKeys",
+})
+
+
+def get_endpoint_label(url: str) -> str:
+	path = url.split("?")[0].rstrip("/") or "/"
+
+	return path if path in ENDPOINTS else "other"
+
 
 async def hummingbot_gateway_router(
 	method: HttpMethod = HttpMethod.GET,
@@ -75,7 +99,17 @@ async def hummingbot_gateway_router(
 		"timeout": 60
 	}
 
-	response = getattr(requests, method.value)(**request)
+	labels = {"method": method.value.upper(), "endpoint": get_endpoint_label(url)}
+
+	try:
+		with request_duration.time(**labels):
+			response = getattr(requests, method.value)(**request)
+	except Exception:
+		requests_count.inc(status="error", **labels)
+
+		raise
+
+	requests_count.inc(status=response.status_code, **labels)
 
 	try:
 		result = DotMap(response.json(), _dynamic=False)
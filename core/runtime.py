@@ -0,0 +1,201 @@
+import asyncio
+import functools
+import itertools
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+from dotmap import DotMap
+from fastapi.encoders import jsonable_encoder
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+STREAM_LIMIT = 2 ** 24
+
+methods: Dict[str, Callable] = {}
+
+
+def get_socket_path() -> str:
+	return os.path.join(
+		properties.get("root_path"),
+		os.path.expanduser(str(properties.get_or_default("system.runtime.socket", "resources/runtime.sock")))
+	)
+
+
+def is_remote() -> bool:
+	return bool(properties.get_or_default("system.runtime.remote", False))
+
+
+def runtime_rpc(function: Callable) -> Callable:
+	"""
+	Marks a controller function as part of the strategy runtime.
+
+	When the runtime is remote, calls are forwarded to the runtime daemon through its Unix socket, otherwise
+	the function runs in this process. The daemon itself always runs the original function.
+	"""
+	methods[function.__name__] = function
+
+	@functools.wraps(function)
+	async def wrapper(options: Any = None):
+		if options is None:
+			options = DotMap({})
+
+		if is_remote():
+			return await runtime_client.call(function.__name__, options)
+
+		return await function(options)
+
+	return wrapper
+
+
+class RuntimeException(Exception):
+	pass
+
+
+@ThreadSafeSingleton
+class RuntimeClient(object):
+	"""
+	Connection of an API process to the runtime daemon, shared by all the calls of the process.
+
+	Requests and responses are JSON lines with an id, so concurrent calls are multiplexed on one connection.
+	"""
+
+	def __init__(self):
+		self._reader: Optional[asyncio.StreamReader] = None
+		self._writer: Optional[asyncio.StreamWriter] = None
+		self._receiver: Optional[asyncio.Task] = None
+		self._connection_lock: Optional[asyncio.Lock] = None
+		self._pending: Dict[int, asyncio.Future] = {}
+		self._ids = itertools.count(1)
+
+	async def _connect(self):
+		if self._connection_lock is None:
+			self._connection_lock = asyncio.Lock()
+
+		async with self._connection_lock:
+			if self._writer and not self._writer.is_closing():
+				return
+
+			(self._reader, self._writer) = await asyncio.open_unix_connection(get_socket_path(), limit=STREAM_LIMIT)
+			self._receiver = asyncio.create_task(self._receive(self._reader))
+
+	async def _receive(self, reader: asyncio.StreamReader):
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+
+				message = json.loads(line)
+				future = self._pending.pop(message["id"], None)
+
+				if future and not future.done():
+					if "error" in message:
+						future.set_exception(RuntimeException(message["error"]["message"]))
+					else:
+						future.set_result(message["result"])
+		except asyncio.CancelledError:
+			pass
+		finally:
+			self._disconnect(ConnectionError("The connection with the strategy runtime was lost."))
+
+	def _disconnect(self, exception: Exception):
+		if self._writer:
+			self._writer.close()
+			self._writer = None
+
+		for future in self._pending.values():
+			if not future.done():
+				future.set_exception(exception)
+
+		self._pending.clear()
+
+	async def call(self, method: str, options: Any) -> Any:
+		await self._connect()
+
+		id = next(self._ids)
+		future = asyncio.get_running_loop().create_future()
+		self._pending[id] = future
+
+		params = options.toDict() if isinstance(options, DotMap) else options
+
+		self._writer.write(json.dumps({"id": id, "method": method, "params": params}).encode() + b"\n")
+		await self._writer.drain()
+
+		try:
+			return await asyncio.wait_for(future, timeout=properties.get_or_default("system.runtime.timeout", 300))
+		finally:
+			self._pending.pop(id, None)
+
+	async def close(self):
+		if self._receiver:
+			self._receiver.cancel()
+			self._receiver = None
+
+
+@ThreadSafeSingleton
+class RuntimeServer(object):
+	"""
+	Serves the controller functions marked with runtime_rpc to the API processes.
+	"""
+
+	def __init__(self):
+		self._server: Optional[asyncio.AbstractServer] = None
+
+	async def start(self):
+		path = get_socket_path()
+
+		if os.path.exists(path):
+			os.remove(path)
+
+		self._server = await asyncio.start_unix_server(self._handle, path=path, limit=STREAM_LIMIT)
+		os.chmod(path, 0o600)
+
+	async def stop(self):
+		if self._server:
+			self._server.close()
+			await self._server.wait_closed()
+			self._server = None
+
+			try:
+				os.remove(get_socket_path())
+			except FileNotFoundError:
+				pass
+
+	async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+		lock = asyncio.Lock()
+		tasks = set()
+
+		async def respond(message: Dict[str, Any]):
+			try:
+				if message["method"] not in methods:
+					raise ValueError(f"""Unknown method "{message['method']}".""")
+
+				result = await methods[message["method"]](DotMap(message.get("params") or {}))
+				response = {"id": message["id"], "result": jsonable_encoder(result)}
+			except Exception as exception:
+				response = {"id": message["id"], "error": {"type": type(exception).__name__, "message": str(exception)}}
+
+			async with lock:
+				writer.write(json.dumps(response).encode() + b"\n")
+				await writer.drain()
+
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+
+				# Every request runs in its own task, so a slow call does not hold the others.
+				task = asyncio.create_task(respond(json.loads(line)))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
+		except (ConnectionError, asyncio.CancelledError):
+			pass
+		finally:
+			writer.close()
+
+
+runtime_client = RuntimeClient.instance()
+runtime_server = RuntimeServer.instance()
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Set
+
+from dotmap import DotMap
+from singleton.singleton import ThreadSafeSingleton
+
+from core.constants import constants
+from core.properties import properties
+from core.types import SystemStatus
+
+PROC_PATH = "/proc"
+
+
+def get_command_line(arguments: List[str]) -> str:
+	"""
+	Command line of a process with the executable reduced to its name, the form the service patterns are matched with.
+	"""
+	if not arguments:
+		return ""
+
+	return " ".join([os.path.basename(arguments[0]), *arguments[1:]])
+
+
+def matches(pattern: re.Pattern, arguments: List[str]) -> bool:
+	"""
+	Whether a process runs a service, the pattern is anchored at the executable, so commands that only mention the
+	service, like "tail -f filebrowser.log" or "grep filebrowser", do not match.
+	"""
+	return pattern.match(get_command_line(arguments)) is not None
+
+
+@ThreadSafeSingleton
+class ServicesMonitor(object):
+	"""
+	Tracks the managed services through their processes instead of polling the status shell command.
+
+	Running services are watched with pidfds (or plain PIDs when pidfds are not available), so an exit is
+	noticed without any polling. Only services that are not running are rescanned from /proc, and only at
+	the configured interval, which keeps the idle cost close to zero.
+	"""
+
+	def __init__(self):
+		self._initialized = False
+		self._task: Optional[asyncio.Task] = None
+		self._rescan = asyncio.Event()
+		self._subscribers: Set[asyncio.Queue] = set()
+		self._pids: Dict[str, int] = {}
+		self._pidfds: Dict[str, int] = {}
+		self._patterns: Dict[str, re.Pattern] = {}
+		self._starting: Dict[str, float] = {}
+
+	def start(self):
+		if not self._initialized:
+			self._initialized = True
+
+			self._patterns = {
+				service_id: re.compile(str(pattern))
+				for (service_id, pattern) in properties.get_or_default("system.services.processes", DotMap({})).items()
+				if pattern and service_id != constants.id
+			}
+
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		self._initialized = False
+
+		for service_id in list(self._pidfds.keys()):
+			self._unwatch(service_id)
+
+		try:
+			if self._task:
+				self._task.cancel()
+				await self._task
+		except asyncio.exceptions.CancelledError:
+			pass
+
+	def get(self) -> DotMap[str, SystemStatus]:
+		return properties.get_or_default("services.status.current", constants.services.status.default)
+
+	def update(self, service_id: str, status: SystemStatus) -> bool:
+		current = properties.get_or_default(f"services.status.current.{service_id}", None)
+		if current == status:
+			return False
+
+		if status != SystemStatus.STARTING:
+			self._starting.pop(service_id, None)
+
+		properties.set(f"services.status.current.{service_id}", status)
+
+		self._publish({service_id: status})
+
+		return True
+
+	def start_service(self, service_id: str):
+		"""
+		Marks a service as starting, it becomes running once the rescan finds its process, or stopped when it is not
+		found within the start timeout.
+		"""
+		timeout = properties.get_or_default("system.services.start_timeout", 60000) / 1000.0
+
+		self.update(service_id, SystemStatus.STARTING)
+		self._starting[service_id] = time.monotonic() + timeout
+
+	def _is_starting(self, service_id: str) -> bool:
+		return time.monotonic() < self._starting.get(service_id, 0)
+
+	def refresh(self):
+		"""
+		Requests an immediate rescan, for example right after a service was started or stopped.
+		"""
+		self._rescan.set()
+
+	def subscribe(self) -> asyncio.Queue:
+		queue = asyncio.Queue()
+		self._subscribers.add(queue)
+
+		return queue
+
+	def unsubscribe(self, queue: asyncio.Queue):
+		self._subscribers.discard(queue)
+
+	def _publish(self, changes: Dict[str, SystemStatus]):
+		for queue in self._subscribers:
+			queue.put_nowait(changes)
+
+	async def _run(self):
+		if properties.get_or_default("services.status.current", None) is None:
+			properties.set("services.status.current", DotMap(constants.services.status.default.toDict(), _dynamic=False))
+
+		while self._initialized:
+			try:
+				self._verify_pids()
+
+				await self._scan()
+
+				polling = self._get_unwatched_services() or any(service_id not in self._pidfds for service_id in self._pids)
+
+				if polling:
+					try:
+						await asyncio.wait_for(self._rescan.wait(), timeout=constants.services.status.rescan_interval / 1000.0)
+					except asyncio.TimeoutError:
+						pass
+				else:
+					await self._rescan.wait()
+
+				self._rescan.clear()
+			except asyncio.exceptions.CancelledError:
+				return
+			except Exception as exception:
+				from core.logger import logger
+				logger.ignore_exception(exception)
+
+				await asyncio.sleep(constants.services.status.rescan_interval / 1000.0)
+
+	def _get_unwatched_services(self) -> List[str]:
+		return [
+			service_id for service_id in constants.services.status.default.keys()
+			if service_id != constants.id and service_id not in self._pids
+		]
+
+	async def _scan(self):
+		pending = self._get_unwatched_services()
+		if not pending:
+			return
+
+		if not os.path.isdir(PROC_PATH) or any(service_id not in self._patterns for service_id in pending):
+			await self._scan_with_command(pending)
+
+			return
+
+		found = self._find_processes([service_id for service_id in pending if service_id in self._patterns])
+
+		for service_id in pending:
+			pid = found.get(service_id)
+			if pid and self._watch(service_id, pid):
+				self.update(service_id, SystemStatus.RUNNING)
+			elif not self._is_starting(service_id):
+				self.update(service_id, SystemStatus.STOPPED)
+
+	async def _scan_with_command(self, pending: List[str]):
+		from core.system import execute
+
+		system = json.loads(await execute(properties.get("system.commands.status")))
+
+		for (service_id, value) in system.items():
+			if service_id in pending:
+				status = SystemStatus.get_by_id(value)
+
+				if status == SystemStatus.RUNNING or not self._is_starting(service_id):
+					self.update(service_id, status)
+
+	def _find_processes(self, services_ids: List[str]) -> Dict[str, int]:
+		found: Dict[str, int] = {}
+		own_pid = os.getpid()
+
+		for entry in os.scandir(PROC_PATH):
+			if not entry.name.isdigit() or int(entry.name) == own_pid:
+				continue
+
+			try:
+				with open(os.path.join(entry.path, "cmdline"), "rb") as file:
+					arguments = file.read().decode(errors="ignore").split("\0")
+			except OSError:
+				continue
+
+			arguments = [argument for argument in arguments if argument]
+			if not arguments:
+				continue
+
+			for service_id in services_ids:
+				if service_id not in found and matches(self._patterns[service_id], arguments):
+					found[service_id] = int(entry.name)
+
+			if len(found) == len(services_ids):
+				break
+
+		return found
+
+	def _watch(self, service_id: str, pid: int) -> bool:
+		if hasattr(os, "pidfd_open"):
+			try:
+				pidfd = os.pidfd_open(pid)
+			except OSError:
+				# The process exited between the scan and the watch.
+				return False
+
+			self._pidfds[service_id] = pidfd
+			asyncio.get_running_loop().add_reader(pidfd, self._on_exit, service_id)
+
+		self._pids[service_id] = pid
+
+		return True
+
+	def _unwatch(self, service_id: str):
+		self._pids.pop(service_id, None)
+		pidfd = self._pidfds.pop(service_id, None)
+
+		if pidfd is not None:
+			try:
+				asyncio.get_running_loop().remove_reader(pidfd)
+			except RuntimeError:
+				pass
+
+			os.close(pidfd)
+
+	def _on_exit(self, service_id: str):
+		self._unwatch(service_id)
+		self.update(service_id, SystemStatus.STOPPED)
+		self.refresh()
+
+	def _verify_pids(self):
+		for (service_id, pid) in list(self._pids.items()):
+			if service_id not in self._pidfds and not os.path.exists(os.path.join(PROC_PATH, str(pid))):
+				self._on_exit(service_id)
+
+
+services_monitor = ServicesMonitor.instance()
@@ -0,0 +1,119 @@
+import gc
+import json
+from decimal import Decimal, DecimalException
+from typing import Any, Callable, Dict
+
+from dotmap import DotMap
+
+DECIMAL = "decimal"
+
+# Any key of a dict that has no schema of its own.
+ANY = "*"
+
+
+def encode_decimal(value: Decimal) -> str:
+	"""
+	Shortest exact text of a decimal, without exponent and trailing zeros.
+	"""
+	if not value.is_finite():
+		return str(value)
+
+	text = format(value, "f")
+	if "." in text:
+		text = text.rstrip("0").rstrip(".")
+
+	return text if text not in ("", "-", "-0") else "0"
+
+
+def _decode_decimal(value: Any) -> Any:
+	if isinstance(value, str) or (isinstance(value, int) and not isinstance(value, bool)):
+		try:
+			return Decimal(value)
+		except (DecimalException, ValueError):
+			return value
+
+	if isinstance(value, float):
+		return Decimal(str(value))
+
+	return value
+
+
+def _compile(schema: Any) -> Callable[[Any], Any]:
+	"""
+	Turns a schema into a decoder, so the schema is interpreted once and not for every value.
+	"""
+	if schema == DECIMAL:
+		return _decode_decimal
+
+	fields = [(key, _compile(field_schema)) for (key, field_schema) in schema.items() if key != ANY]
+	any_decoder = _compile(schema[ANY]) if ANY in schema else None
+
+	if any_decoder is None:
+		def decode_fields(target: Any) -> Any:
+			if not isinstance(target, dict):
+				return target
+
+			output = dict(target)
+			for (key, decoder) in fields:
+				if key in output:
+					output[key] = decoder(output[key])
+
+			return output
+
+		return decode_fields
+
+	decoders = dict(fields)
+
+	def decode_any(target: Any) -> Any:
+		if not isinstance(target, dict):
+			return target
+
+		return {key: decoders.get(key, any_decoder)(value) for (key, value) in target.items()}
+
+	return decode_any
+
+
+class StateCodec(object):
+	"""
+	Converts a state to and from JSON, turning back into Decimals only the fields that the schema marks as decimal.
+
+	The schema mirrors the state: a dict per level, DECIMAL for the decimal fields and ANY for the keys that are not
+	known in advance, like token or order ids. Fields missing from the schema are kept as they were read.
+	"""
+
+	def __init__(self, schema: Dict[str, Any]):
+		self.schema = schema
+		self._decode = _compile(schema)
+
+	@staticmethod
+	def _encode_default(target: Any) -> Any:
+		if isinstance(target, Decimal):
+			return encode_decimal(target)
+
+		if isinstance(target, DotMap):
+			return target.toDict()
+
+		raise TypeError(f"Non serializable type: {type(target)}")
+
+	def encode(self, state: Any) -> str:
+		if isinstance(state, DotMap):
+			state = state.toDict()
+
+		return json.dumps(state, separators=(",", ":"), default=self._encode_default)
+
+	def decode(self, content: str | Dict[str, Any]) -> Dict[str, Any]:
+		"""
+		Parses the content, when it is not parsed yet, and returns it with its decimal fields converted.
+
+		Only the dicts on the way to a decimal field are copied, the other values are shared with the content.
+		"""
+		# Parsing a large state creates millions of containers without cycles, the collections would only slow it down.
+		collecting = gc.isenabled()
+		gc.disable()
+		try:
+			state = json.loads(content) if isinstance(content, str) else content
+
+			return self._decode(state)
+		finally:
+			if collecting:
+				gc.enable()
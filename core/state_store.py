@@ -0,0 +1,267 @@
+import json
+import os
+import queue
+import threading
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from dotmap import DotMap
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+from core.state_codec import StateCodec, encode_decimal
+from core.utils import Path, deep_diff
+
+FSYNC_POLICIES = ("always", "snapshot", "never")
+
+
+def _to_plain(target: Any) -> Any:
+	if isinstance(target, DotMap):
+		target = target.toDict()
+
+	if isinstance(target, dict):
+		return {str(key): _to_plain(value) for (key, value) in target.items()}
+
+	if isinstance(target, (list, tuple)):
+		return [_to_plain(value) for value in target]
+
+	if isinstance(target, Decimal):
+		return encode_decimal(target)
+
+	if isinstance(target, Enum):
+		return target.value
+
+	return target
+
+
+def _apply(state: Dict[str, Any], changes: List[Dict[str, Any]], removed: List[Path]):
+	for path in removed:
+		parent = state
+		for key in path[:-1]:
+			parent = parent.get(key) if isinstance(parent, dict) else None
+		if isinstance(parent, dict):
+			parent.pop(path[-1], None)
+
+	for change in changes:
+		if not change["path"]:
+			state.clear()
+			state.update(change["value"])
+
+			continue
+
+		parent = state
+		for key in change["path"][:-1]:
+			if not isinstance(parent.get(key), dict):
+				parent[key] = {}
+			parent = parent[key]
+
+		parent[change["path"][-1]] = change["value"]
+
+
+def _get_fsync_policy() -> str:
+	policy = properties.get_or_default("system.state.fsync", "snapshot")
+
+	return policy if policy in FSYNC_POLICIES else "snapshot"
+
+
+class StateJournal(object):
+	"""
+	State of one worker or supervisor, kept as a snapshot file plus an append-only journal of deltas.
+
+	Every save appends the differences since the previous save as a JSON line to "<snapshot>.journal". After a number
+	of entries the current state replaces the snapshot and the journal starts over. The last delta is appended before
+	the snapshot is replaced, and replaying a journal over a newer snapshot gives that snapshot again, so a crash
+	between both writes loses nothing.
+	"""
+
+	def __init__(self, path: str, store: "StateStore"):
+		self.path = path
+		self.journal_path = f"{path}.journal"
+		self._store = store
+		self._previous: Optional[Dict[str, Any]] = None
+		self._entries = 0
+
+	def load(self, codec: StateCodec = None) -> Optional[Dict[str, Any]]:
+		"""
+		Returns the snapshot with the journal replayed over it, decoded by the codec, or None when nothing was saved yet.
+		"""
+		self._store.flush()
+
+		state = None
+		entries = 0
+
+		if os.path.exists(self.path):
+			with open(self.path, "r") as file:
+				content = file.read()
+
+			if content:
+				state = json.loads(content)
+
+		if os.path.exists(self.journal_path):
+			# End of the last complete entry.
+			offset = 0
+
+			with open(self.journal_path, "rb") as file:
+				for line in file:
+					try:
+						entry = json.loads(line)
+					except (json.JSONDecodeError, UnicodeDecodeError):
+						# An entry cut by a crash, it is the last one.
+						break
+
+					if state is None:
+						state = {}
+
+					_apply(state, entry["changes"], [tuple(path) for path in entry["removed"]])
+					entries += 1
+					offset += len(line)
+
+					if not line.endswith(b"\n"):
+						break
+
+			self._repair(offset)
+
+		self._previous = state
+		self._entries = entries
+
+		if state is None:
+			return None
+
+		if codec:
+			return codec.decode(state)
+
+		return state
+
+	def _repair(self, offset: int):
+		"""
+		Truncates the journal after its last complete entry, so the next entries are not appended to a torn one.
+		"""
+		with open(self.journal_path, "r+b") as file:
+			if os.fstat(file.fileno()).st_size > offset:
+				file.truncate(offset)
+
+			if offset:
+				file.seek(offset - 1)
+				if file.read(1) != b"\n":
+					# The entry was complete but its line break was not written.
+					file.write(b"\n")
+
+			file.flush()
+			os.fsync(file.fileno())
+
+	def save(self, state: Any):
+		current = _to_plain(state)
+
+		if self._previous is None:
+			self._snapshot(current)
+
+			return
+
+		changes: List[Dict[str, Any]] = []
+		removed: List[Path] = []
+		deep_diff(self._previous, current, (), changes, removed)
+
+		self._previous = current
+
+		if not changes and not removed:
+			return
+
+		line = json.dumps({"changes": changes, "removed": removed}, separators=(",", ":")) + "\n"
+		self._store.submit(lambda: self._append(line))
+		self._entries += 1
+
+		if self._entries >= int(properties.get_or_default("system.state.compaction.entries", 1000)):
+			self._snapshot(current)
+
+	def reset(self, state: Any):
+		"""
+		Replaces the saved state, discarding the journal.
+		"""
+		self._snapshot(_to_plain(state))
+
+	def _snapshot(self, current: Dict[str, Any]):
+		self._previous = current
+		self._entries = 0
+
+		content = json.dumps(current, separators=(",", ":"))
+		self._store.submit(lambda: self._write_snapshot(content))
+
+	def _append(self, line: str):
+		os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+
+		with open(self.journal_path, "a") as file:
+			file.write(line)
+
+			if _get_fsync_policy() == "always":
+				file.flush()
+				os.fsync(file.fileno())
+
+	def _write_snapshot(self, content: str):
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+		fsync = _get_fsync_policy() != "never"
+		temporary_path = f"{self.path}.tmp"
+
+		with open(temporary_path, "w") as file:
+			file.write(content)
+
+			if fsync:
+				file.flush()
+				os.fsync(file.fileno())
+
+		os.replace(temporary_path, self.path)
+
+		# Emptied only after the snapshot is in place.
+		with open(self.journal_path, "w"):
+			pass
+
+
+@ThreadSafeSingleton
+class StateStore(object):
+	"""
+	Keeps one journal per state file and writes all of them, in order, from a single background thread.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._journals: Dict[str, StateJournal] = {}
+		self._queue: queue.Queue = queue.Queue()
+		self._thread: Optional[threading.Thread] = None
+
+	def get(self, path: str) -> StateJournal:
+		with self._lock:
+			journal = self._journals.get(path)
+			if journal is None:
+				journal = self._journals[path] = StateJournal(path, self)
+
+			return journal
+
+	def submit(self, operation: Callable[[], None]):
+		with self._lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name="state-store", daemon=True)
+				self._thread.start()
+
+		self._queue.put(operation)
+
+	def flush(self):
+		"""
+		Waits until every submitted write is done.
+		"""
+		self._queue.join()
+
+	def _run(self):
+		while True:
+			operation = self._queue.get()
+
+			try:
+				operation()
+			except Exception as exception:
+				from core.logger import logger
+				logger.ignore_exception(exception)
+			finally:
+				self._queue.task_done()
+
+
+state_store = StateStore.instance()
@@ -0,0 +1,168 @@
+import asyncio
+from enum import Enum
+from typing import Any, Dict, List, Optional, Set
+
+from dotmap import DotMap
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+from core.utils import Path, deep_diff
+
+
+def _to_plain(target: Any) -> Any:
+	if isinstance(target, DotMap):
+		target = target.toDict()
+
+	if isinstance(target, dict):
+		return {str(key): _to_plain(value) for (key, value) in target.items()}
+
+	if isinstance(target, (list, tuple)):
+		return [_to_plain(value) for value in target]
+
+	if isinstance(target, Enum):
+		return target.value
+
+	return target
+
+
+@ThreadSafeSingleton
+class StatusPublisher(object):
+	"""
+	Keeps one versioned document with the status of the services, supervisors, workers and their tasks.
+
+	The document is rebuilt once per change notification (and, as a safety net, at a slow interval while there
+	are subscribers), no matter how many clients are connected. Subscribers receive the differences between
+	consecutive versions.
+	"""
+
+	def __init__(self):
+		self.version = 0
+		self.status: Dict[str, Any] = {}
+		self._task: Optional[asyncio.Task] = None
+		self._changed = asyncio.Event()
+		# Serializes the rebuilds, so concurrent updates never diff against the same base nor reuse a version.
+		self._lock = asyncio.Lock()
+		self._subscribers: Set[asyncio.Queue] = set()
+
+	def start(self):
+		if not self._task or self._task.done():
+			self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		if self._task:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.exceptions.CancelledError:
+				pass
+			self._task = None
+
+	def refresh(self):
+		"""
+		Notifies that some status may have changed, so the document is rebuilt and the differences published.
+		"""
+		self._changed.set()
+
+	def get_snapshot(self) -> Dict[str, Any]:
+		return {"type": "snapshot", "version": self.version, "status": self.status}
+
+	def subscribe(self) -> asyncio.Queue:
+		self.start()
+
+		queue = asyncio.Queue(maxsize=int(properties.get_or_default("system.status.queue_size", 100)))
+		self._subscribers.add(queue)
+
+		return queue
+
+	def unsubscribe(self, queue: asyncio.Queue):
+		self._subscribers.discard(queue)
+
+	async def update(self) -> bool:
+		async with self._lock:
+			status = await self._build()
+
+			changes: List[Dict[str, Any]] = []
+			removed: List[Path] = []
+			deep_diff(self.status, status, (), changes, removed)
+
+			if not changes and not removed:
+				return False
+
+			self.status = status
+			self.version += 1
+
+			self._publish({"type": "delta", "version": self.version, "changes": changes, "removed": removed})
+
+			return True
+
+	def _publish(self, message: Dict[str, Any]):
+		for queue in self._subscribers:
+			if queue.full():
+				# The client fell behind, a snapshot replaces everything it missed.
+				while not queue.empty():
+					queue.get_nowait()
+
+				queue.put_nowait(self.get_snapshot())
+			else:
+				queue.put_nowait(message)
+
+	@staticmethod
+	async def _build() -> Dict[str, Any]:
+		from core import controller
+		from core.constants import constants
+		from core.services import services_monitor
+
+		# Requested once, it is a round trip to the runtime daemon when it runs apart.
+		strategies = await controller.strategies_status(DotMap({}))
+
+		services_monitor.update(constants.id, await controller.solve_fun_client_status(strategies))
+
+		return _to_plain({
+			"services": services_monitor.get(),
+			"strategies": strategies,
+		})
+
+	async def _run(self):
+		from core.logger import logger
+		from core.services import services_monitor
+
+		services_monitor.start()
+		services = services_monitor.subscribe()
+
+		async def forward_services_changes():
+			while True:
+				await services.get()
+				self.refresh()
+
+		forwarder = asyncio.create_task(forward_services_changes())
+
+		try:
+			while True:
+				try:
+					await self.update()
+
+					# Without subscribers only the change notifications matter.
+					try:
+						await asyncio.wait_for(
+							self._changed.wait(),
+							timeout=properties.get_or_default("system.status.interval", 5000) / 1000.0 if self._subscribers else None
+						)
+					except asyncio.TimeoutError:
+						pass
+
+					self._changed.clear()
+
+					# Coalesces the notifications of a burst of changes into a single version.
+					await asyncio.sleep(properties.get_or_default("system.status.delay", 50) / 1000.0)
+				except asyncio.exceptions.CancelledError:
+					raise
+				except Exception as exception:
+					logger.ignore_exception(exception)
+
+					await asyncio.sleep(properties.get_or_default("system.status.interval", 5000) / 1000.0)
+		finally:
+			forwarder.cancel()
+			services_monitor.unsubscribe(services)
+
+
+status_publisher = StatusPublisher.instance()
@@ -1,21 +1,313 @@
-from typing import AsyncGenerator
-
 import asyncio
+import os
+import re
+import shlex
+import signal
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, List, Optional
 
+from core.properties import properties
+
+PROFILE_PREFIX = re.compile(r"^\s*(?:source|\.)\s+(?P<profile>\S+)\s*&&\s*")
+PROC_PATH = "/proc"
+
+
+def _get_descendants(pid: int) -> List[int]:
+    """
+    Processes started under a process that are still its descendants, the ones that were detached and reparented are
+    not included.
+    """
+    if not os.path.isdir(PROC_PATH):
+        return []
+
+    children: Dict[int, List[int]] = {}
+    for entry in os.scandir(PROC_PATH):
+        if not entry.name.isdigit():
+            continue
+
+        try:
+            with open(os.path.join(entry.path, "stat"), "r") as file:
+                stat = file.read()
+        except OSError:
+            continue
+
+        # The command name may contain spaces, the state and the parent PID follow its closing parenthesis.
+        parent = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(parent, []).append(int(entry.name))
+
+    output = []
+    pending = [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            output.append(child)
+            pending.append(child)
+
+    return output
+
+
+@dataclass
+class CommandResult:
+    command: str
+    return_code: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    truncated: bool = False
+    timed_out: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.return_code == 0 and not self.timed_out
+
+
+class _Shell(object):
+    """
+    A long-lived shell that already sourced the profile and runs one command at a time.
+
+    Every command runs in a subshell with stdin closed, followed by a unique marker on stdout and stderr,
+    which is how the end of its output and its exit code are detected.
+
+    Killing a shell kills it and the commands it is running, but not the services those commands started in the
+    background, which are no longer its descendants.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.killed = False
+
+    @staticmethod
+    async def spawn(shell: str, profile: Optional[str]) -> "_Shell":
+        process = await asyncio.create_subprocess_exec(
+            shell,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            limit=2 ** 20,
+        )
+
+        output = _Shell(process)
+
+        if profile:
+            await output.run(f"source {profile} >/dev/null 2>&1; true", None, 2 ** 16, in_subshell=False)
+
+        return output
+
+    def is_alive(self) -> bool:
+        return not self.killed and self.process.returncode is None
+
+    async def run(
+        self,
+        command: str,
+        timeout: Optional[float],
+        max_output_size: int,
+        in_subshell: bool = True,
+        detached: bool = False
+    ) -> CommandResult:
+        marker = f"__fun_client_{uuid.uuid4().hex}__"
+
+        if detached:
+            # The services started by the command inherit its stdout and stderr, which must not be the pipes of the
+            # shell, so its output is dropped and only its errors are read back from a file.
+            errors_path = shlex.quote(os.path.join(tempfile.gettempdir(), f"{marker}.err"))
+            body = f"( {command}\n) </dev/null >/dev/null 2>{errors_path}\n__fun_client_rc=$?; cat {errors_path} >&2; rm -f {errors_path}"
+        elif in_subshell:
+            body = f"( {command}\n) </dev/null\n__fun_client_rc=$?"
+        else:
+            body = f"{command}\n__fun_client_rc=$?"
+
+        script = f"{body}\nprintf '\\n{marker} %d\\n' $__fun_client_rc; printf '\\n{marker}\\n' >&2\n"
+
+        start = time.monotonic()
+
+        self.process.stdin.write(script.encode())
+        await self.process.stdin.drain()
+
+        readers = [
+            asyncio.ensure_future(self._read_until(self.process.stdout, marker, max_output_size)),
+            asyncio.ensure_future(self._read_until(self.process.stderr, marker, max_output_size)),
+        ]
+
+        try:
+            (stdout, stdout_truncated, return_code), (stderr, stderr_truncated, _) = await asyncio.wait_for(
+                asyncio.gather(*readers),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self.kill()
+
+            return CommandResult(
+                command=command,
+                return_code=None,
+                stdout="",
+                stderr=f"Command timed out after {timeout} seconds.",
+                duration=time.monotonic() - start,
+                timed_out=True,
+            )
+        finally:
+            # When one reader fails, the other one would keep reading from the shell.
+            for reader in readers:
+                reader.cancel()
+
+        return CommandResult(
+            command=command,
+            return_code=return_code,
+            stdout=stdout,
+            stderr=stderr,
+            duration=time.monotonic() - start,
+            truncated=stdout_truncated or stderr_truncated,
+        )
+
+    @staticmethod
+    async def _read_until(stream: asyncio.StreamReader, marker: str, max_output_size: int):
+        chunks: List[bytes] = []
+        size = 0
+        truncated = False
+        encoded_marker = marker.encode()
+
+        # A line longer than the buffer limit is read in parts, only a part that starts a line can be the marker.
+        at_line_start = True
+
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError:
+                raise ConnectionError("The shell exited unexpectedly.")
+            except asyncio.LimitOverrunError as error:
+                line = await stream.readexactly(error.consumed)
+
+            is_line_start = at_line_start
+            at_line_start = line.endswith(b"\n")
+
+            if is_line_start and line.startswith(encoded_marker):
+                return_code = line[len(encoded_marker):].strip()
+                output = b"".join(chunks).decode(errors="replace")
+                # The marker is always printed on a new line, so the extra line break belongs to the protocol.
+                output = output[:-1] if output.endswith("\n") else output
+
+                return output, truncated, int(return_code) if return_code else None
+
+            if size + len(line) > max_output_size:
+                truncated = True
+                line = line[:max(max_output_size - size, 0)]
+
+            size += len(line)
+            chunks.append(line)
+
+    def kill(self):
+        if self.is_alive():
+            self.killed = True
+
+            # Collected before the shell dies, its orphaned commands would not be its descendants anymore.
+            for pid in [*_get_descendants(self.process.pid), self.process.pid]:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+
+class CommandExecutor(object):
+    """
+    Runs shell commands through a small pool of persistent shells, so the profile is loaded once per shell
+    instead of once per command.
+    """
+
+    def __init__(self):
+        self._shells: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._all_shells: List[_Shell] = []
+
+    def _initialize(self):
+        if self._shells is None:
+            self._shells = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(int(properties.get_or_default("system.executor.pool_size", 4)))
+
+    @staticmethod
+    def _strip_profile(command: str) -> str:
+        """
+        Removes a leading "source <profile> &&", since the persistent shells already sourced it.
+        """
+        profile = properties.get_or_default("system.executor.profile", "~/.bashrc")
+
+        match = PROFILE_PREFIX.match(command)
+        if match and match.group("profile") == profile:
+            return command[match.end():]
+
+        return command
+
+    async def _acquire(self) -> _Shell:
+        while not self._shells.empty():
+            shell = self._shells.get_nowait()
+            if shell.is_alive():
+                return shell
+
+        shell = await _Shell.spawn(
+            properties.get_or_default("system.executor.shell", "/bin/bash"),
+            properties.get_or_default("system.executor.profile", "~/.bashrc"),
+        )
+        self._all_shells.append(shell)
+
+        return shell
+
+    def _release(self, shell: _Shell):
+        if shell.is_alive():
+            self._shells.put_nowait(shell)
+        else:
+            self._all_shells.remove(shell)
+
+    async def run(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        max_output_size: Optional[int] = None,
+        detached: bool = False
+    ) -> CommandResult:
+        self._initialize()
+
+        if timeout is None:
+            timeout = properties.get_or_default("system.executor.timeout", 60)
+
+        if max_output_size is None:
+            max_output_size = int(properties.get_or_default("system.executor.max_output_size", 2 ** 20))
+
+        async with self._semaphore:
+            shell = await self._acquire()
+
+            try:
+                return await shell.run(self._strip_profile(command), timeout, max_output_size, detached=detached)
+            except (Exception, asyncio.CancelledError):
+                # The protocol state is unknown after an interruption or an error, so this shell can not be reused.
+                shell.kill()
+
+                raise
+            finally:
+                self._release(shell)
+
+    def close(self):
+        for shell in self._all_shells:
+            shell.kill()
+
+        self._all_shells = []
+        self._shells = None
+        self._semaphore = None
+
+
+executor = CommandExecutor()
 
-async def execute(command: str) -> str:
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
 
-    stdout, stderr = await process.communicate()
+async def execute(command: str, timeout: Optional[float] = None, detached: bool = False) -> str:
+    """
+    Runs a command and returns its output, a detached command, like the one starting a service, has no output.
+    """
+    result = await executor.run(command, timeout=timeout, detached=detached)
 
-    if process.returncode == 0:
-        return str(stdout.decode()).strip()
+    if result.succeeded:
+        return result.stdout.strip()
     else:
-        raise Exception(str(stderr.decode()).strip())
+        raise Exception(result.stderr.strip())
 
 
 async def execute_continuously(command: str) -> AsyncGenerator[str, None]:
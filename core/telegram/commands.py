@@ -1,3 +1,4 @@
+import html
 from enum import Enum
 from typing import Any
 
@@ -12,6 +13,9 @@ from core import controller
 from core.telegram.telegram import telegram
 from core.utils import dump
 
+# Telegram messages are limited to 4096 characters, escaping may add some.
+MAXIMUM_OUTPUT_SIZE = 3500
+
 
 def validate(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> bool:
 	authorized_users = properties.get_or_default('telegram.admin.users', [])
@@ -87,6 +91,27 @@ async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
 	telegram.send(dump(response))
 
 
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+	if not validate(update, context):
+		return
+
+	# /profile [<seconds>] [collapsed|pstats]
+	options = DotMap({"limit": properties.get_or_default("telegram.profiler.limit", 15)})
+	if len(context.args):
+		options.duration = context.args[0]
+	if len(context.args) > 1:
+		options.format = context.args[1]
+
+	telegram.send(f"Profiling for {options.get('duration', properties.get_or_default('system.profiler.duration', 10))} seconds...")
+
+	try:
+		response = await controller.profile(options)
+		# Function names like <module> would be taken as HTML tags.
+		telegram.send(f"<pre>{html.escape(response['output'][:MAXIMUM_OUTPUT_SIZE])}</pre>")
+	except Exception as exception:
+		telegram.send(f"Profiling failed: {html.escape(str(exception))}")
+
+
 async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
 	if not validate(update, context):
 		return
@@ -98,6 +123,7 @@ class Command(Enum):
 	START = ("start", start, None)
 	STOP = ("stop", stop, None)
 	STATUS = ("status", status, None)
+	PROFILE = ("profile", profile, None)
 	UNKNOWN = ("unknown", unknown, MessageHandler(filters.COMMAND, unknown))
 
 	def __init__(self, id: str, command: Any, handler: Any):
@@ -0,0 +1,380 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from dotmap import DotMap
+from singleton.singleton import ThreadSafeSingleton
+
+from core.database import Database
+from core.properties import properties
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticks (
+	id INTEGER PRIMARY KEY,
+	worker TEXT NOT NULL,
+	market TEXT,
+	timestamp REAL NOT NULL,
+	wallet_value REAL,
+	token_price REAL,
+	used_price REAL,
+	pnl REAL,
+	pnl_in_usd REAL,
+	gas_creation REAL,
+	gas_cancellation REAL,
+	gas_total REAL,
+	gas_total_in_usd REAL,
+	orders_created INTEGER,
+	orders_canceled INTEGER
+);
+CREATE INDEX IF NOT EXISTS ticks_worker_timestamp ON ticks (worker, timestamp);
+CREATE INDEX IF NOT EXISTS ticks_market_timestamp ON ticks (market, timestamp);
+
+CREATE TABLE IF NOT EXISTS orders (
+	worker TEXT NOT NULL,
+	market TEXT,
+	id TEXT NOT NULL,
+	event TEXT NOT NULL,
+	client_id TEXT,
+	side TEXT,
+	type TEXT,
+	status TEXT,
+	price REAL,
+	amount REAL,
+	fee REAL,
+	timestamp REAL NOT NULL,
+	PRIMARY KEY (worker, id, event)
+);
+CREATE INDEX IF NOT EXISTS orders_worker_timestamp ON orders (worker, timestamp);
+CREATE INDEX IF NOT EXISTS orders_market_timestamp ON orders (market, timestamp);
+
+CREATE TABLE IF NOT EXISTS fills (
+	worker TEXT NOT NULL,
+	market TEXT,
+	id TEXT NOT NULL,
+	side TEXT,
+	price REAL,
+	amount REAL,
+	fee REAL,
+	timestamp REAL NOT NULL,
+	PRIMARY KEY (worker, id)
+);
+CREATE INDEX IF NOT EXISTS fills_worker_timestamp ON fills (worker, timestamp);
+CREATE INDEX IF NOT EXISTS fills_market_timestamp ON fills (market, timestamp);
+
+CREATE TABLE IF NOT EXISTS balances (
+	tick INTEGER NOT NULL REFERENCES ticks (id),
+	worker TEXT NOT NULL,
+	token TEXT NOT NULL,
+	timestamp REAL NOT NULL,
+	free REAL,
+	locked_in_orders REAL,
+	unsettled REAL,
+	total REAL
+);
+CREATE INDEX IF NOT EXISTS balances_worker_timestamp ON balances (worker, timestamp);
+"""
+
+TABLES = ("ticks", "orders", "fills", "balances")
+
+
+def _get_number(value: Any) -> Optional[float]:
+	try:
+		return float(value) if value is not None else None
+	except (TypeError, ValueError):
+		return None
+
+
+def _get_field(order: Any, *names: str) -> Any:
+	for name in names:
+		value = order.get(name) if isinstance(order, dict) else getattr(order, name, None)
+		if value is not None:
+			return value
+
+	return None
+
+
+def _get_timestamp(value: Any, default: float) -> float:
+	timestamp = _get_number(value)
+	if not timestamp:
+		return default
+
+	# The Gateway sends milliseconds.
+	return timestamp / 1000 if timestamp > 1e11 else timestamp
+
+
+def _get_orders_rows(worker: str, market: str, orders: Any, event: str, now: float) -> List[tuple]:
+	rows = []
+
+	for (id, order) in dict(orders or {}).items():
+		side = _get_field(order, "side")
+		type = _get_field(order, "type")
+		status = _get_field(order, "status")
+
+		rows.append((
+			worker,
+			market,
+			str(_get_field(order, "id") or id),
+			event,
+			_get_field(order, "clientId", "client_id"),
+			str(side) if side is not None else None,
+			str(type) if type is not None else None,
+			str(status) if status is not None else None,
+			_get_number(_get_field(order, "price")),
+			_get_number(_get_field(order, "amount")),
+			_get_number(_get_field(order, "fee")),
+			_get_timestamp(_get_field(order, "creationTimestamp", "creation_timestamp"), now),
+		))
+
+	return rows
+
+
+def _get_fills_rows(worker: str, market: str, orders: Any, now: float) -> List[tuple]:
+	rows = []
+
+	for (id, order) in dict(orders or {}).items():
+		side = _get_field(order, "side")
+
+		rows.append((
+			worker,
+			market,
+			str(_get_field(order, "id") or id),
+			str(side) if side is not None else None,
+			_get_number(_get_field(order, "price")),
+			_get_number(_get_field(order, "amount")),
+			_get_number(_get_field(order, "fee")),
+			_get_timestamp(_get_field(order, "fillingTimestamp", "filling_timestamp"), now),
+		))
+
+	return rows
+
+
+class _TickRecord(object):
+
+	def __init__(self, worker: str, market: str, state: DotMap[str, Any]):
+		now = time.time()
+
+		self.tick = (
+			worker,
+			market,
+			now,
+			_get_number(state.wallet.current_value),
+			_get_number(state.token.base.current_price),
+			_get_number(state.price.used_price),
+			_get_number(state.wallet.current_initial_pnl),
+			_get_number(state.wallet.current_initial_pnl_in_usd),
+			_get_number(state.gas_payed.token_amounts.creation),
+			_get_number(state.gas_payed.token_amounts.cancellation),
+			_get_number(state.gas_payed.token_amounts.total),
+			_get_number(state.gas_payed.usd_amounts.total),
+			len(state.orders.new or {}),
+			len(state.orders.canceled or {}),
+		)
+
+		self.orders = _get_orders_rows(worker, market, state.orders.new, "created", now) \
+			+ _get_orders_rows(worker, market, state.orders.canceled, "canceled", now)
+		self.fills = _get_fills_rows(worker, market, state.orders.filled, now)
+
+		self.balances = []
+		for (token, balance) in dict(state.balances.get("tokens") or {}).items():
+			self.balances.append((
+				worker,
+				str(token),
+				now,
+				_get_number(_get_field(balance, "free")),
+				_get_number(_get_field(balance, "lockedInOrders")),
+				_get_number(_get_field(balance, "unsettled")),
+				_get_number(_get_field(balance, "total")),
+			))
+
+
+@ThreadSafeSingleton
+class TickHistory(object):
+	"""
+	History of the worker ticks, with their orders, fills, balances and gas, in a SQLite database in WAL mode.
+
+	The ticks are extracted from the worker state on the event loop and written by a dedicated thread, one
+	transaction per batch of pending ticks, or one per tick when the batch fails, so a bad tick is the only one lost.
+	Queries open their own connections, WAL lets them read during the writes.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._queue: queue.Queue = queue.Queue()
+		self._thread: Optional[threading.Thread] = None
+
+	@staticmethod
+	def is_enabled() -> bool:
+		return bool(properties.get_or_default("system.history.enabled", True))
+
+	@staticmethod
+	def get_path() -> str:
+		return os.path.join(
+			properties.get("app_root_path"),
+			str(properties.get_or_default("system.history.path", "resources/databases/history.sqlite3"))
+		)
+
+	def _connect(self) -> Database:
+		path = self.get_path()
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		database = Database(path)
+		database.execute("PRAGMA journal_mode=WAL")
+		# Durable at each checkpoint, WAL keeps the database consistent after a crash anyway.
+		database.execute(f"""PRAGMA synchronous={properties.get_or_default("system.history.synchronous", "NORMAL")}""")
+		database.execute("PRAGMA busy_timeout=5000")
+
+		try:
+			database.execute_script(SCHEMA)
+		except Exception:
+			database.close()
+
+			raise
+
+		return database
+
+	def record(self, worker: str, market: str, state: DotMap[str, Any]):
+		if not self.is_enabled():
+			return
+
+		record = _TickRecord(worker, market, state)
+
+		with self._lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name="tick-history", daemon=True)
+				self._thread.start()
+
+		self._queue.put(record)
+
+	def flush(self, timeout: float = None) -> bool:
+		"""
+		Waits until every recorded tick is written, or dropped after an error, for at most the timeout in seconds.
+
+		Returns False when the timeout expired first.
+		"""
+		if timeout is None:
+			timeout = properties.get_or_default("system.history.flush_timeout", 10000) / 1000.0
+
+		deadline = time.monotonic() + timeout
+
+		with self._queue.all_tasks_done:
+			while self._queue.unfinished_tasks:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					return False
+
+				self._queue.all_tasks_done.wait(remaining)
+
+		return True
+
+	def _run(self):
+		database: Optional[Database] = None
+
+		while True:
+			records = [self._queue.get()]
+			while True:
+				try:
+					records.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+
+			try:
+				# Connected again on the next batch when it fails, for example while the disk is full.
+				if database is None:
+					database = self._connect()
+
+				self._write_batch(database, records)
+			except Exception as exception:
+				from core.logger import logger
+				logger.ignore_exception(exception)
+
+				if database is not None:
+					database.close()
+					database = None
+			finally:
+				for _ in records:
+					self._queue.task_done()
+
+	def _write_batch(self, database: Database, records: List[_TickRecord]):
+		try:
+			for record in records:
+				self._write(database, record)
+
+			database.commit()
+
+			return
+		except Exception:
+			database.rollback()
+
+		for record in records:
+			try:
+				self._write(database, record)
+
+				database.commit()
+			except Exception as exception:
+				database.rollback()
+
+				from core.logger import logger
+				logger.ignore_exception(exception)
+
+	@staticmethod
+	def _write(database: Database, record: _TickRecord):
+		tick = database.execute(
+			"""INSERT INTO ticks (
+				worker, market, timestamp, wallet_value, token_price, used_price, pnl, pnl_in_usd,
+				gas_creation, gas_cancellation, gas_total, gas_total_in_usd, orders_created, orders_canceled
+			) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+			record.tick
+		).lastrowid
+
+		database.execute_many("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", record.orders)
+		# The whole history of filled orders is listed again after a restart, only the first time is kept.
+		database.execute_many("INSERT OR IGNORE INTO fills VALUES (?, ?, ?, ?, ?, ?, ?, ?)", record.fills)
+		database.execute_many("INSERT INTO balances VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(tick,) + balance for balance in record.balances])
+
+	def query(
+		self,
+		table: str,
+		worker: str = None,
+		market: str = None,
+		start: float = None,
+		end: float = None,
+		limit: int = None
+	) -> List[Dict[str, Any]]:
+		"""
+		Returns the rows of a table for a worker or a market within a time range, the most recent first.
+		"""
+		if table not in TABLES:
+			raise ValueError(f"""Unknown table "{table}", the available ones are: {", ".join(TABLES)}.""")
+
+		conditions = []
+		parameters = []
+		for (column, operator, value) in (("worker", "=", worker), ("market", "=", market), ("timestamp", ">=", start), ("timestamp", "<", end)):
+			if value is not None:
+				if table == "balances" and column == "market":
+					raise ValueError("The balances can not be filtered by market.")
+
+				conditions.append(f"{column} {operator} ?")
+				parameters.append(value)
+
+		query = f"SELECT * FROM {table}"
+		if conditions:
+			query += " WHERE " + " AND ".join(conditions)
+		query += " ORDER BY timestamp DESC LIMIT ?"
+		parameters.append(int(limit or properties.get_or_default("system.history.limit", 1000)))
+
+		if not os.path.exists(self.get_path()):
+			return []
+
+		database = Database(self.get_path())
+		try:
+			cursor = database.execute(query, parameters)
+			columns = [description[0] for description in cursor.description]
+
+			return [dict(zip(columns, row)) for row in cursor.fetchall()]
+		finally:
+			database.close()
+
+
+tick_history = TickHistory.instance()
@@ -0,0 +1,359 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotmap import DotMap
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+
+COLUMNS = ("timestamp", "value", "minimum", "maximum")
+
+METRICS = {
+	"wallet_value": lambda state: state.wallet.current_value,
+	"token_price": lambda state: state.token.base.current_price,
+	"pnl": lambda state: state.wallet.current_initial_pnl,
+	"pnl_in_usd": lambda state: state.wallet.current_initial_pnl_in_usd,
+	"gas_in_usd": lambda state: state.gas_payed.usd_amounts.total,
+}
+
+DEFAULT_TIERS = [
+	{"resolution": 0, "retention": 86400},
+	{"resolution": 60, "retention": 2592000},
+	{"resolution": 3600, "retention": 63072000},
+]
+
+
+def _get_safe_name(name: str) -> str:
+	output = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+	if not output.strip("."):
+		raise ValueError(f"""Invalid name "{name}".""")
+
+	return output
+
+
+def _merge_buckets(rows: np.ndarray) -> np.ndarray:
+	"""
+	Merges the rows of the same bucket, sorted by timestamp: a bucket written at a shutdown is continued after the
+	restart, so it can be found in two chunks.
+	"""
+	boundaries = np.flatnonzero(np.diff(rows[:, 0])) + 1
+	if len(boundaries) == len(rows) - 1:
+		return rows
+
+	starts = np.concatenate(([0], boundaries))
+	ends = np.concatenate((boundaries, [len(rows)]))
+
+	return np.column_stack((
+		rows[starts, 0],
+		rows[ends - 1, 1],
+		np.minimum.reduceat(rows[:, 2], starts),
+		np.maximum.reduceat(rows[:, 3], starts),
+	))
+
+
+class _RingBuffer(object):
+	"""
+	Fixed capacity rows of float64 columns, the oldest rows are overwritten.
+	"""
+
+	def __init__(self, capacity: int):
+		self.capacity = capacity
+		self.rows = np.empty((capacity, len(COLUMNS)), dtype=np.float64)
+		self.start = 0
+		self.size = 0
+
+	def append(self, row: List[float]):
+		index = (self.start + self.size) % self.capacity
+		self.rows[index] = row
+
+		if self.size < self.capacity:
+			self.size += 1
+		else:
+			self.start = (self.start + 1) % self.capacity
+
+	def get(self) -> np.ndarray:
+		end = self.start + self.size
+		if end <= self.capacity:
+			return self.rows[self.start:end].copy()
+
+		return np.concatenate((self.rows[self.start:], self.rows[:end - self.capacity]))
+
+
+class _Tier(object):
+
+	def __init__(self, resolution: float, retention: float, capacity: int):
+		self.resolution = resolution
+		self.retention = retention
+		self.buffer = _RingBuffer(capacity)
+		# Row of the bucket being filled, only for the downsampled tiers.
+		self.bucket: Optional[List[float]] = None
+		self.pending: List[List[float]] = []
+
+	def add(self, timestamp: float, value: float):
+		if not self.resolution:
+			self._append([timestamp, value, value, value])
+
+			return
+
+		start = math.floor(timestamp / self.resolution) * self.resolution
+
+		if self.bucket and self.bucket[0] != start:
+			self._append(self.bucket)
+			self.bucket = None
+
+		if self.bucket is None:
+			self.bucket = [start, value, value, value]
+		else:
+			self.bucket[1] = value
+			self.bucket[2] = min(self.bucket[2], value)
+			self.bucket[3] = max(self.bucket[3], value)
+
+	def close_bucket(self):
+		if self.bucket:
+			self._append(self.bucket)
+			self.bucket = None
+
+	def _append(self, row: List[float]):
+		self.buffer.append(row)
+		self.pending.append(list(row))
+
+
+@ThreadSafeSingleton
+class TimeSeries(object):
+	"""
+	Wallet value, token price, PnL and gas of the workers over time.
+
+	Every series is kept at several resolutions: the raw ticks and downsampled buckets with the last, minimum and
+	maximum values. Recent rows live in NumPy ring buffers, and all the rows are persisted periodically as chunks of
+	compressed columns, one file per flush, which are deleted after the retention of their resolution. The rows stay
+	pending until their chunk is written, a failed write is retried on the next flush.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._write_lock = threading.Lock()
+		self._series: Dict[str, Dict[str, List[_Tier]]] = {}
+		self._last_flush = time.monotonic()
+
+	@staticmethod
+	def _get_tiers_configuration() -> List[Dict[str, float]]:
+		tiers = properties.get_or_default("system.time_series.tiers", DEFAULT_TIERS)
+
+		return sorted([DotMap(tier).toDict() for tier in tiers], key=lambda tier: tier["resolution"])
+
+	@staticmethod
+	def get_path() -> str:
+		return os.path.join(
+			properties.get("app_root_path"),
+			str(properties.get_or_default("system.time_series.path", "resources/time_series"))
+		)
+
+	def _get_tiers(self, worker: str, metric: str) -> List[_Tier]:
+		metrics = self._series.setdefault(worker, {})
+		tiers = metrics.get(metric)
+
+		if tiers is None:
+			capacity = int(properties.get_or_default("system.time_series.capacity", 2000))
+			tiers = metrics[metric] = [
+				_Tier(tier["resolution"], tier["retention"], capacity) for tier in self._get_tiers_configuration()
+			]
+
+		return tiers
+
+	def add(self, worker: str, values: Dict[str, Any], timestamp: float = None):
+		timestamp = time.time() if timestamp is None else timestamp
+
+		with self._lock:
+			for (metric, value) in values.items():
+				try:
+					value = float(value)
+				except (TypeError, ValueError):
+					continue
+
+				for tier in self._get_tiers(worker, metric):
+					tier.add(timestamp, value)
+
+	def record(self, worker: str, state: DotMap[str, Any]):
+		values = {}
+		for (metric, getter) in METRICS.items():
+			try:
+				values[metric] = getter(state)
+			except (AttributeError, KeyError):
+				pass
+
+		self.add(worker, values)
+
+		if time.monotonic() - self._last_flush >= properties.get_or_default("system.time_series.flush_interval", 60000) / 1000.0:
+			self._last_flush = time.monotonic()
+			asyncio.get_running_loop().run_in_executor(None, self.flush).add_done_callback(self._on_flushed)
+
+	@staticmethod
+	def _on_flushed(future: asyncio.Future):
+		if not future.cancelled() and future.exception():
+			from core.logger import logger
+			logger.ignore_exception(future.exception())
+
+	def _get_directory(self, worker: str, metric: str, resolution: float) -> str:
+		return os.path.join(self.get_path(), _get_safe_name(worker), _get_safe_name(metric), f"{resolution:g}")
+
+	def flush(self, close: bool = False):
+		"""
+		Writes the rows added since the previous flush and deletes the chunks past their retention.
+
+		Closing also writes the buckets being filled, at a shutdown.
+		"""
+		with self._write_lock:
+			with self._lock:
+				chunks = []
+				for (worker, metrics) in self._series.items():
+					for (metric, tiers) in metrics.items():
+						for tier in tiers:
+							if close:
+								tier.close_bucket()
+
+							if tier.pending:
+								chunks.append((tier, worker, metric, np.array(tier.pending, dtype=np.float64)))
+
+			for (tier, worker, metric, rows) in chunks:
+				try:
+					self._write_chunk(self._get_directory(worker, metric, tier.resolution), rows)
+				except Exception as exception:
+					from core.logger import logger
+					logger.ignore_exception(exception)
+
+					continue
+
+				with self._lock:
+					# Rows added during the write stay pending.
+					del tier.pending[:len(rows)]
+
+			self._prune()
+
+	@staticmethod
+	def _write_chunk(directory: str, rows: np.ndarray):
+		os.makedirs(directory, exist_ok=True)
+
+		# The sequence orders the chunks of the same range, like a bucket written at a shutdown and again after the restart.
+		name = f"{rows[0, 0]:.6f}-{rows[-1, 0]:.6f}-{time.time_ns()}"
+		temporary_path = os.path.join(directory, f"{name}.tmp.npz")
+		try:
+			np.savez_compressed(temporary_path, **{column: rows[:, index] for (index, column) in enumerate(COLUMNS)})
+			os.replace(temporary_path, os.path.join(directory, f"{name}.npz"))
+		except Exception:
+			if os.path.exists(temporary_path):
+				os.remove(temporary_path)
+
+			raise
+
+	def _prune(self):
+		if not os.path.isdir(self.get_path()):
+			return
+
+		now = time.time()
+		retentions = {f"{tier['resolution']:g}": tier["retention"] for tier in self._get_tiers_configuration()}
+
+		for (directory, _, _) in os.walk(self.get_path()):
+			retention = retentions.get(os.path.basename(directory))
+			if retention is None:
+				continue
+
+			for (_, last, file) in self._list_chunks(directory):
+				if last < now - retention:
+					os.remove(os.path.join(directory, file))
+
+	@staticmethod
+	def _list_chunks(directory: str) -> List[Tuple[float, float, str]]:
+		if not os.path.isdir(directory):
+			return []
+
+		chunks = []
+		for file in os.listdir(directory):
+			if file.endswith(".npz") and not file.endswith(".tmp.npz"):
+				(first, last, *sequence) = file.removesuffix(".npz").split("-")
+				chunks.append((float(first), float(last), int(sequence[0]) if sequence else 0, file))
+
+		return [(first, last, file) for (first, last, _, file) in sorted(chunks)]
+
+	def _read_chunks(self, directory: str, start: float, end: float) -> List[np.ndarray]:
+		chunks = []
+
+		for (first, last, file) in self._list_chunks(directory):
+			if last < start or first >= end:
+				continue
+
+			with np.load(os.path.join(directory, file)) as data:
+				chunks.append(np.column_stack([data[column] for column in COLUMNS]))
+
+		return chunks
+
+	def query(self, worker: str, metric: str, start: float = None, end: float = None, resolution: float = None) -> Dict[str, Any]:
+		"""
+		Returns the rows of a series within a time range as NumPy arrays, one per column.
+
+		Without a resolution, the finest one that still retains the start of the range is used.
+		"""
+		if metric not in METRICS:
+			raise ValueError(f"""Unknown metric "{metric}", the available ones are: {", ".join(METRICS)}.""")
+
+		now = time.time()
+		start = now - 3600 if start is None else start
+		end = now + 1 if end is None else end
+
+		configuration = self._get_tiers_configuration()
+		if resolution is None:
+			candidates = [tier for tier in configuration if tier["retention"] >= now - start]
+			resolution = (candidates[0] if candidates else configuration[-1])["resolution"]
+		elif resolution not in [tier["resolution"] for tier in configuration]:
+			raise ValueError(f"""Unknown resolution {resolution}, the available ones are: {", ".join(f"{tier['resolution']:g}" for tier in configuration)}.""")
+
+		directory = self._get_directory(worker, metric, resolution)
+
+		def get_memory() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+			with self._lock:
+				tier = next((tier for tier in self._series.get(worker, {}).get(metric, []) if tier.resolution == resolution), None)
+				empty = np.empty((0, len(COLUMNS)))
+
+				return (
+					tier.buffer.get() if tier else empty,
+					np.array(tier.pending, dtype=np.float64).reshape(-1, len(COLUMNS)) if tier else empty,
+					np.array([tier.bucket], dtype=np.float64) if tier and tier.bucket else empty,
+				)
+
+		(memory, _, bucket) = get_memory()
+
+		if len(memory) and memory[0, 0] <= start:
+			# Recent ranges are served from memory only.
+			rows = np.concatenate([memory, bucket])
+		else:
+			# The files hold everything flushed, the memory adds what was not flushed yet and the open bucket. Both are
+			# read while no flush runs, so a row is never in both.
+			with self._write_lock:
+				(_, unsaved, bucket) = get_memory()
+				chunks = self._read_chunks(directory, start, end)
+
+			rows = np.concatenate(chunks + [unsaved, bucket])
+
+		rows = rows[(rows[:, 0] >= start) & (rows[:, 0] < end)]
+		rows = rows[np.argsort(rows[:, 0], kind="stable")]
+
+		if resolution and len(rows):
+			rows = _merge_buckets(rows)
+
+		output = {column: rows[:, index] for (index, column) in enumerate(COLUMNS)}
+		output["resolution"] = resolution
+
+		return output
+
+	@staticmethod
+	def to_json(series: Dict[str, Any]) -> Dict[str, Any]:
+		return {key: value.tolist() if isinstance(value, np.ndarray) else value for (key, value) in series.items()}
+
+
+time_series = TimeSeries.instance()
@@ -1,12 +1,14 @@
 from datetime import datetime
 from functools import reduce
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 import jsonpickle
 from dateutil.relativedelta import relativedelta
 from deepmerge import always_merger
 from dotmap import DotMap
 
+Path = Tuple[str, ...]
+
 
 def human_readable(delta):
 	attributes = ['years', 'months', 'days', 'hours', 'minutes', 'seconds', 'microseconds']
@@ -52,6 +54,23 @@ def deep_merge(base, next):
 	return always_merger.merge(base, next)
 
 
+def deep_diff(previous: Any, current: Any, path: Path, changes: List[Dict[str, Any]], removed: List[Path]):
+	"""
+	Collects the changes from previous to current as values set at a path and paths removed, descending into dicts.
+	"""
+	if isinstance(previous, dict) and isinstance(current, dict):
+		for key in previous.keys() - current.keys():
+			removed.append(path + (key,))
+
+		for (key, value) in current.items():
+			if key not in previous:
+				changes.append({"path": path + (key,), "value": value})
+			else:
+				deep_diff(previous[key], value, path + (key,), changes, removed)
+	elif previous != current:
+		changes.append({"path": path, "value": current})
+
+
 def dump(target: Any):
 	try:
 		if isinstance(target, str):
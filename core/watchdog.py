@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from singleton.singleton import ThreadSafeSingleton
+
+from core.metrics import metrics
+from core.profiler import get_stack
+from core.properties import properties
+
+lag = metrics.histogram("event_loop_lag_seconds", "Delay of the event loop heartbeat over its interval.")
+blocks = metrics.counter("event_loop_blocks_total", "Heartbeats delayed over the watchdog threshold.")
+
+
+class _BlockingStack(object):
+
+	def __init__(self, stack: List[str], line: str):
+		self.stack = stack
+		self.line = line
+		self.count = 0
+		self.total = 0.0
+		self.maximum = 0.0
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"stack": self.stack,
+			"line": self.line,
+			"count": self.count,
+			"total": round(self.total, 6),
+			"maximum": round(self.maximum, 6),
+		}
+
+
+@ThreadSafeSingleton
+class LoopWatchdog(object):
+	"""
+	Measures the lag of the event loop with a heartbeat coroutine.
+
+	A helper thread checks the heartbeat. When it is late by more than the threshold, the helper captures the stack
+	of the loop thread, which is the call blocking the loop. The blocking stacks are counted and ranked by the time
+	they held the loop.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._task: Optional[asyncio.Task] = None
+		self._thread: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+		self._thread_id: Optional[int] = None
+		self._last_beat = 0.0
+		# The stack captured for the current blocking episode, the heartbeat adds the duration once it resumes.
+		self._pending: Optional[str] = None
+		self._stacks: Dict[str, _BlockingStack] = {}
+
+	@staticmethod
+	def _get_interval() -> float:
+		return properties.get_or_default("system.watchdog.interval", 100) / 1000.0
+
+	@staticmethod
+	def _get_threshold() -> float:
+		return properties.get_or_default("system.watchdog.threshold", 250) / 1000.0
+
+	def start(self):
+		if self._task or not properties.get_or_default("system.watchdog.enabled", True):
+			return
+
+		self._thread_id = threading.get_ident()
+		self._last_beat = time.monotonic()
+		self._stop.clear()
+
+		self._task = asyncio.create_task(self._beat(), name="watchdog")
+		self._thread = threading.Thread(target=self._watch, name="watchdog", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+
+		if self._task:
+			self._task.cancel()
+			self._task = None
+
+	async def _beat(self):
+		while True:
+			interval = self._get_interval()
+			expected = time.monotonic() + interval
+
+			await asyncio.sleep(interval)
+
+			now = time.monotonic()
+			delay = max(now - expected, 0.0)
+			self._last_beat = now
+
+			lag.observe(delay)
+
+			blocked = delay >= self._get_threshold()
+			if blocked:
+				blocks.inc()
+
+			# Cleared after every beat, the helper may capture an episode that ends just under the threshold, or the
+			# threshold may change, and a stack left pending would stop every later capture.
+			with self._lock:
+				record = self._stacks.get(self._pending) if blocked and self._pending else None
+				if record:
+					record.total += delay
+					record.maximum = max(record.maximum, delay)
+
+				self._pending = None
+
+	def _watch(self):
+		while not self._stop.wait(self._get_interval() / 2):
+			blocked = time.monotonic() - self._last_beat - self._get_interval()
+
+			if blocked < self._get_threshold() or self._pending:
+				continue
+
+			frame = sys._current_frames().get(self._thread_id)
+			if frame is None:
+				continue
+
+			stack = get_stack(frame)
+			line = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+			key = ";".join(stack)
+
+			with self._lock:
+				record = self._stacks.get(key)
+				if record is None:
+					self._evict()
+					record = self._stacks[key] = _BlockingStack(stack, line)
+
+				record.count += 1
+				self._pending = key
+
+			from core.logger import logger
+			logger.log(logging.WARNING, f"""Event loop blocked for more than {int(blocked * 1000)} ms at {os.path.basename(line)}, in {stack[-1]}.""")
+
+	def _evict(self):
+		maximum_stacks = int(properties.get_or_default("system.watchdog.maximum_stacks", 100))
+
+		while len(self._stacks) >= maximum_stacks:
+			del self._stacks[min(self._stacks, key=lambda key: self._stacks[key].total)]
+
+	def get_report(self) -> List[Dict[str, Any]]:
+		"""
+		Returns the blocking stacks, the ones that held the loop for longer first.
+		"""
+		with self._lock:
+			records = sorted(self._stacks.values(), key=lambda record: record.total, reverse=True)
+
+			return [record.to_dict() for record in records]
+
+	def clear(self):
+		with self._lock:
+			self._stacks.clear()
+
+
+loop_watchdog = LoopWatchdog.instance()
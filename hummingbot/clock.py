@@ -4,8 +4,12 @@ from typing import Dict, Optional
 
 from singleton.singleton import ThreadSafeSingleton
 
+from core.metrics import metrics
 from core.properties import properties
 
+event_delay = metrics.histogram("clock_event_delay_seconds", "Delay between the scheduled time of the clock events and their release.")
+pending_events_count = metrics.gauge("clock_pending_events", "Clock events waiting for their time.")
+
 
 @ThreadSafeSingleton
 class Clock(object):
@@ -33,12 +37,15 @@ class Clock(object):
 			pending_events: Dict[float, asyncio.Event] = dict({})
 
 			for timestamp, event in self._events.items():
-				if self.now() > timestamp:
+				now = self.now()
+				if now > timestamp:
 					event.set()
+					event_delay.observe(now - timestamp)
 				else:
 					pending_events[timestamp] = event
 
 			self._events = pending_events
+			pending_events_count.set(len(self._events))
 
 			if not self._events:
 				self._has_new_events.clear()
@@ -0,0 +1,147 @@
+import math
+from decimal import Decimal
+from typing import Collection, Dict, Tuple
+
+import numpy as np
+
+from hummingbot.constants import DECIMAL_ZERO, VWAP_THRESHOLD
+from hummingbot.order_book import OrderBookSide
+from hummingbot.outliers import outlier_filter
+from hummingbot.types import MiddlePriceStrategy, OrderSide
+
+
+def _get_quantile(side: OrderBookSide, count: int, quantile: float) -> float:
+	"""
+	Linear quantile of the best prices, like np.percentile, read from the sorted prices instead of partitioning them.
+	"""
+	position = (count - 1) * quantile
+	lower = math.floor(position)
+	upper = min(lower + 1, count - 1)
+
+	if side.side == OrderSide.BUY:
+		# The bids are sorted from the highest price.
+		(lower, upper) = (count - 1 - lower, count - 1 - upper)
+
+	return float(side.prices[lower] + (position - math.floor(position)) * (side.prices[upper] - side.prices[lower]))
+
+
+def _get_levels_without_outliers(side: OrderBookSide, count: int, market: str = None) -> int:
+	"""
+	Number of best levels left after removing the outliers, like remove_outliers, with a binary search.
+	"""
+	if not count:
+		return 0
+
+	if market is not None:
+		return outlier_filter.get_levels_count(market, side, count)
+
+	if side.side == OrderSide.BUY:
+		threshold = _get_quantile(side, count, 0.25) * 0.5
+
+		return int(np.searchsorted(-side.prices[:count], -threshold, side="left"))
+
+	threshold = _get_quantile(side, count, 0.75) * 1.5
+
+	return int(np.searchsorted(side.prices[:count], threshold, side="left"))
+
+
+def _get_prefix_sums(side: OrderBookSide, count: int) -> Tuple[float, float]:
+	"""
+	Notional and amount of the best levels, from the cumulative sums when they were already computed.
+	"""
+	if "cumulative_notional" in side.__dict__ and "cumulative_amounts" in side.__dict__:
+		return float(side.cumulative_notional[count - 1]), float(side.cumulative_amounts[count - 1])
+
+	return float(np.dot(side.prices[:count], side.amounts[:count])), float(np.sum(side.amounts[:count]))
+
+
+def _get_side_vwap_by_notional(side: OrderBookSide, notional: float) -> float:
+	"""
+	Average price to trade a notional against the side, the last level only partially.
+
+	The cumulative sums are computed over a window of the best levels that grows until it covers the notional, the
+	notional usually sits near the top of the book.
+	"""
+	size = 64
+	while True:
+		window = side.head(size)
+		if window.cumulative_notional[-1] >= notional or size >= len(side):
+			break
+
+		size *= 4
+
+	side = window
+	index = int(np.searchsorted(side.cumulative_notional, notional, side="left"))
+
+	if index >= len(side):
+		return side.total_notional / side.total_amount
+
+	previous_notional = float(side.cumulative_notional[index - 1]) if index else 0.0
+	previous_amount = float(side.cumulative_amounts[index - 1]) if index else 0.0
+
+	return notional / (previous_amount + (notional - previous_notional) / float(side.prices[index]))
+
+
+def calculate_middle_prices(
+	bids: OrderBookSide,
+	asks: OrderBookSide,
+	percentage: float = VWAP_THRESHOLD,
+	notional: float = None,
+	market: str = None,
+	strategies: Collection[MiddlePriceStrategy] = None
+) -> Dict[MiddlePriceStrategy, Decimal]:
+	"""
+	Middle prices of every strategy, or only of the given strategies, in one pass over the cumulative sums of the book.
+
+	The VWAP by notional is included only when a notional, in quote token, is given. It averages the prices of buying
+	and of selling that notional. With a market, the VWAP outliers come from the quartiles estimated across the books
+	of that market instead of the quartiles of this book.
+	"""
+	output = {}
+
+	best_bid_price = bids.get_best_price()
+	best_ask_price = asks.get_best_price()
+	best_bid_amount = bids.get_best_amount()
+	best_ask_amount = asks.get_best_amount()
+
+	if strategies is None:
+		strategies = MiddlePriceStrategy
+
+	if MiddlePriceStrategy.SAP in strategies:
+		output[MiddlePriceStrategy.SAP] = Decimal((best_ask_price + best_bid_price) / 2.0)
+
+	if MiddlePriceStrategy.WAP in strategies:
+		if best_ask_amount + best_bid_amount > 0:
+			output[MiddlePriceStrategy.WAP] = Decimal(
+				(best_ask_price * best_ask_amount + best_bid_price * best_bid_amount) / (best_ask_amount + best_bid_amount)
+			)
+		else:
+			output[MiddlePriceStrategy.WAP] = DECIMAL_ZERO
+
+	if MiddlePriceStrategy.VWAP in strategies:
+		bids_count = _get_levels_without_outliers(bids, math.ceil((percentage / 100) * len(bids)), market)
+		asks_count = _get_levels_without_outliers(asks, math.ceil((percentage / 100) * len(asks)), market)
+
+		if bids_count + asks_count > 0:
+			total_notional = 0.0
+			total_amount = 0.0
+
+			for (side, count) in ((bids, bids_count), (asks, asks_count)):
+				if count:
+					(side_notional, side_amount) = _get_prefix_sums(side, count)
+					total_notional += side_notional
+					total_amount += side_amount
+
+			output[MiddlePriceStrategy.VWAP] = Decimal(np.float64(total_notional) / np.float64(total_amount))
+		else:
+			output[MiddlePriceStrategy.VWAP] = DECIMAL_ZERO
+
+	if notional is not None and MiddlePriceStrategy.VWAP_BY_NOTIONAL in strategies:
+		if len(bids) and len(asks) and notional > 0:
+			output[MiddlePriceStrategy.VWAP_BY_NOTIONAL] = Decimal(
+				(_get_side_vwap_by_notional(bids, notional) + _get_side_vwap_by_notional(asks, notional)) / 2.0
+			)
+		else:
+			output[MiddlePriceStrategy.VWAP_BY_NOTIONAL] = DECIMAL_ZERO
+
+	return output
@@ -0,0 +1,338 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotmap import DotMap
+
+from core.metrics import metrics
+from hummingbot.types import OrderSide
+
+snapshots = metrics.counter("order_book_snapshots_total", "Order book snapshots applied by the order book engines.")
+gaps = metrics.counter("order_book_gaps_total", "Gaps found in the order book deltas, each one followed by a new snapshot.")
+
+
+def _to_array(values: Iterable[Any], count: int) -> np.ndarray:
+	return np.fromiter((float(value) for value in values), dtype=np.float64, count=count)
+
+
+class OrderBookSide(object):
+	"""
+	Price levels of one side of an order book as float64 arrays, sorted from the best price.
+
+	The cumulative sums are computed on first use and kept, the book is not changed after it is built.
+	"""
+
+	def __init__(self, side: OrderSide, prices: np.ndarray, amounts: np.ndarray):
+		self.side = side
+		self.prices = prices
+		self.amounts = amounts
+
+	@staticmethod
+	def from_levels(side: OrderSide, levels: Any) -> "OrderBookSide":
+		levels = list(dict(levels or {}).values())
+
+		prices = _to_array((level.price for level in levels), len(levels))
+		amounts = _to_array((level.amount for level in levels), len(levels))
+
+		# Stable, like the previous sort of the levels, so equal prices keep the order of the response.
+		order = np.argsort(-prices if side == OrderSide.BUY else prices, kind="stable")
+
+		return OrderBookSide(side, prices[order], amounts[order])
+
+	def __len__(self) -> int:
+		return len(self.prices)
+
+	@cached_property
+	def notional(self) -> np.ndarray:
+		return self.prices * self.amounts
+
+	@cached_property
+	def cumulative_amounts(self) -> np.ndarray:
+		return np.cumsum(self.amounts)
+
+	@cached_property
+	def cumulative_notional(self) -> np.ndarray:
+		return np.cumsum(self.notional)
+
+	@property
+	def total_amount(self) -> float:
+		return float(self.cumulative_amounts[-1]) if len(self) else 0.0
+
+	@property
+	def total_notional(self) -> float:
+		return float(self.cumulative_notional[-1]) if len(self) else 0.0
+
+	def get_best_price(self, default: float = 0.0) -> float:
+		return float(self.prices[0]) if len(self) else default
+
+	def get_best_amount(self, default: float = 0.0) -> float:
+		return float(self.amounts[0]) if len(self) else default
+
+	def head(self, count: int) -> "OrderBookSide":
+		"""
+		Returns the best levels, sharing the arrays and the cumulative sums already computed.
+		"""
+		if count >= len(self):
+			return self
+
+		output = OrderBookSide(self.side, self.prices[:count], self.amounts[:count])
+		for name in ("notional", "cumulative_amounts", "cumulative_notional"):
+			if name in self.__dict__:
+				output.__dict__[name] = self.__dict__[name][:count]
+
+		return output
+
+	def filter(self, mask: np.ndarray) -> "OrderBookSide":
+		if mask.all():
+			return self
+
+		return OrderBookSide(self.side, self.prices[mask], self.amounts[mask])
+
+
+class OrderBookArrays(object):
+	"""
+	Bids and asks of an order book, built once per fetch, for the middle price, VWAP and outlier calculations.
+	"""
+
+	def __init__(self, bids: OrderBookSide, asks: OrderBookSide):
+		self.bids = bids
+		self.asks = asks
+
+	@staticmethod
+	def from_order_book(order_book: DotMap[str, Any]) -> "OrderBookArrays":
+		return OrderBookArrays(
+			OrderBookSide.from_levels(OrderSide.BUY, order_book.bids),
+			OrderBookSide.from_levels(OrderSide.SELL, order_book.asks),
+		)
+
+
+def _get_levels(levels: Any) -> Iterable[Tuple[float, float]]:
+	"""
+	Pairs of price and amount from a list of [price, amount] or from a map of orders, like the Gateway ones.
+	"""
+	if isinstance(levels, dict):
+		return ((float(level["price"]), float(level["amount"])) for level in levels.values())
+
+	return ((float(price), float(amount)) for (price, amount, *_) in levels or [])
+
+
+class _L2Side(object):
+	"""
+	Amount per price of one side, with the prices in a sorted list, the bids negated so the best price is the first.
+	"""
+
+	def __init__(self, side: OrderSide):
+		self.side = side
+		self._sign = -1.0 if side == OrderSide.BUY else 1.0
+		self._keys: List[float] = []
+		self._amounts: Dict[float, float] = {}
+
+	def __len__(self) -> int:
+		return len(self._keys)
+
+	def clear(self):
+		self._keys.clear()
+		self._amounts.clear()
+
+	def add(self, price: float, amount: float):
+		"""
+		Adds an amount to a level, used to aggregate the orders of a snapshot.
+		"""
+		if price in self._amounts:
+			self._amounts[price] += amount
+		else:
+			self.set(price, amount)
+
+	def set(self, price: float, amount: float):
+		"""
+		Replaces the amount of a level, a zero amount removes it.
+		"""
+		if amount <= 0:
+			if self._amounts.pop(price, None) is not None:
+				del self._keys[bisect.bisect_left(self._keys, self._sign * price)]
+
+			return
+
+		if price not in self._amounts:
+			bisect.insort(self._keys, self._sign * price)
+
+		self._amounts[price] = amount
+
+	def get_levels(self, count: int = None) -> List[Tuple[float, float]]:
+		return [(self._sign * key, self._amounts[self._sign * key]) for key in self._keys[:count]]
+
+	def to_arrays(self) -> OrderBookSide:
+		prices = self._sign * np.array(self._keys, dtype=np.float64)
+
+		return OrderBookSide(self.side, prices, _to_array((self._amounts[price] for price in prices.tolist()), len(prices)))
+
+
+class L2OrderBook(object):
+	"""
+	Order book of a market aggregated by price, kept up to date from a snapshot and the deltas that follow it.
+
+	A delta carries the changed levels, an amount of zero removes a level, and its sequence range, from
+	"first_sequence" (the sequence when missing) to "sequence". Deltas older than the book are skipped, deltas
+	received before the first snapshot are buffered, and a delta that does not follow the book marks it as not
+	synchronized, so a new snapshot is needed.
+	"""
+
+	def __init__(self, market_id: str = None, maximum_pending_deltas: int = 1000):
+		self.market_id = market_id
+		self.sequence: Optional[int] = None
+		self.timestamp: Optional[float] = None
+		self.is_synchronized = False
+		self.bids = _L2Side(OrderSide.BUY)
+		self.asks = _L2Side(OrderSide.SELL)
+		self._pending_deltas: Deque[Any] = deque(maxlen=maximum_pending_deltas)
+		self._arrays: Optional[OrderBookArrays] = None
+
+	def apply_snapshot(self, snapshot: Any):
+		self.bids.clear()
+		self.asks.clear()
+
+		for (price, amount) in _get_levels(snapshot.get("bids")):
+			self.bids.add(price, amount)
+		for (price, amount) in _get_levels(snapshot.get("asks")):
+			self.asks.add(price, amount)
+
+		self.sequence = snapshot.get("sequence")
+		self.is_synchronized = True
+		self._changed()
+
+		pending_deltas = list(self._pending_deltas)
+		self._pending_deltas.clear()
+		for delta in pending_deltas:
+			if not self.apply_delta(delta):
+				break
+
+	def apply_delta(self, delta: Any) -> bool:
+		"""
+		Applies a delta and returns False when it reveals a gap.
+		"""
+		if not self.is_synchronized:
+			self._pending_deltas.append(delta)
+
+			return True
+
+		sequence = delta.get("sequence")
+		if sequence is not None and self.sequence is not None:
+			if sequence <= self.sequence:
+				return True
+
+			first_sequence = delta.get("first_sequence")
+			if (sequence if first_sequence is None else first_sequence) > self.sequence + 1:
+				self.is_synchronized = False
+
+				return False
+
+		for (price, amount) in _get_levels(delta.get("bids")):
+			self.bids.set(price, amount)
+		for (price, amount) in _get_levels(delta.get("asks")):
+			self.asks.set(price, amount)
+
+		if sequence is not None:
+			self.sequence = sequence
+		self._changed()
+
+		return True
+
+	def _changed(self):
+		self.timestamp = time.time()
+		self._arrays = None
+
+	def get_best_bid(self) -> Optional[Tuple[float, float]]:
+		return next(iter(self.bids.get_levels(1)), None)
+
+	def get_best_ask(self) -> Optional[Tuple[float, float]]:
+		return next(iter(self.asks.get_levels(1)), None)
+
+	def get_depth(self, levels: int = None) -> Dict[str, List[Tuple[float, float]]]:
+		return {"bids": self.bids.get_levels(levels), "asks": self.asks.get_levels(levels)}
+
+	def get_arrays(self) -> OrderBookArrays:
+		"""
+		Returns the book as arrays, built again only after a change.
+		"""
+		if self._arrays is None:
+			self._arrays = OrderBookArrays(self.bids.to_arrays(), self.asks.to_arrays())
+
+		return self._arrays
+
+
+class OrderBookEngine(object):
+	"""
+	Keeps an L2 order book up to date. When the source has a stream of deltas, run() follows it in the background and
+	a new snapshot is fetched whenever the deltas have a gap or the stream fails. Otherwise nothing runs in the
+	background, the book is fetched on demand by get_arrays() once it is older than the maximum age.
+	"""
+
+	def __init__(
+		self,
+		get_snapshot: Callable[[], Awaitable[Any]],
+		watch_delta: Callable[[], Awaitable[Any]] = None,
+		market_id: str = None,
+		interval: float = 5.0,
+		maximum_age: float = 10.0
+	):
+		self.book = L2OrderBook(market_id)
+		self.interval = interval
+		self.maximum_age = maximum_age
+		self._get_snapshot = get_snapshot
+		self._watch_delta = watch_delta
+
+	@property
+	def is_streaming(self) -> bool:
+		return self._watch_delta is not None
+
+	def is_fresh(self) -> bool:
+		if not self.book.is_synchronized or self.book.timestamp is None:
+			return False
+
+		# A stream without changes is still up to date.
+		return self._watch_delta is not None or time.time() - self.book.timestamp <= self.maximum_age
+
+	async def snapshot(self):
+		self.book.apply_snapshot(await self._get_snapshot())
+		snapshots.inc(market=str(self.book.market_id))
+
+	async def get_arrays(self) -> OrderBookArrays:
+		"""
+		Returns the current book, fetching a snapshot first only when it is not up to date.
+		"""
+		if not self.is_fresh():
+			await self.snapshot()
+
+		return self.book.get_arrays()
+
+	async def run(self):
+		"""
+		Follows the stream of deltas, the interval is the delay before retrying after a failure.
+		"""
+		if not self.is_streaming:
+			return
+
+		while True:
+			try:
+				if not self.book.is_synchronized:
+					await self.snapshot()
+
+				if not self.book.apply_delta(await self._watch_delta()):
+					gaps.inc(market=str(self.book.market_id))
+
+					from core.logger import logger
+					logger.log(logging.WARNING, f"""Gap in the order book deltas of {self.book.market_id} after sequence {self.book.sequence}, fetching a new snapshot.""")
+			except asyncio.CancelledError:
+				raise
+			except Exception as exception:
+				self.book.is_synchronized = False
+
+				from core.logger import logger
+				logger.ignore_exception(exception)
+
+				await asyncio.sleep(self.interval)
@@ -0,0 +1,190 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from singleton.singleton import ThreadSafeSingleton
+
+from core.properties import properties
+from hummingbot.order_book import OrderBookSide
+from hummingbot.types import OrderSide
+
+# Fingerprints of the recent prices kept per market and side.
+MAXIMUM_FINGERPRINTS = 64
+
+class P2Quantile(object):
+	"""
+	Streaming estimate of a quantile with the P² algorithm (Jain and Chlamtac): five markers whose heights are adjusted
+	with a parabolic interpolation, so memory and time per value are constant. Exact until five values are added.
+	"""
+
+	def __init__(self, quantile: float):
+		self.quantile = quantile
+		self.count = 0
+		self._heights: List[float] = []
+		self._positions = [0.0, 1.0, 2.0, 3.0, 4.0]
+		self._desired = [0.0, 2 * quantile, 4 * quantile, 2 + 2 * quantile, 4.0]
+		self._increments = [0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0]
+
+	def add(self, value: float):
+		self.count += 1
+
+		heights = self._heights
+		if self.count <= 5:
+			heights.append(value)
+			heights.sort()
+
+			return
+
+		if value < heights[0]:
+			heights[0] = value
+			cell = 0
+		elif value >= heights[4]:
+			heights[4] = value
+			cell = 3
+		else:
+			cell = 0
+			while value >= heights[cell + 1]:
+				cell += 1
+
+		positions = self._positions
+		for index in range(cell + 1, 5):
+			positions[index] += 1
+		for index in range(5):
+			self._desired[index] += self._increments[index]
+
+		for index in (1, 2, 3):
+			difference = self._desired[index] - positions[index]
+
+			if (difference >= 1 and positions[index + 1] - positions[index] > 1) \
+				or (difference <= -1 and positions[index - 1] - positions[index] < -1):
+				step = 1 if difference > 0 else -1
+
+				height = heights[index] + step / (positions[index + 1] - positions[index - 1]) * (
+					(positions[index] - positions[index - 1] + step) * (heights[index + 1] - heights[index]) / (positions[index + 1] - positions[index])
+					+ (positions[index + 1] - positions[index] - step) * (heights[index] - heights[index - 1]) / (positions[index] - positions[index - 1])
+				)
+
+				if not heights[index - 1] < height < heights[index + 1]:
+					# The parabola would break the order of the markers, linear instead.
+					height = heights[index] + step * (heights[index + step] - heights[index]) / (positions[index + step] - positions[index])
+
+				heights[index] = height
+				positions[index] += step
+
+	@property
+	def value(self) -> float:
+		if not self.count:
+			return math.nan
+
+		if self.count <= 5:
+			return float(np.percentile(self._heights, self.quantile * 100))
+
+		return self._heights[2]
+
+
+class _WindowedQuantile(object):
+	"""
+	Two generations of P² estimates, so the quantile follows the recent prices: every value goes to both, the older
+	one is read and, once it has seen two windows, it is replaced by the newer one, which has seen one.
+	"""
+
+	def __init__(self, quantile: float):
+		self.quantile = quantile
+		self._older = P2Quantile(quantile)
+		self._newer = P2Quantile(quantile)
+
+	def add(self, value: float, window: int):
+		self._older.add(value)
+		self._newer.add(value)
+
+		if self._older.count >= 2 * window:
+			self._older = self._newer
+			self._newer = P2Quantile(self.quantile)
+
+	@property
+	def value(self) -> float:
+		return self._older.value
+
+
+@ThreadSafeSingleton
+class OutlierFilter(object):
+	"""
+	Outlier thresholds of the order book prices per market and side, from quantiles estimated across ticks.
+
+	The bids below half of their first quartile and the asks above one and a half times their third quartile are
+	outliers, like with the snapshot percentiles, but the quartiles are streaming estimates over the recent books, so
+	they do not jump with a single snapshot. The estimates are shared by every worker of a market.
+
+	The same prices are added only once per market and side, whether a book is read again by the following ticks or
+	fetched by every worker of the market, so the estimates are not weighted towards the books that change less often
+	nor towards the markets with more workers.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._quantiles: Dict[Tuple[str, OrderSide], _WindowedQuantile] = {}
+		# Recent fingerprints of the prices added, the books of several workers of a market can be read alternately.
+		self._fingerprints: Dict[Tuple[str, OrderSide], OrderedDict] = {}
+
+	def update(self, market: str, side: OrderBookSide, count: int = None) -> float:
+		"""
+		Adds the prices of the best levels, unless the same prices were added recently, and returns the threshold of the
+		side.
+		"""
+		window = int(properties.get_or_default("system.strategies.outliers.window", 10000))
+		key = (market, side.side)
+		prices = side.prices[:count]
+		fingerprint = (len(prices), hash(prices.tobytes()))
+
+		with self._lock:
+			quantile = self._quantiles.get(key)
+			if quantile is None:
+				quantile = self._quantiles[key] = _WindowedQuantile(0.25 if side.side == OrderSide.BUY else 0.75)
+
+			fingerprints = self._fingerprints.setdefault(key, OrderedDict())
+			if fingerprint in fingerprints:
+				fingerprints.move_to_end(fingerprint)
+			else:
+				fingerprints[fingerprint] = None
+				if len(fingerprints) > MAXIMUM_FINGERPRINTS:
+					fingerprints.popitem(last=False)
+
+				for price in prices.tolist():
+					quantile.add(price, window)
+
+			return self._get_threshold(side.side, quantile.value)
+
+	def get_threshold(self, market: str, side: OrderSide) -> float:
+		with self._lock:
+			quantile = self._quantiles.get((market, side))
+
+			return self._get_threshold(side, quantile.value if quantile else math.nan)
+
+	@staticmethod
+	def _get_threshold(side: OrderSide, value: float) -> float:
+		return value * 0.5 if side == OrderSide.BUY else value * 1.5
+
+	def get_levels_count(self, market: str, side: OrderBookSide, count: int) -> int:
+		"""
+		Updates the estimates with the best levels and returns how many of them are not outliers.
+		"""
+		if not count:
+			return 0
+
+		threshold = self.update(market, side, count)
+
+		if side.side == OrderSide.BUY:
+			return int(np.searchsorted(-side.prices[:count], -threshold, side="left"))
+
+		return int(np.searchsorted(side.prices[:count], threshold, side="left"))
+
+	def clear(self, market: str = None):
+		with self._lock:
+			for key in [key for key in self._quantiles if market is None or key[0] == market]:
+				del self._quantiles[key]
+				self._fingerprints.pop(key, None)
+
+
+outlier_filter = OutlierFilter.instance()
@@ -23,6 +23,12 @@ class Base(ABC):
 		from core.telegram.telegram import telegram
 		telegram.log(level=level, prefix=self.id, message=message, object=object)
 
+	# noinspection PyMethodMayBeStatic
+	def notify_status_change(self):
+		# noinspection PyUnresolvedReferences
+		from core.status import status_publisher
+		status_publisher.refresh()
+
 	def ignore_exception(self, exception: Exception):
 		# noinspection PyUnresolvedReferences
 		from core.logger import logger
@@ -0,0 +1,135 @@
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from dotmap import DotMap
+
+# Filling timestamp, numeric id and id, the ids of the same market grow with time.
+Key = Tuple[float, int, str]
+
+
+def _get_key(id: str, order: Any) -> Key:
+	try:
+		timestamp = float(order.get("fillingTimestamp") or 0)
+	except (TypeError, ValueError):
+		timestamp = 0.0
+
+	return timestamp, int(id) if id.isdigit() else 0, id
+
+
+class FilledOrdersArchive(object):
+	"""
+	Filled orders of a worker, indexed by id, filling time and side.
+
+	Only the most recent orders are kept in memory, the complete history stays in the tick history (GET /history/fills).
+	The newest evicted order is a watermark: an order that is not newer than it was already archived before.
+
+	After the first request, which brings the whole history, only the orders that may have been filled since are
+	requested: the ones created by the worker or seen open. They stop being pending once they are seen filled, or once
+	they were absent from the open orders for a number of requests, the grace, since the indexer may report a fill
+	after the order left the open orders.
+	"""
+
+	def __init__(self, capacity: int, grace: int = 3):
+		self.capacity = max(1, capacity)
+		self.grace = max(1, grace)
+		self.is_synchronized = False
+		self._orders: Dict[str, Any] = {}
+		self._keys: List[Key] = []
+		self._sides: Dict[str, Set[str]] = {}
+		self._watermark: Optional[Key] = None
+		# Requests left for each pending order.
+		self._pending_ids: Dict[str, int] = {}
+		self._open_ids: Set[str] = set()
+
+	def __len__(self) -> int:
+		return len(self._orders)
+
+	def __contains__(self, id: str) -> bool:
+		return id in self._orders
+
+	def track_created_orders(self, ids: Iterable[str]):
+		self._pending_ids.update((str(id), self.grace) for id in ids)
+
+	def track_open_orders(self, ids: Iterable[str]):
+		self._open_ids = {str(id) for id in ids}
+		self._pending_ids.update((id, self.grace) for id in self._open_ids)
+
+	def get_pending_ids(self) -> List[str]:
+		return sorted(self._pending_ids.keys() - self._orders.keys())
+
+	def add(self, orders: Any) -> DotMap[str, Any]:
+		"""
+		Archives the orders of a response and returns the ones not seen before, from the oldest to the newest.
+
+		The returned orders include the ones evicted right away, only the memory is bounded by the capacity.
+		"""
+		added = []
+		for (id, order) in dict(orders or {}).items():
+			id = str(order.get("id") or id)
+			if id in self._orders:
+				continue
+
+			key = _get_key(id, order)
+			if self._watermark is not None and key <= self._watermark:
+				continue
+
+			self._orders[id] = order
+			self._sides.setdefault(str(order.get("side")).upper(), set()).add(id)
+			added.append((key, order))
+
+		# Merged once, inserting each key would be quadratic for the first response, which brings the whole history.
+		added.sort(key=lambda item: item[0])
+		self._keys = sorted(self._keys + [key for (key, _) in added])
+
+		self._evict()
+
+		for (key, _) in added:
+			self._pending_ids.pop(key[2], None)
+
+		for id in list(self._pending_ids.keys()):
+			if id not in self._open_ids:
+				self._pending_ids[id] -= 1
+
+				if self._pending_ids[id] <= 0:
+					del self._pending_ids[id]
+
+		self.is_synchronized = True
+
+		# Assigned one by one, building the DotMap from a dictionary would copy every order.
+		output = DotMap(_dynamic=False)
+		for (key, order) in added:
+			output[key[2]] = order
+
+		return output
+
+	def _evict(self):
+		excess = len(self._keys) - self.capacity
+		if excess <= 0:
+			return
+
+		for key in self._keys[:excess]:
+			order = self._orders.pop(key[2])
+			self._sides.get(str(order.get("side")).upper(), set()).discard(key[2])
+
+		self._watermark = max(self._keys[excess - 1], self._watermark) if self._watermark else self._keys[excess - 1]
+		del self._keys[:excess]
+
+	def get(self, id: str) -> Optional[Any]:
+		return self._orders.get(str(id))
+
+	def last(self, side: str = None) -> Optional[Any]:
+		for key in reversed(self._keys):
+			if side is None or key[2] in self._sides.get(side.upper(), ()):
+				return self._orders[key[2]]
+
+		return None
+
+	def query(self, start: float = None, end: float = None, side: str = None) -> List[Any]:
+		"""
+		Returns the orders filled within a time range, optionally of one side, from the oldest to the newest.
+		"""
+		first = bisect.bisect_left(self._keys, (start,)) if start is not None else 0
+		last = bisect.bisect_left(self._keys, (end,)) if end is not None else len(self._keys)
+		ids = self._sides.get(side.upper(), set()) if side is not None else None
+
+		return [self._orders[key[2]] for key in self._keys[first:last] if ids is None or key[2] in ids]
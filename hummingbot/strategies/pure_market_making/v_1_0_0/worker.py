@@ -1,11 +1,11 @@
 import asyncio
 import copy
-import json
 import os
 import textwrap
+import time
 import traceback
 from array import array
-from decimal import Decimal, DecimalException
+from decimal import Decimal
 from logging import DEBUG, INFO, WARNING, CRITICAL
 from typing import Any, List, Optional
 
@@ -14,15 +14,37 @@ from dotmap import DotMap
 
 from core.decorators import log_class_exceptions
 from core.properties import properties
+from core.state_codec import ANY, DECIMAL, StateCodec
+from core.state_store import state_store
+from core.tick_history import tick_history
+from core.time_series import time_series
 from core.types import SystemStatus
 from core.utils import dump, deep_merge
 from hummingbot.constants import DECIMAL_NAN, DEFAULT_PRECISION, alignment_column, DECIMAL_INFINITY
 from hummingbot.constants import KUJIRA_NATIVE_TOKEN, DECIMAL_ZERO, FLOAT_ZERO, FLOAT_INFINITY
 from hummingbot.hummingbot_gateway import HummingbotGateway
-from hummingbot.strategies.worker_base import WorkerBase
+from hummingbot.middle_price import calculate_middle_prices
+from hummingbot.order_book import OrderBookEngine, OrderBookSide
+from hummingbot.strategies.filled_orders_archive import FilledOrdersArchive
+from hummingbot.strategies.worker_base import WorkerBase, sent_orders, tick_duration, tick_errors, ticks
 from hummingbot.types import OrderStatus, OrderType, OrderSide, PriceStrategy, MiddlePriceStrategy, Order
-from hummingbot.utils import calculate_middle_price, format_currency, format_lines, format_line, format_percentage, \
-	parse_order_book
+from hummingbot.utils import format_currency, format_lines, format_line, format_percentage
+
+
+state_codec = StateCodec({
+	"balances": {
+		"tokens": {ANY: {ANY: DECIMAL, "inUSD": {ANY: DECIMAL}}},
+		"total": {ANY: DECIMAL},
+	},
+	"orders": {ANY: {ANY: {"price": DECIMAL, "amount": DECIMAL, "fee": DECIMAL}}},
+	"gas_payed": {
+		"token_amounts": {ANY: DECIMAL, "withdrawing": {ANY: DECIMAL}},
+		"usd_amounts": {ANY: DECIMAL, "withdrawing": {ANY: DECIMAL}},
+	},
+	"wallet": {ANY: DECIMAL},
+	"token": {"base": {ANY: DECIMAL}},
+	"price": {ANY: DECIMAL},
+})
 
 
 @log_class_exceptions
@@ -57,11 +79,15 @@ class Worker(WorkerBase):
 			self._quote_token_name = None
 			self._base_token_name = None
 			self._tickers: DotMap[str, Any]
+			self._order_book_engine: Optional[OrderBookEngine] = None
 			self._balances: DotMap[str, Any] = DotMap({}, _dynamic=False)
 			self._all_tracked_orders_ids: [str] = []
 			self._currently_tracked_orders_ids: [str] = []
 			self._open_orders: DotMap[str, Any]
-			self._filled_orders: DotMap[str, Any]
+			self._filled_orders = FilledOrdersArchive(
+				int(properties.get_or_default("system.strategies.filled_orders.capacity", 1000)),
+				int(properties.get_or_default("system.strategies.filled_orders.grace", 3)),
+			)
 
 			self._wallet_previous_value: Optional[float] = None
 			self._token_previous_price: Optional[float] = None
@@ -130,6 +156,13 @@ class Worker(WorkerBase):
 			self._base_token_name = self._market.baseToken.name
 			self._quote_token_name = self._market.quoteToken.name
 
+			self._order_book_engine = OrderBookEngine(
+				self._get_order_book,
+				market_id=self._market.id,
+				interval=properties.get_or_default("system.strategies.order_books.interval", 10000) / 1000.0,
+				maximum_age=properties.get_or_default("system.strategies.order_books.maximum_age", 20000) / 1000.0
+			)
+
 			if self._configuration.strategy.withdraw_market_on_start:
 				try:
 					await self._market_withdraw()
@@ -165,7 +198,11 @@ class Worker(WorkerBase):
 
 		await self.initialize()
 
-		self._tasks.on_tick = asyncio.create_task(self.on_tick())
+		# Without a stream of deltas there is nothing to follow, the ticks fetch the book when they need it.
+		if self._order_book_engine.is_streaming:
+			self._tasks.order_books = asyncio.create_task(self._order_book_engine.run(), name=f"{self.id}.order_books")
+		self._tasks.on_tick = asyncio.create_task(self.on_tick(), name=f"{self.id}.on_tick")
+		self.notify_status_change()
 
 		self.log(INFO, "end")
 
@@ -176,14 +213,15 @@ class Worker(WorkerBase):
 
 			self._can_run = False
 
-			try:
-				if self._tasks.on_tick:
-					self._tasks.on_tick.cancel()
-					await self._tasks.on_tick
-			except asyncio.exceptions.CancelledError:
-				pass
-			except Exception as exception:
-				self.ignore_exception(exception)
+			for task_name in ("on_tick", "order_books"):
+				try:
+					if self._tasks[task_name]:
+						self._tasks[task_name].cancel()
+						await self._tasks[task_name]
+				except asyncio.exceptions.CancelledError:
+					pass
+				except Exception as exception:
+					self.ignore_exception(exception)
 
 			if self._initialized:
 				if self._configuration.strategy.cancel_all_orders_on_stop:
@@ -199,6 +237,7 @@ class Worker(WorkerBase):
 						self.ignore_exception(exception)
 		finally:
 			await self.exit()
+			self.notify_status_change()
 
 			self.telegram_log(INFO, "stopped.")
 			self.log(INFO, "end")
@@ -221,6 +260,8 @@ class Worker(WorkerBase):
 
 					self._is_busy = True
 
+					tick_start = time.perf_counter()
+
 					self._reload_configuration()
 
 					self.state.orders.new = DotMap({}, _dynamic=False)
@@ -228,35 +269,50 @@ class Worker(WorkerBase):
 					self.state.orders.canceled = DotMap({}, _dynamic=False)
 					self.state.orders.filled = DotMap({}, _dynamic=False)
 
-					await self._get_balances(use_cache=False)
-					await self._get_market_price(use_cache=False)
+					with self.measure("market_data"):
+						await self._get_balances(use_cache=False)
+						await self._get_market_price(use_cache=False)
 
-					await self._should_stop_loss()
+					with self.measure("stop_loss"):
+						await self._should_stop_loss()
 
-					await self._withdraw_from_market_if_necessary()
+					with self.measure("withdraw"):
+						await self._withdraw_from_market_if_necessary()
 					await asyncio.sleep(self._configuration.strategy.sleep_time_after_withdraw)
 
-					await self._get_filled_orders(use_cache=False)
-					proposed_orders: List[Order] = await self._create_proposal()
-					current_open_orders = await self._get_open_orders(use_cache=False)
-					refined_proposal = await self._refine_proposal(current_open_orders, proposed_orders)
+					with self.measure("proposal"):
+						await self._get_filled_orders(use_cache=False)
+						proposed_orders: List[Order] = await self._create_proposal()
+						current_open_orders = await self._get_open_orders(use_cache=False)
+						refined_proposal = await self._refine_proposal(current_open_orders, proposed_orders)
 
-					await self._cancel_untracked_orders(refined_proposal.solution.orders.cancel, current_open_orders)
+					with self.measure("cancellation"):
+						await self._cancel_untracked_orders(refined_proposal.solution.orders.cancel, current_open_orders)
 					await asyncio.sleep(self._configuration.strategy.sleep_time_after_orders_cancellation)
 
-					await self._get_balances(use_cache=False)
-					adjusted_orders_to_create = await self._adjust_proposal_to_budget(refined_proposal.solution.orders.create)
-					await self._place_orders(adjusted_orders_to_create)
+					with self.measure("placement"):
+						await self._get_balances(use_cache=False)
+						adjusted_orders_to_create = await self._adjust_proposal_to_budget(refined_proposal.solution.orders.create)
+						await self._place_orders(adjusted_orders_to_create)
 					self._currently_tracked_orders_ids.extend(list(refined_proposal.solution.meta.keep.keys()))
 					await asyncio.sleep(self._configuration.strategy.sleep_time_after_orders_creation)
 
-					current_open_orders = await self._get_open_orders(use_cache=False)
-					self.state.orders.untracked = self._get_untracked_orders(current_open_orders)
+					with self.measure("reconciliation"):
+						current_open_orders = await self._get_open_orders(use_cache=False)
+						self.state.orders.untracked = self._get_untracked_orders(current_open_orders)
 
-					await self._get_balances(use_cache=False)
-					self.state.balances = self._balances
+						await self._get_balances(use_cache=False)
+						self.state.balances = self._balances
 
-					self._print_summary_and_save_state()
+					with self.measure("summary"):
+						self._print_summary_and_save_state()
+						tick_history.record(self.id, self._market_name, self.state)
+						time_series.record(self.id, self.state)
+
+					tick_duration.observe(time.perf_counter() - tick_start, worker=self.id, phase="total")
+					ticks.inc(worker=self.id)
+					sent_orders.inc(len(refined_proposal.solution.orders.cancel), worker=self.id, action="cancel")
+					sent_orders.inc(len(adjusted_orders_to_create), worker=self.id, action="create")
 
 					self._first_time = False
 
@@ -278,6 +334,8 @@ class Worker(WorkerBase):
 				except asyncio.exceptions.CancelledError:
 					return
 				except Exception as exception:
+					tick_errors.inc(worker=self.id)
+
 					self.ignore_exception(exception)
 		finally:
 			self.log(INFO, "end")
@@ -315,8 +373,9 @@ class Worker(WorkerBase):
 		try:
 			self.log(INFO, "start")
 
-			order_book = await self._get_order_book()
-			bids, asks = parse_order_book(order_book)
+			# Fetched here only when it is stale, a streamed book is kept up to date in the background.
+			order_book = await self._order_book_engine.get_arrays()
+			bids, asks = order_book.bids, order_book.asks
 
 			ticker_price = await self._get_market_price(use_cache=False)
 			self.state.price.ticker_price = ticker_price
@@ -358,8 +417,8 @@ class Worker(WorkerBase):
 			minimum_price_increment = Decimal(self._market.minimumPriceIncrement)
 			minimum_order_size = Decimal(self._market.minimumOrderSize)
 
-			best_bid_price = Decimal(next(iter(bids), {"price": FLOAT_ZERO}).price)
-			best_ask_price = Decimal(next(iter(asks), {"price": FLOAT_INFINITY}).price)
+			best_bid_price = Decimal(str(bids.get_best_price(FLOAT_ZERO)))
+			best_ask_price = Decimal(str(asks.get_best_price(FLOAT_INFINITY)))
 
 			client_id = 1
 			proposal = []
@@ -666,23 +725,31 @@ class Worker(WorkerBase):
 	async def _get_market_price(self, use_cache: bool = True) -> Decimal:
 		return await self._get_base_ticker_price(use_cache=use_cache)
 
-	async def _get_market_middle_price(self, bids, asks, strategy: MiddlePriceStrategy = None) -> Decimal:
+	async def _get_market_middle_price(self, bids: OrderBookSide, asks: OrderBookSide, strategy: MiddlePriceStrategy = None) -> Decimal:
 		try:
 			self.log(INFO, "start")
 
+			notional = self._configuration.strategy.get("middle_price_notional", None)
+			# Only the selected strategy is calculated, the fallback without one needs all of them.
+			prices = calculate_middle_prices(
+				bids,
+				asks,
+				notional=float(notional) if notional is not None else None,
+				market=self._market.id if properties.get_or_default("system.strategies.outliers.streaming", True) else None,
+				strategies=(strategy,) if strategy else None
+			)
+
 			if strategy:
-				return calculate_middle_price(bids, asks, strategy)
+				if strategy not in prices:
+					raise ValueError(f"""The {strategy.name} middle price strategy needs "strategy.middle_price_notional".""")
 
-			try:
-				return calculate_middle_price(bids, asks, MiddlePriceStrategy.VWAP)
-			except (Exception,):
-				try:
-					return calculate_middle_price(bids, asks, MiddlePriceStrategy.WAP)
-				except (Exception,):
-					try:
-						return calculate_middle_price(bids, asks, MiddlePriceStrategy.SAP)
-					except (Exception,):
-						return await self._get_market_price()
+				return prices[strategy]
+
+			for candidate in (MiddlePriceStrategy.VWAP, MiddlePriceStrategy.WAP, MiddlePriceStrategy.SAP):
+				if prices[candidate].is_finite() and prices[candidate] > DECIMAL_ZERO:
+					return prices[candidate]
+
+			return await self._get_market_price()
 		finally:
 			self.log(INFO, "end")
 
@@ -723,6 +790,8 @@ class Worker(WorkerBase):
 
 				self.log(DEBUG, f"""gateway.kujira_get_balances: request:\n{dump(request)}""")
 
+				self.count_cache_request("balances", use_cache and self._balances is not None)
+
 				if use_cache and self._balances is not None:
 					response = self._balances
 				else:
@@ -829,6 +898,8 @@ class Worker(WorkerBase):
 
 				self.log(DEBUG, f"""gateway.kujira_get_ticker: request:\n{dump(request)}""")
 
+				self.count_cache_request("ticker", use_cache and self._tickers is not None)
+
 				if use_cache and self._tickers is not None:
 					response = self._tickers
 				else:
@@ -865,11 +936,14 @@ class Worker(WorkerBase):
 
 				self.log(DEBUG, f"""gateway.kujira_get_open_orders: request:\n{dump(request)}""")
 
+				self.count_cache_request("open_orders", use_cache and self._open_orders is not None)
+
 				if use_cache and self._open_orders is not None:
 					response = self._open_orders
 				else:
 					response = await HummingbotGateway.kujira_get_orders(request)
 					self._open_orders = response
+					self._filled_orders.track_open_orders(response.keys())
 
 				return response
 			except Exception as exception:
@@ -885,14 +959,9 @@ class Worker(WorkerBase):
 		try:
 			self.log(INFO, "start")
 
-			filled_orders = await self._get_filled_orders()
-
-			if len((filled_orders or {})):
-				last_filled_order = list(DotMap(filled_orders).values())[0]
-			else:
-				last_filled_order = None
+			await self._get_filled_orders()
 
-			return last_filled_order
+			return self._filled_orders.last()
 		finally:
 			self.log(INFO, "end")
 
@@ -912,13 +981,22 @@ class Worker(WorkerBase):
 					"status": OrderStatus.FILLED.value[0]
 				}
 
+				if self._filled_orders.is_synchronized:
+					# After the whole history, only the orders created or seen open since can have been filled.
+					request["ids"] = self._filled_orders.get_pending_ids()
+
 				self.log(DEBUG, f"""gateway.kujira_get_filled_orders: request:\n{dump(request)}""")
 
-				if use_cache and self._filled_orders is not None:
-					response = self._filled_orders
+				if use_cache and self._filled_orders.is_synchronized:
+					self.count_cache_request("filled_orders", True)
+
+					response = self.state.orders.filled
+				elif "ids" in request and not request["ids"]:
+					response = self._filled_orders.add({})
 				else:
-					response = await HummingbotGateway.kujira_get_orders(request)
-					self._filled_orders = response
+					self.count_cache_request("filled_orders", False)
+
+					response = self._filled_orders.add(await HummingbotGateway.kujira_get_orders(request))
 
 				self.state.orders.filled = response
 
@@ -965,6 +1043,7 @@ class Worker(WorkerBase):
 
 					self._currently_tracked_orders_ids = list(response.keys())
 					self._all_tracked_orders_ids.extend(self._currently_tracked_orders_ids)
+					self._filled_orders.track_created_orders(self._currently_tracked_orders_ids)
 
 					if response:
 						if not self._balances:
@@ -1605,47 +1684,21 @@ class Worker(WorkerBase):
 
 	def _recreate_state(self):
 		self.state = self._get_new_state()
-		self._save_state()
+		state_store.get(self._database_path).reset(self.state)
 
 	def _save_state(self):
-		def handle_serialization(target):
-			if isinstance(target, Decimal):
-				return str(target)
-			raise TypeError("Non serializable type: {}".format(type(target)))
-
-		filepath = self._database_path
-		dirpath = os.path.dirname(filepath)
-		if not os.path.exists(dirpath):
-			os.makedirs(dirpath, exist_ok=True)
-
-		with open(filepath, "w+") as file:
-			json.dump(self.state.toDict(), file, indent=2, default=handle_serialization)
+		state_store.get(self._database_path).save(self.state)
 
 	def _load_state(self):
 		if self._configuration.state.recreate_on_start:
 			self._recreate_state()
 		else:
-			filepath = self._database_path
-			dirpath = os.path.dirname(filepath)
-			if not os.path.exists(dirpath):
-				os.makedirs(dirpath, exist_ok=True)
-
-			with open(filepath, "a+") as file:
-				file.seek(0)
-				content = file.read()
-				if not content or content == "":
-					self._recreate_state()
-				else:
-					def handle_deserialization(target):
-						for key, value in target.items():
-							if isinstance(value, str):
-								try:
-									target[key] = Decimal(value)
-								except DecimalException:
-									pass
-						return target
-
-					self.state = DotMap(json.loads(content, object_hook=handle_deserialization), _dynamic=False)
+			state = state_store.get(self._database_path).load(state_codec)
+
+			if state is None:
+				self._recreate_state()
+			else:
+				self.state = DotMap(state, _dynamic=False)
 
 	def _print_summary_and_save_state(self):
 		summary = self._get_summary()
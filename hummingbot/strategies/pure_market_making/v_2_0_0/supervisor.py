@@ -2,18 +2,18 @@ from logging import DEBUG, INFO
 
 import asyncio
 import copy
-import json
 import os
 import textwrap
 import traceback
 import yaml
 from _decimal import Decimal
-from decimal import DecimalException
 from dotmap import DotMap
-from typing import Any
+from typing import Any, List
 
 from core.decorators import log_class_exceptions
 from core.properties import properties
+from core.state_codec import ANY, DECIMAL, StateCodec
+from core.state_store import state_store
 from core.types import SystemStatus
 from core.utils import deep_merge
 from core.utils import dump
@@ -26,6 +26,12 @@ from hummingbot.strategies.worker_base import WorkerBase
 from hummingbot.utils import format_currency, format_line, format_percentage
 
 
+state_codec = StateCodec({
+	"balances": {"total": {ANY: DECIMAL}},
+	"wallets": {ANY: DECIMAL},
+})
+
+
 @log_class_exceptions
 class Supervisor(StrategyBase):
 
@@ -132,6 +138,9 @@ class Supervisor(StrategyBase):
 
 		return status
 
+	def get_workers_ids(self) -> List[str]:
+		return list(self._configuration.workers.keys())
+
 	async def initialize(self):
 		try:
 			self.log(INFO, "start")
@@ -170,7 +179,8 @@ class Supervisor(StrategyBase):
 
 		await self.initialize()
 
-		self._tasks.on_tick = asyncio.create_task(self.on_tick())
+		self._tasks.on_tick = asyncio.create_task(self.on_tick(), name=f"{self.id}.on_tick")
+		self.notify_status_change()
 
 		self.log(INFO, "end")
 
@@ -199,6 +209,7 @@ class Supervisor(StrategyBase):
 				self.ignore_exception(exception)
 		finally:
 			await self.exit()
+			self.notify_status_change()
 
 			self.telegram_log(INFO, "stopped.")
 			self.log(INFO, "end")
@@ -226,6 +237,7 @@ class Supervisor(StrategyBase):
 				self._tasks.workers[worker_id].cancel()
 				# await self._tasks.workers[worker_id]
 				self._tasks.workers[worker_id] = None
+				self.notify_status_change()
 			else:
 				self.log(INFO, f"Worker {worker_id} is not running")
 		finally:
@@ -497,47 +509,21 @@ class Supervisor(StrategyBase):
 
 	def _recreate_state(self):
 		self.state = self._get_new_state()
-		self._save_state()
+		state_store.get(self._database_path).reset(self.state)
 
 	def _save_state(self):
-		def handle_serialization(target):
-			if isinstance(target, Decimal):
-				return str(target)
-			raise TypeError("Non serializable type: {}".format(type(target)))
-
-		filepath = self._database_path
-		dirpath = os.path.dirname(filepath)
-		if not os.path.exists(dirpath):
-			os.makedirs(dirpath, exist_ok=True)
-
-		with open(filepath, "w+") as file:
-			json.dump(self.state.toDict(), file, indent=2, default=handle_serialization)
+		state_store.get(self._database_path).save(self.state)
 
 	def _load_state(self):
 		if self._configuration.state.recreate_on_start:
 			self._recreate_state()
 		else:
-			filepath = self._database_path
-			dirpath = os.path.dirname(filepath)
-			if not os.path.exists(dirpath):
-				os.makedirs(dirpath, exist_ok=True)
-
-			with open(filepath, "a+") as file:
-				file.seek(0)
-				content = file.read()
-				if not content or content == "":
-					self._recreate_state()
-				else:
-					def handle_deserialization(target):
-						for key, value in target.items():
-							if isinstance(value, str):
-								try:
-									target[key] = Decimal(value)
-								except DecimalException:
-									pass
-						return target
-
-					self.state = DotMap(json.loads(content, object_hook=handle_deserialization), _dynamic=False)
+			state = state_store.get(self._database_path).load(state_codec)
+
+			if state is None:
+				self._recreate_state()
+			else:
+				self.state = DotMap(state, _dynamic=False)
 
 	def _print_summary_and_save_state(self):
 		summary = self._get_summary()
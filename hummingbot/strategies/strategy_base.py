@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from hummingbot.strategies.base import Base
 
@@ -18,6 +18,10 @@ class StrategyBase(Base):
 	def get_status(self) -> Dict[str, Any]:
 		pass
 
+	@abstractmethod
+	def get_workers_ids(self) -> List[str]:
+		pass
+
 	def _calculate_waiting_time(self, number: int) -> int:
 		current_timestamp_in_milliseconds = self.clock.now()
 
@@ -1,5 +1,12 @@
+from core.metrics import metrics
 from hummingbot.strategies.base import Base
 
+tick_duration = metrics.histogram("worker_tick_duration_seconds", "Duration of the worker ticks and of their phases.")
+ticks = metrics.counter("worker_ticks_total", "Completed worker ticks.")
+tick_errors = metrics.counter("worker_tick_errors_total", "Worker ticks interrupted by an exception.")
+sent_orders = metrics.counter("worker_orders_total", "Orders sent for creation or cancellation by the workers.")
+cache_requests = metrics.counter("worker_cache_requests_total", "Requests of the workers by resource, answered from their cache (hit) or not (miss).")
+
 
 class WorkerBase(Base):
 
@@ -8,6 +15,15 @@ class WorkerBase(Base):
 	def __init__(self):
 		self.id: str
 
+	def measure(self, phase: str):
+		"""
+		Times a phase of the tick, for example: with self.measure("proposal"): ...
+		"""
+		return tick_duration.time(worker=self.id, phase=phase)
+
+	def count_cache_request(self, resource: str, hit: bool):
+		cache_requests.inc(worker=self.id, resource=resource, result="hit" if hit else "miss")
+
 	def _calculate_waiting_time(self, number: int) -> int:
 		current_timestamp_in_milliseconds = self.clock.now()
 
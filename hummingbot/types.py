@@ -86,6 +86,7 @@ class MiddlePriceStrategy(Enum):
 	SAP = 'SIMPLE_AVERAGE_PRICE',
 	WAP = 'WEIGHTED_AVERAGE_PRICE',
 	VWAP = 'VOLUME_WEIGHTED_AVERAGE_PRICE'
+	VWAP_BY_NOTIONAL = 'VOLUME_WEIGHTED_AVERAGE_PRICE_BY_NOTIONAL'
 
 
 class Order:
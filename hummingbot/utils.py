@@ -1,17 +1,23 @@
 import hashlib
+import json
 import math
+import os
 import random
 import time
 from _decimal import Decimal
 from array import array
 from datetime import datetime
-from typing import Any, List, Union
+from enum import Enum
+from typing import Any, List
 
-import jsonpickle
 import numpy as np
 from dotmap import DotMap
 
+from core.state_codec import encode_decimal
+
 from hummingbot.constants import VWAP_THRESHOLD, DECIMAL_ZERO, alignment_column
+from hummingbot.order_book import OrderBookArrays, OrderBookSide
+from hummingbot.outliers import outlier_filter
 from hummingbot.types import OrderSide, MiddlePriceStrategy
 
 
@@ -19,77 +25,110 @@ def current_timestamp() -> float:
 	return time.time()
 
 
-def generate_hash(input: Any) -> str:
-	return generate_hashes([input])[0]
+def _without_dot_maps(target: Any) -> Any:
+	# The DotMaps are dicts with their items elsewhere, the encoder would see them empty.
+	if isinstance(target, DotMap):
+		return target.toDict()
 
+	if isinstance(target, dict):
+		if not any(isinstance(value, (dict, list, tuple)) for value in target.values()):
+			return target
 
-def generate_hashes(inputs: List[Any]) -> List[str]:
-	hashes = []
-	salt = datetime.now()
+		return {key: _without_dot_maps(value) for (key, value) in target.items()}
 
-	for input in inputs:
-		serialized = jsonpickle.encode(input, unpicklable=True)
-		hasher = hashlib.md5()
-		target = f"{salt}{serialized}".encode("utf-8")
-		hasher.update(target)
-		hash = hasher.hexdigest()
+	if isinstance(target, (list, tuple)):
+		if not any(isinstance(value, (dict, list, tuple)) for value in target):
+			return target
 
-		hashes.append(hash)
+		return [_without_dot_maps(value) for value in target]
 
-	return hashes
+	return target
 
 
-def convert_hb_trading_pair_to_market_name(trading_pair: str) -> str:
-	return trading_pair.replace("-", "/")
+def _canonical_default(target: Any) -> Any:
+	if isinstance(target, Decimal):
+		return encode_decimal(target)
 
+	if isinstance(target, Enum):
+		return str(target)
 
-def convert_market_name_to_hb_trading_pair(market_name: str) -> str:
-	return market_name.replace("/", "-")
+	if isinstance(target, (set, frozenset)):
+		return sorted(target, key=repr)
 
+	if isinstance(target, (bytes, bytearray)):
+		return target.hex()
 
-def parse_order_book(orderbook: DotMap[str, Any]) -> List[
-	Union[List[DotMap[str, Any]], List[DotMap[str, Any]]]]:
-	bids_list = []
-	asks_list = []
+	if isinstance(target, datetime):
+		return target.isoformat()
 
-	bids: DotMap[str, Any] = orderbook.bids
-	asks: DotMap[str, Any] = orderbook.asks
+	if hasattr(target, "__dict__"):
+		return _without_dot_maps(vars(target))
 
-	for value in bids.values():
-		bids_list.append(DotMap({'price': value.price, 'amount': value.amount}, _dynamic=False))
+	raise TypeError(f"Non serializable type: {type(target)}")
 
-	for value in asks.values():
-		asks_list.append(DotMap({'price': value.price, 'amount': value.amount}, _dynamic=False))
 
-	bids_list.sort(key=lambda x: x['price'], reverse=True)
-	asks_list.sort(key=lambda x: x['price'], reverse=False)
+_canonical_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_canonical_default)
 
-	return [bids_list, asks_list]
 
+def serialize_canonically(input: Any) -> bytes:
+	"""
+	JSON with sorted keys, no spaces and decimals without exponent or trailing zeros, so equal values give equal bytes.
+	"""
+	return _canonical_encoder.encode(_without_dot_maps(input)).encode("utf-8")
 
-def split_percentage(bids: [DotMap[str, Any]], asks: [DotMap[str, Any]]) -> List[Any]:
-	asks = asks[:math.ceil((VWAP_THRESHOLD / 100) * len(asks))]
-	bids = bids[:math.ceil((VWAP_THRESHOLD / 100) * len(bids))]
 
-	return [bids, asks]
+def generate_hash(input: Any, digest_size: int = 16, deterministic: bool = False) -> str:
+	return generate_hashes([input], digest_size, deterministic)[0]
+
+
+def generate_hashes(inputs: List[Any], digest_size: int = 16, deterministic: bool = False) -> List[str]:
+	"""
+	BLAKE2b hashes of the canonical serialization of the inputs, as hexadecimal digests of digest_size bytes.
+
+	By default a random salt, the same for the whole batch, makes the hashes unique to the call. Deterministic hashes
+	are unsalted, so the same input always gives the same hash, for example as an idempotency key.
+	"""
+	hasher = hashlib.blake2b(digest_size=digest_size, salt=b"" if deterministic else os.urandom(hashlib.blake2b.SALT_SIZE))
+
+	hashes = []
+	for input in inputs:
+		target = hasher.copy()
+		target.update(serialize_canonically(input))
+
+		hashes.append(target.hexdigest())
+
+	return hashes
+
+
+def convert_hb_trading_pair_to_market_name(trading_pair: str) -> str:
+	return trading_pair.replace("-", "/")
+
+
+def convert_market_name_to_hb_trading_pair(market_name: str) -> str:
+	return market_name.replace("/", "-")
+
 
+def parse_order_book(order_book: DotMap[str, Any]) -> OrderBookArrays:
+	return OrderBookArrays.from_order_book(order_book)
 
-def compute_volume_weighted_average_price(book: [DotMap[str, Any]]) -> np.array:
-	prices = [float(order['price']) for order in book]
-	amounts = [float(order['amount']) for order in book]
 
-	prices = np.array(prices)
-	amounts = np.array(amounts)
+def split_percentage(bids: OrderBookSide, asks: OrderBookSide) -> List[OrderBookSide]:
+	asks = asks.head(math.ceil((VWAP_THRESHOLD / 100) * len(asks)))
+	bids = bids.head(math.ceil((VWAP_THRESHOLD / 100) * len(bids)))
 
-	vwap = (np.cumsum(amounts * prices) / np.cumsum(amounts))
+	return [bids, asks]
 
-	return vwap
 
+def compute_volume_weighted_average_price(book: OrderBookSide) -> np.array:
+	return book.cumulative_notional / book.cumulative_amounts
 
-def remove_outliers(order_book: [DotMap[str, Any]], side: OrderSide) -> [DotMap[str, Any]]:
-	prices = [order['price'] for order in order_book]
 
-	q75, q25 = np.percentile(prices, [75, 25])
+def remove_outliers(order_book: OrderBookSide, side: OrderSide, market: str = None) -> OrderBookSide:
+	if market is not None:
+		# Quartiles estimated across the books of the market, shared by its workers.
+		return order_book.head(outlier_filter.get_levels_count(market, order_book, len(order_book)))
+
+	q75, q25 = np.percentile(order_book.prices, [75, 25])
 
 	# https://www.askpython.com/python/examples/detection-removal-outliers-in-python
 	# intr_qr = q75-q25
@@ -99,52 +138,26 @@ def remove_outliers(order_book: [DotMap[str, Any]], side: OrderSide) -> [DotMap[
 	max_threshold = q75 * 1.5
 	min_threshold = q25 * 0.5
 
-	orders = []
 	if side == OrderSide.SELL:
-		orders = [order for order in order_book if order['price'] < max_threshold]
+		return order_book.filter(order_book.prices < max_threshold)
 	elif side == OrderSide.BUY:
-		orders = [order for order in order_book if order['price'] > min_threshold]
+		return order_book.filter(order_book.prices > min_threshold)
 
-	return orders
+	return order_book.head(0)
 
 
 def calculate_middle_price(
-	bids: [DotMap[str, Any]],
-	asks: [DotMap[str, Any]],
+	bids: OrderBookSide,
+	asks: OrderBookSide,
 	strategy: MiddlePriceStrategy
 ) -> Decimal:
 	if strategy == MiddlePriceStrategy.SAP:
-		bid_prices = [float(item['price']) for item in bids]
-		ask_prices = [float(item['price']) for item in asks]
-
-		best_ask_price = 0
-		best_bid_price = 0
-
-		if len(ask_prices) > 0:
-			best_ask_price = min(ask_prices)
-
-		if len(bid_prices) > 0:
-			best_bid_price = max(bid_prices)
-
-		return Decimal((best_ask_price + best_bid_price) / 2.0)
+		return Decimal((asks.get_best_price() + bids.get_best_price()) / 2.0)
 	elif strategy == MiddlePriceStrategy.WAP:
-		bid_prices = [float(item['price']) for item in bids]
-		ask_prices = [float(item['price']) for item in asks]
-
-		best_ask_price = 0
-		best_ask_volume = 0
-		best_bid_price = 0
-		best_bid_amount = 0
-
-		if len(ask_prices) > 0:
-			best_ask_idx = ask_prices.index(min(ask_prices))
-			best_ask_price = float(asks[best_ask_idx]['price'])
-			best_ask_volume = float(asks[best_ask_idx]['amount'])
-
-		if len(bid_prices) > 0:
-			best_bid_idx = bid_prices.index(max(bid_prices))
-			best_bid_price = float(bids[best_bid_idx]['price'])
-			best_bid_amount = float(bids[best_bid_idx]['amount'])
+		best_ask_price = asks.get_best_price()
+		best_ask_volume = asks.get_best_amount()
+		best_bid_price = bids.get_best_price()
+		best_bid_amount = bids.get_best_amount()
 
 		if best_ask_volume + best_bid_amount > 0:
 			return Decimal(
@@ -162,12 +175,11 @@ def calculate_middle_price(
 		if len(asks) > 0:
 			asks = remove_outliers(asks, OrderSide.SELL)
 
-		book = [*bids, *asks]
-
-		if len(book) > 0:
-			vwap = compute_volume_weighted_average_price(book)
-
-			return Decimal(vwap[-1])
+		if len(bids) + len(asks) > 0:
+			# The last value of the cumulative VWAP of both sides together.
+			return Decimal(
+				np.float64(bids.total_notional + asks.total_notional) / np.float64(bids.total_amount + asks.total_amount)
+			)
 		else:
 			return DECIMAL_ZERO
 	else:
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import os
+import signal
+
+from dotmap import DotMap
+
+from core.properties import properties
+
+properties.load(DotMap({"root_path": os.path.dirname(os.path.realpath(__file__))}))
+# Needs to come after properties loading
+from core.logger import logger
+from core import controller
+from core.runtime import runtime_server
+from core.state_store import state_store
+from core.system import executor
+from core.tick_history import tick_history
+from core.time_series import time_series
+from core.watchdog import loop_watchdog
+
+
+async def main():
+	"""
+	Runs the supervisors and their workers in their own process, serving the API processes through a Unix socket.
+	"""
+	loop = asyncio.get_running_loop()
+	stop = asyncio.Event()
+
+	for signal_number in (signal.SIGTERM, signal.SIGINT):
+		loop.add_signal_handler(signal_number, stop.set)
+
+	await runtime_server.start()
+	loop_watchdog.start()
+
+	logger.log(logging.INFO, f"Strategy runtime listening on {properties.get_or_default('system.runtime.socket', 'resources/runtime.sock')}")
+
+	try:
+		await stop.wait()
+	finally:
+		loop_watchdog.stop()
+		await runtime_server.stop()
+
+		for task in controller.tasks.values():
+			if task and task.start:
+				task.start.cancel()
+
+		executor.close()
+		state_store.flush()
+		tick_history.flush()
+		time_series.flush(close=True)
+
+
+if __name__ == '__main__':
+	asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Compares hashing 10k orders with the previous generate_hashes, jsonpickle and MD5 one input at a time, and with the
+canonical serialization and BLAKE2b batch.
+
+Run from the root folder with: python -m tests.benchmarks.hashing_benchmark
+"""
+import hashlib
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import jsonpickle
+
+from hummingbot.types import Order, OrderSide, OrderStatus, OrderType
+from hummingbot.utils import generate_hashes
+
+NUMBER_OF_ORDERS = 10000
+REPETITIONS = 5
+
+
+def create_orders() -> list:
+	orders = []
+	for index in range(NUMBER_OF_ORDERS):
+		order = Order()
+		order.id = str(1000000 + index)
+		order.client_id = str(index)
+		order.market_name = "KUJI/USK"
+		order.market_id = "kujira14hj2tavq8fpesdwxxcu44rty3hh90vhujrvcmstl4zr3txmfvw9sl4e867"
+		order.owner_address = "kujira1ga9qk68ne00wfflv7y2v92epaajt59e554uulc"
+		order.price = Decimal("0.7712") + Decimal(index) / 10000
+		order.amount = Decimal("12.50")
+		order.side = OrderSide.BUY if index % 2 else OrderSide.SELL
+		order.status = OrderStatus.OPEN
+		order.type = OrderType.LIMIT
+		order.fee = Decimal("0.000125")
+		order.creation_timestamp = 1700000000000 + index
+		orders.append(order)
+
+	return orders
+
+
+def previous_generate_hashes(inputs: list) -> list:
+	hashes = []
+	salt = datetime.now()
+
+	for input in inputs:
+		serialized = jsonpickle.encode(input, unpicklable=True)
+		hasher = hashlib.md5()
+		target = f"{salt}{serialized}".encode("utf-8")
+		hasher.update(target)
+		hash = hasher.hexdigest()
+
+		hashes.append(hash)
+
+	return hashes
+
+
+def measure(function) -> float:
+	durations = []
+	for _ in range(REPETITIONS):
+		start = time.perf_counter()
+		function()
+		durations.append(time.perf_counter() - start)
+
+	return min(durations)
+
+
+def main():
+	orders = create_orders()
+
+	assert generate_hashes(orders, deterministic=True) == generate_hashes(orders, deterministic=True)
+	assert len(set(generate_hashes(orders))) == NUMBER_OF_ORDERS
+
+	print(f"Orders: {NUMBER_OF_ORDERS}")
+	print(f"Previous, jsonpickle and MD5: {measure(lambda: previous_generate_hashes(orders)) * 1000:.0f} ms")
+	print(f"Canonical and BLAKE2b, salted: {measure(lambda: generate_hashes(orders)) * 1000:.0f} ms")
+	print(f"Canonical and BLAKE2b, deterministic: {measure(lambda: generate_hashes(orders, deterministic=True)) * 1000:.0f} ms")
+	print(f"Canonical and BLAKE2b, 8 byte digests: {measure(lambda: generate_hashes(orders, digest_size=8)) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,81 @@
+"""
+Compares calculating the SAP, WAP and VWAP middle prices with the calculate_middle_price function, one call per
+strategy, and with the middle price engine, all the strategies in one pass.
+
+Run from the root folder with: python -m tests.benchmarks.middle_price_benchmark
+"""
+import random
+import time
+
+import numpy as np
+
+from hummingbot.middle_price import calculate_middle_prices
+from hummingbot.order_book import OrderBookArrays, OrderBookSide
+from hummingbot.types import MiddlePriceStrategy, OrderSide
+from hummingbot.utils import calculate_middle_price
+
+SIZES = (100, 1000, 10000, 100000)
+REPETITIONS = 20
+STRATEGIES = (MiddlePriceStrategy.SAP, MiddlePriceStrategy.WAP, MiddlePriceStrategy.VWAP)
+
+
+def create_order_book(size: int) -> OrderBookArrays:
+	random.seed(size)
+
+	bids = np.array(sorted((random.uniform(0.1, 1.0) for _ in range(size)), reverse=True))
+	asks = np.array(sorted(random.uniform(1.0, 10.0) for _ in range(size)))
+	amounts = np.array([random.uniform(1, 1000) for _ in range(size)])
+
+	return OrderBookArrays(OrderBookSide(OrderSide.BUY, bids, amounts), OrderBookSide(OrderSide.SELL, asks, amounts.copy()))
+
+
+def fresh(order_book: OrderBookArrays) -> OrderBookArrays:
+	"""
+	Same book without the cumulative sums computed by a previous run, like a newly fetched one.
+	"""
+	return OrderBookArrays(
+		OrderBookSide(OrderSide.BUY, order_book.bids.prices, order_book.bids.amounts),
+		OrderBookSide(OrderSide.SELL, order_book.asks.prices, order_book.asks.amounts),
+	)
+
+
+def measure(function, order_book: OrderBookArrays) -> float:
+	durations = []
+	for _ in range(REPETITIONS):
+		target = fresh(order_book)
+
+		start = time.perf_counter()
+		function(target)
+		durations.append(time.perf_counter() - start)
+
+	return min(durations)
+
+
+def calculate_with_functions(order_book: OrderBookArrays):
+	return {strategy: calculate_middle_price(order_book.bids, order_book.asks, strategy) for strategy in STRATEGIES}
+
+
+def calculate_with_engine(order_book: OrderBookArrays):
+	return calculate_middle_prices(order_book.bids, order_book.asks, notional=10000)
+
+
+def main():
+	for size in SIZES:
+		order_book = create_order_book(size)
+
+		expected = calculate_with_functions(fresh(order_book))
+		actual = calculate_with_engine(fresh(order_book))
+		for strategy in STRATEGIES:
+			assert abs(float(expected[strategy]) - float(actual[strategy])) <= 1e-9 * float(expected[strategy]), strategy
+
+		functions = measure(calculate_with_functions, order_book)
+		engine = measure(calculate_with_engine, order_book)
+
+		print(
+			f"Levels per side: {size:>6}, functions: {functions * 1000:8.3f} ms, "
+			f"engine (with VWAP by notional): {engine * 1000:8.3f} ms, {functions / engine:5.1f}x"
+		)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,98 @@
+"""
+Compares loading a worker state with 100k filled orders through the previous blanket Decimal object_hook and through
+the schema-driven state codec.
+
+Run from the root folder with: python -m tests.benchmarks.state_codec_benchmark
+"""
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal, DecimalException
+
+from hummingbot.strategies.pure_market_making.v_1_0_0.worker import state_codec
+
+NUMBER_OF_ORDERS = 100000
+REPETITIONS = 3
+
+
+def create_state() -> dict:
+	orders = {}
+	for index in range(NUMBER_OF_ORDERS):
+		id = str(1000000 + index)
+		orders[id] = {
+			"id": id,
+			"clientId": str(index),
+			"marketName": "KUJI/USK",
+			"marketId": "kujira14hj2tavq8fpesdwxxcu44rty3hh90vhujrvcmstl4zr3txmfvw9sl4e867",
+			"ownerAddress": "kujira1ga9qk68ne00wfflv7y2v92epaajt59e554uulc",
+			"price": Decimal("0.7712") + Decimal(index) / 10000,
+			"amount": Decimal("12.5"),
+			"side": "BUY" if index % 2 else "SELL",
+			"status": "FILLED",
+			"type": "LIMIT",
+			"fee": Decimal("0.000125"),
+			"fillingTimestamp": 1700000000000 + index,
+			"hashes": {"creation": f"{index:064x}"},
+		}
+
+	return {
+		"orders": {"new": {}, "open": {}, "canceled": {}, "filled": orders},
+		"wallet": {"initial_value": Decimal("1000"), "current_value": Decimal("1012.5")},
+		"price": {"used_price": Decimal("0.7712")},
+	}
+
+
+def object_hook(target):
+	for key, value in target.items():
+		if isinstance(value, str):
+			try:
+				target[key] = Decimal(value)
+			except DecimalException:
+				pass
+	return target
+
+
+def measure(function) -> float:
+	durations = []
+	for _ in range(REPETITIONS):
+		start = time.perf_counter()
+		function()
+		durations.append(time.perf_counter() - start)
+
+	return min(durations)
+
+
+def main():
+	state = create_state()
+
+	with tempfile.TemporaryDirectory() as directory:
+		previous_path = os.path.join(directory, "previous.json")
+		with open(previous_path, "w") as file:
+			json.dump(state, file, indent=2, default=str)
+
+		codec_path = os.path.join(directory, "codec.json")
+		with open(codec_path, "w") as file:
+			file.write(state_codec.encode(state))
+
+		def load_previous():
+			with open(previous_path) as file:
+				return json.loads(file.read(), object_hook=object_hook)
+
+		def load_codec():
+			with open(codec_path) as file:
+				return state_codec.decode(file.read())
+
+		previous = load_previous()
+		decoded = load_codec()
+		wrongly_converted = sum(1 for order in previous["orders"]["filled"].values() if isinstance(order["id"], Decimal))
+
+		print(f"Filled orders: {NUMBER_OF_ORDERS}")
+		print(f"Previous file: {os.path.getsize(previous_path) / 2 ** 20:.1f} MiB, codec file: {os.path.getsize(codec_path) / 2 ** 20:.1f} MiB")
+		print(f"Previous object_hook: {measure(load_previous) * 1000:.0f} ms, ids turned into Decimals: {wrongly_converted}")
+		print(f"Schema codec: {measure(load_codec) * 1000:.0f} ms, ids turned into Decimals: {sum(1 for order in decoded['orders']['filled'].values() if isinstance(order['id'], Decimal))}")
+		print(f"Codec encode: {measure(lambda: state_codec.encode(state)) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+	main()
@@ -1,10 +1,500 @@
+import asyncio
+import math
+import os
+import re
+import tempfile
+import threading
+import time
 import unittest
+from decimal import Decimal
+
+import numpy as np
+import yaml
+from dotmap import DotMap
+
+from core import properties as properties_module
+from core import tick_history as tick_history_module
+from core.authentication import credentials_verifier, verified_tokens
+from core.database import Database
+from core.log_broadcaster import LogFilter
+from core.metrics import Counter, Histogram
+from core.properties import properties
+from core.services import matches
+from core.state_codec import ANY, DECIMAL, StateCodec
+from core.state_store import StateJournal, state_store
+from core.tick_history import _TickRecord, tick_history
+from core.time_series import _RingBuffer, _Tier, TimeSeries
+from hummingbot.middle_price import calculate_middle_prices
+from hummingbot.order_book import L2OrderBook, OrderBookEngine
+from hummingbot.outliers import P2Quantile, outlier_filter
+from hummingbot.strategies.filled_orders_archive import FilledOrdersArchive
+from hummingbot.types import MiddlePriceStrategy, OrderSide
+from hummingbot.utils import calculate_middle_price, generate_hashes, parse_order_book
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..")
+COMMON_CONFIGURATION_PATH = os.path.join(ROOT_PATH, "resources", "configuration", "common.yml")
+
+
+def setUpModule():
+	# The logger is configured like in the application, writing to a temporary directory.
+	with open(COMMON_CONFIGURATION_PATH) as stream:
+		configuration = yaml.safe_load(stream)
+
+	properties.set("root_path", ROOT_PATH)
+	properties.set("logging", DotMap({**configuration["logging"], "directory": tempfile.mkdtemp()}, _dynamic=False))
+	properties.set("telegram", DotMap(configuration["telegram"], _dynamic=False))
 
 
 class UnitTests(unittest.TestCase):
 	def test_01(self):
 		pass
 
+	def test_properties_cache_is_invalidated_on_set(self):
+		properties.set("unit_tests.properties.value", 1)
+		snapshot = properties.properties
+
+		self.assertEqual(properties.get("unit_tests.properties.value"), 1)
+
+		properties.set("unit_tests.properties.value", 2)
+
+		self.assertEqual(properties.get("unit_tests.properties.value"), 2)
+		self.assertEqual(properties.get("unit_tests.properties").value, 2)
+		self.assertEqual(snapshot.unit_tests.properties.value, 1)
+		self.assertEqual(properties.get_or_default("unit_tests.properties.missing", 3), 3)
+
+	def test_properties_reload_does_not_mutate_the_snapshot_and_invalidates_the_misses(self):
+		properties.set("unit_tests.merge.first", 1)
+		snapshot = properties.properties
+
+		with properties._lock:
+			properties._replace(DotMap(properties_module._copy_on_write_merge(
+				properties.properties, {"unit_tests": {"merge": {"second": 2}}}
+			), _dynamic=False))
+
+		self.assertNotIn("second", snapshot.unit_tests.merge)
+		self.assertEqual(properties.get("unit_tests.merge.first"), 1)
+		self.assertEqual(properties.get("unit_tests.merge.second"), 2)
+
+		self.assertEqual(properties.get_or_default("unit_tests.environment.value", "default"), "default")
+		os.environ["UNIT_TESTS_ENVIRONMENT_VALUE"] = "environment"
+		try:
+			# The miss is memoized until the next set or load.
+			self.assertEqual(properties.get_or_default("unit_tests.environment.value", "default"), "default")
+
+			properties._replace(properties.properties)
+			self.assertEqual(properties.get_or_default("unit_tests.environment.value", "default"), "environment")
+		finally:
+			del os.environ["UNIT_TESTS_ENVIRONMENT_VALUE"]
+
+		properties.set("unit_tests.environment.value", "property")
+		self.assertEqual(properties.get("unit_tests.environment.value"), "property")
+
+	def test_services_patterns_match_the_executable_only(self):
+		with open(COMMON_CONFIGURATION_PATH) as stream:
+			patterns = {
+				service_id: re.compile(pattern)
+				for (service_id, pattern) in yaml.safe_load(stream)["system"]["services"]["processes"].items()
+			}
+
+		self.assertTrue(matches(patterns["filebrowser"], ["/usr/local/bin/filebrowser", "-r", "/root"]))
+		self.assertTrue(matches(patterns["fun-frontend"], ["node", "/root/fun-frontend/node_modules/.bin/serve", "-s", "build"]))
+		self.assertTrue(matches(patterns["hb-client"], ["/opt/conda/envs/hummingbot/bin/python3", "bin/hummingbot_quickstart.py"]))
+		self.assertTrue(matches(patterns["hb-gateway"], ["node", "/root/gateway/dist/src/index.js"]))
+
+		self.assertFalse(matches(patterns["filebrowser"], ["tail", "-f", "/root/logs/filebrowser.log"]))
+		self.assertFalse(matches(patterns["filebrowser"], ["grep", "filebrowser"]))
+		self.assertFalse(matches(patterns["filebrowser"], ["/usr/bin/filebrowser-backup"]))
+		self.assertFalse(matches(patterns["fun-frontend"], ["tail", "-f", "/root/fun-frontend/logs/all.log"]))
+		self.assertFalse(matches(patterns["hb-client"], ["vim", "bin/hummingbot_quickstart.py"]))
+		self.assertFalse(matches(patterns["hb-gateway"], ["less", "/root/gateway/dist/src/index.js"]))
+
+	def test_log_filter_keeps_continuation_lines_with_their_entry(self):
+		filter = LogFilter.from_options(DotMap({"level": "error", "worker": "worker_1"}, _dynamic=False))
+
+		lines = [
+			"2024-01-01 10:00:00,000 INFO worker_1 a.py:1 f: started",
+			"2024-01-01 10:00:01,000 ERROR worker_1 a.py:2 f: failed",
+			"Traceback (most recent call last):",
+			"2024-01-01 10:00:02,000 ERROR worker_2 a.py:3 f: failed",
+			"Traceback (most recent call last):",
+		]
+
+		self.assertEqual(lines[1:3], [line for line in lines if filter.accept(line)])
+
+	def test_log_filter_lets_lines_through_below_one_line_per_second(self):
+		filter = LogFilter(rate=0.5)
+		line = "2024-01-01 10:00:00,000 INFO worker_1 a.py:1 f: started"
+
+		self.assertEqual([True, False], [filter.accept(line), filter.accept(line)])
+
+		# Two seconds refill a single line.
+		filter._last_refill -= 2
+		self.assertEqual([True, False], [filter.accept(line), filter.accept(line)])
+		self.assertEqual(2, filter.skipped)
+
+	def test_verified_tokens_are_discarded_when_the_signing_key_changes(self):
+		properties.set("admin.password", "first")
+		verified_tokens.add("token", time.time() + 60)
+		verified_tokens.add("expired", time.time() - 1)
+
+		self.assertTrue(verified_tokens.is_verified("token"))
+		self.assertFalse(verified_tokens.is_verified("expired"))
+
+		properties.set("admin.password", "second")
+
+		self.assertFalse(verified_tokens.is_verified("token"))
+
+	def test_credentials_are_provisioned_again_after_a_password_change_and_failures_are_bounded(self):
+		properties.set("admin.password", "first")
+		credentials_verifier._check_password()
+		credentials_verifier._hashes["admin"] = "hash"
+
+		properties.set("admin.password", "second")
+		credentials_verifier._check_password()
+
+		self.assertNotIn("admin", credentials_verifier._hashes)
+
+		properties.set("server.authentication.rate_limit.maximum_keys", 4)
+		for index in range(10):
+			credentials_verifier._register_failure(f"user:{index}", f"address:{index}")
+
+		self.assertEqual(["user:8", "address:8", "user:9", "address:9"], list(credentials_verifier._failures.keys()))
+		credentials_verifier._failures.clear()
+
+	def test_histogram_quantiles_have_a_bounded_relative_error(self):
+		histogram = Histogram("test_seconds", "")
+		for value in range(1, 10001):
+			histogram.observe(value / 1000, phase="test")
+
+		for quantile in Histogram.QUANTILES:
+			self.assertAlmostEqual(quantile * 10, histogram.get_quantile(quantile, phase="test"), delta=quantile * 10 / 16)
+
+	def test_counter_increments_from_several_threads(self):
+		counter = Counter("test_total", "")
+
+		def increment():
+			for _ in range(10000):
+				counter.inc(resource="test", result="hit")
+
+		threads = [threading.Thread(target=increment) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(40000, counter.get(resource="test", result="hit"))
+		self.assertEqual(['test_total{resource="test",result="hit"} 40000'], counter.render())
+
+	def test_state_journal_replays_deltas_over_the_last_snapshot(self):
+		properties.set("system.state.compaction.entries", 3)
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "worker.json")
+			journal = state_store.get(path)
+
+			state = DotMap({"wallet": {"value": Decimal("1.5")}, "orders": {"filled": {}}})
+			journal.save(state)
+			for index in range(5):
+				state.wallet.value = Decimal(index)
+				state.orders.filled[str(index)] = {"price": Decimal("2.25")}
+				journal.save(state)
+			del state.orders.filled["0"]
+			journal.save(state)
+
+			state_store.flush()
+
+			expected = {"wallet": {"value": "4"}, "orders": {"filled": {str(index): {"price": "2.25"} for index in range(1, 5)}}}
+			self.assertEqual(expected, StateJournal(path, state_store).load())
+
+	def test_state_journal_is_truncated_after_a_torn_entry(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "worker.json")
+			journal = StateJournal(path, state_store)
+
+			journal.save({"a": 1})
+			journal.save({"a": 2})
+			state_store.flush()
+
+			with open(journal.journal_path, "a") as file:
+				file.write('{"changes":[{"pa')
+
+			journal = StateJournal(path, state_store)
+			self.assertEqual({"a": 2}, journal.load())
+
+			journal.save({"a": 3})
+			journal.save({"a": 4})
+			state_store.flush()
+
+			self.assertEqual({"a": 4}, StateJournal(path, state_store).load())
+
+	def test_tick_history_keeps_the_valid_ticks_of_a_failed_batch(self):
+		with tempfile.TemporaryDirectory() as directory:
+			database = Database(os.path.join(directory, "history.sqlite3"))
+			database.execute_script(tick_history_module.SCHEMA)
+
+			records = [_TickRecord(f"worker_{index}", "KUJI/USK", DotMap()) for index in range(3)]
+			# Wrong number of values, the insert fails.
+			records[1].tick = records[1].tick[:-1]
+
+			tick_history._write_batch(database, records)
+
+			self.assertEqual(["worker_0", "worker_2"], [row[0] for row in database.execute("SELECT worker FROM ticks ORDER BY id")])
+			database.close()
+
+	def test_tick_history_flush_does_not_wait_for_a_writer_that_can_not_connect(self):
+		with tempfile.TemporaryDirectory() as directory:
+			properties.set("app_root_path", directory)
+			# A file can not be the parent directory of the database.
+			open(os.path.join(directory, "file"), "w").close()
+			properties.set("system.history.path", "file/history.sqlite3")
+
+			tick_history.record("worker", "KUJI/USK", DotMap())
+			self.assertTrue(tick_history.flush(5))
+
+			properties.set("system.history.path", "history.sqlite3")
+
+			tick_history.record("worker", "KUJI/USK", DotMap())
+			self.assertTrue(tick_history.flush(5))
+			self.assertEqual(["worker"], [row["worker"] for row in tick_history.query("ticks")])
+
+	def test_time_series_ring_buffer_and_tiers_keep_the_recent_rows(self):
+		buffer = _RingBuffer(3)
+		for index in range(5):
+			buffer.append([index, index, index, index])
+
+		self.assertEqual([2, 3, 4], buffer.get()[:, 0].tolist())
+
+		tier = _Tier(60, 3600, 10)
+		for (timestamp, value) in ((0, 2), (30, 1), (59, 3), (60, 5), (130, 4)):
+			tier.add(timestamp, value)
+
+		# Timestamp, last, minimum and maximum of each closed bucket, the one starting at 120 is still open.
+		self.assertEqual([[0, 3, 1, 3], [60, 5, 5, 5]], tier.buffer.get().tolist())
+		self.assertEqual([120, 4, 4, 4], tier.bucket)
+
+	def test_time_series_keeps_the_rows_until_they_are_written(self):
+		with tempfile.TemporaryDirectory() as directory:
+			properties.set("app_root_path", directory)
+			properties.set("system.time_series.tiers", [{"resolution": 0, "retention": 86400}, {"resolution": 60, "retention": 86400}])
+			properties.set("system.time_series.capacity", 2)
+
+			# A new instance, not the shared one.
+			series = TimeSeries.instance().__class__()
+			now = time.time()
+
+			# A file can not be the parent directory of the chunks.
+			open(os.path.join(directory, "file"), "w").close()
+			properties.set("system.time_series.path", "file")
+			for index in range(4):
+				series.add("worker_1", {"wallet_value": index}, now - 300 + index)
+			series.flush()
+
+			properties.set("system.time_series.path", "series")
+			series.flush(close=True)
+
+			# Older than the ring buffer, so read from the files.
+			result = series.query("worker_1", "wallet_value", start=now - 400, resolution=0)
+			self.assertEqual([0, 1, 2, 3], result["value"].tolist())
+			self.assertEqual([3], series.query("worker_1", "wallet_value", start=now - 400, resolution=60)["value"].tolist()[-1:])
+
+			with self.assertRaises(ValueError):
+				series.query("..", "wallet_value")
+			with self.assertRaises(ValueError):
+				series.query("worker_1", "../../secrets")
+
+	def test_time_series_continues_a_bucket_after_a_restart(self):
+		with tempfile.TemporaryDirectory() as directory:
+			properties.set("app_root_path", directory)
+			properties.set("system.time_series.path", "series")
+			properties.set("system.time_series.tiers", [{"resolution": 0, "retention": 86400}, {"resolution": 3600, "retention": 86400}])
+			properties.set("system.time_series.capacity", 10)
+
+			start = math.floor(time.time() / 3600) * 3600 - 7200
+
+			series = TimeSeries.instance().__class__()
+			series.add("worker_1", {"wallet_value": 100}, start + 1)
+			series.add("worker_1", {"wallet_value": 1}, start + 2)
+			series.flush(close=True)
+
+			# The same bucket is written again after the restart, next to the first part instead of over it.
+			series = TimeSeries.instance().__class__()
+			series.add("worker_1", {"wallet_value": 50}, start + 3)
+			series.flush(close=True)
+
+			result = series.query("worker_1", "wallet_value", start=start - 1, end=start + 3600, resolution=3600)
+			self.assertEqual(([start], [50], [1], [100]), tuple(result[column].tolist() for column in ("timestamp", "value", "minimum", "maximum")))
+
+	def test_state_codec_only_decodes_the_decimal_fields(self):
+		codec = StateCodec({"orders": {ANY: {ANY: {"price": DECIMAL}}}, "wallet": {ANY: DECIMAL}})
+
+		state = codec.decode(codec.encode({
+			"orders": {"filled": {"123": {"id": "123", "price": Decimal("1.2500"), "market": "KUJI/USK"}}},
+			"wallet": {"current_value": Decimal("100.10")},
+		}))
+
+		self.assertEqual({"id": "123", "price": Decimal("1.25"), "market": "KUJI/USK"}, state["orders"]["filled"]["123"])
+		self.assertEqual(Decimal("100.1"), state["wallet"]["current_value"])
+
+	def test_filled_orders_archive_keeps_the_recent_orders_once(self):
+		def create_orders(*ids: int) -> dict:
+			return {str(id): DotMap({"id": str(id), "side": "BUY" if id % 2 else "SELL", "fillingTimestamp": 1000 + id}) for id in ids}
+
+		archive = FilledOrdersArchive(3, grace=2)
+
+		# "1" is returned as new although it is evicted right away.
+		self.assertEqual(["1", "2", "3", "4"], list(archive.add(create_orders(4, 3, 2, 1)).keys()))
+		self.assertNotIn("1", archive)
+		# "1" is older than the watermark and is not archived again.
+		self.assertEqual(["5"], list(archive.add(create_orders(1, 4, 5)).keys()))
+		self.assertEqual("5", archive.last().id)
+		self.assertEqual("4", archive.last("sell").id)
+		self.assertEqual(["3", "4"], [order.id for order in archive.query(1003, 1005)])
+		self.assertEqual(["3", "5"], [order.id for order in archive.query(side="BUY")])
+
+		archive.track_created_orders(["6"])
+		archive.track_open_orders(["7"])
+		self.assertEqual(["6", "7"], archive.get_pending_ids())
+
+		# "6" is neither filled nor open anymore, it is still requested in case its fill is indexed late.
+		archive.add({})
+		self.assertEqual(["6", "7"], archive.get_pending_ids())
+		archive.add({})
+		self.assertEqual(["7"], archive.get_pending_ids())
+
+		archive.track_created_orders(["8"])
+		archive.add({})
+		self.assertEqual(["8"], list(archive.add(create_orders(8)).keys()))
+		self.assertEqual(["7"], archive.get_pending_ids())
+
+	def test_order_book_arrays_are_sorted_from_the_best_price(self):
+		order_book = parse_order_book(DotMap({
+			"bids": {"1": {"price": "0.98", "amount": "10"}, "2": {"price": "0.99", "amount": "30"}, "3": {"price": "0.97", "amount": "5"}},
+			"asks": {"4": {"price": "1.03", "amount": "1"}, "5": {"price": "1.01", "amount": "10"}},
+		}))
+
+		self.assertEqual([0.99, 0.98, 0.97], order_book.bids.prices.tolist())
+		self.assertEqual([1.01, 1.03], order_book.asks.prices.tolist())
+		self.assertEqual([30, 40, 45], order_book.bids.cumulative_amounts.tolist())
+		self.assertAlmostEqual(1.0, float(calculate_middle_price(order_book.bids, order_book.asks, MiddlePriceStrategy.SAP)))
+		self.assertAlmostEqual((0.99 * 30 + 1.01 * 10) / 40, float(calculate_middle_price(order_book.bids, order_book.asks, MiddlePriceStrategy.WAP)))
+
+	def test_l2_order_book_applies_deltas_in_sequence(self):
+		book = L2OrderBook()
+
+		# Buffered until the snapshot, the first one is older than it.
+		book.apply_delta({"sequence": 10, "bids": [[0.99, 0]]})
+		book.apply_delta({"sequence": 11, "bids": [[0.98, 7]], "asks": [[1.01, 0]]})
+		book.apply_snapshot({"sequence": 10, "bids": [[0.99, 1], [0.97, 2]], "asks": [[1.01, 3], [1.02, 4]]})
+
+		self.assertEqual((0.99, 1), book.get_best_bid())
+		self.assertEqual((1.02, 4), book.get_best_ask())
+		self.assertEqual([(0.99, 1), (0.98, 7)], book.get_depth(2)["bids"])
+		self.assertEqual([0.99, 0.98, 0.97], book.get_arrays().bids.prices.tolist())
+
+		self.assertTrue(book.apply_delta({"first_sequence": 12, "sequence": 13, "asks": [[1.02, 0]]}))
+		self.assertIsNone(book.get_best_ask())
+		self.assertFalse(book.apply_delta({"sequence": 15, "asks": [[1.05, 1]]}))
+		self.assertFalse(book.is_synchronized)
+
+	def test_order_book_engine_without_stream_fetches_on_demand(self):
+		snapshots = []
+
+		async def get_snapshot():
+			snapshots.append(len(snapshots))
+
+			return {"bids": [[0.99, len(snapshots)]], "asks": [[1.01, 1]]}
+
+		async def run():
+			engine = OrderBookEngine(get_snapshot, market_id="test", maximum_age=60)
+
+			# Nothing to follow in the background.
+			self.assertFalse(engine.is_streaming)
+			await asyncio.wait_for(engine.run(), timeout=1)
+			self.assertEqual([], snapshots)
+
+			self.assertEqual([1], (await engine.get_arrays()).bids.amounts.tolist())
+			self.assertEqual([1], (await engine.get_arrays()).bids.amounts.tolist())
+			self.assertEqual(1, len(snapshots))
+
+			engine.book.timestamp -= 61
+			self.assertEqual([2], (await engine.get_arrays()).bids.amounts.tolist())
+
+		asyncio.run(run())
+
+	def test_middle_prices_match_the_middle_price_functions(self):
+		order_book = parse_order_book(DotMap({
+			"bids": {str(index): {"price": 1 - index / 100, "amount": index + 1} for index in range(20)},
+			"asks": {str(index): {"price": 1.01 + index / 100, "amount": 20 - index} for index in range(20)},
+		}))
+
+		prices = calculate_middle_prices(order_book.bids, order_book.asks, notional=5)
+
+		for strategy in (MiddlePriceStrategy.SAP, MiddlePriceStrategy.WAP, MiddlePriceStrategy.VWAP):
+			self.assertAlmostEqual(float(calculate_middle_price(order_book.bids, order_book.asks, strategy)), float(prices[strategy]))
+
+		# A notional of 5 takes 1 at 1.00, 2 at 0.99 and the rest at 0.98 from the bids, and only 1.01 from the asks.
+		bid = 5 / (1 + 2 + (5 - 1 - 1.98) / 0.98)
+		self.assertAlmostEqual((bid + 1.01) / 2, float(prices[MiddlePriceStrategy.VWAP_BY_NOTIONAL]))
+
+	def test_streaming_quantiles_follow_the_percentiles(self):
+		values = [((index * 7919) % 10007) / 10007 for index in range(20000)]
+
+		for quantile in (0.25, 0.75):
+			estimate = P2Quantile(quantile)
+			for value in values:
+				estimate.add(value)
+
+			self.assertAlmostEqual(float(np.percentile(values, quantile * 100)), estimate.value, delta=0.01)
+
+		order_book = parse_order_book(DotMap({
+			"bids": {str(index): {"price": 1 - index / 100, "amount": 1} for index in range(20)} | {"far": {"price": 0.01, "amount": 1000}},
+			"asks": {str(index): {"price": 1.01 + index / 100, "amount": 1} for index in range(20)} | {"far": {"price": 100, "amount": 1000}},
+		}))
+
+		outlier_filter.clear("test")
+		self.assertEqual(20, outlier_filter.get_levels_count("test", order_book.bids, len(order_book.bids)))
+		self.assertEqual(20, outlier_filter.get_levels_count("test", order_book.asks, len(order_book.asks)))
+		self.assertAlmostEqual(0.5 * float(np.percentile(order_book.bids.prices, 25)), outlier_filter.get_threshold("test", OrderSide.BUY), delta=0.02)
+		outlier_filter.clear("test")
+
+	def test_middle_prices_skip_the_strategies_not_selected_and_add_each_book_once(self):
+		order_book_data = DotMap({
+			"bids": {str(index): {"price": 1 - index / 100, "amount": 1} for index in range(20)},
+			"asks": {str(index): {"price": 1.01 + index / 100, "amount": 1} for index in range(20)},
+		})
+		order_book = parse_order_book(order_book_data)
+
+		outlier_filter.clear("test")
+
+		prices = calculate_middle_prices(order_book.bids, order_book.asks, market="test", strategies=(MiddlePriceStrategy.SAP,))
+		self.assertEqual([MiddlePriceStrategy.SAP], list(prices.keys()))
+		self.assertTrue(np.isnan(outlier_filter.get_threshold("test", OrderSide.BUY)))
+
+		# The same prices are added once, whether read again or fetched by another worker, while other ones are added.
+		other_order_book = parse_order_book(DotMap({
+			"bids": {str(index): {"price": 0.9 - index / 100, "amount": 1} for index in range(20)},
+			"asks": {str(index): {"price": 1.01 + index / 100, "amount": 1} for index in range(20)},
+		}))
+
+		counts = []
+		for book in (order_book, parse_order_book(order_book_data), other_order_book, order_book, other_order_book):
+			calculate_middle_prices(book.bids, book.asks, market="test", strategies=(MiddlePriceStrategy.VWAP,))
+			counts.append(outlier_filter._quantiles[("test", OrderSide.BUY)]._older.count)
+		self.assertEqual([counts[0]] * 2 + [2 * counts[0]] * 3, counts)
+
+		outlier_filter.clear("test")
+
+	def test_deterministic_hashes_are_canonical(self):
+		first = {"side": OrderSide.BUY, "price": Decimal("1.50"), "amount": Decimal("1E+1")}
+		second = DotMap({"amount": Decimal("10"), "price": Decimal("1.5"), "side": OrderSide.BUY})
+
+		(first_hash, second_hash) = generate_hashes([first, second], deterministic=True)
+		self.assertEqual(first_hash, second_hash)
+		self.assertEqual(first_hash, generate_hashes([second], deterministic=True)[0])
+		self.assertEqual(16, len(generate_hashes([first], digest_size=8, deterministic=True)[0]))
+
+		self.assertNotEqual(generate_hashes([first])[0], generate_hashes([first])[0])
+
 
 if __name__ == "__main__":
 	unittest.main()